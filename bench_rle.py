@@ -0,0 +1,133 @@
+"""
+Micro-benchmark of the RLE run extraction: the packed int kernel of
+u8g2_to_bdf.py (rle_runs) against the per-pixel loops it replaced.
+
+Usage:
+    python3 bench_rle.py [font.bdf] [--repeat N]
+
+Without a BDF, random glyph bitmaps of typical sizes are used. Both
+implementations are checked to produce the same RLE groups and bit counts
+for every RLE_PARAMS candidate before anything is timed.
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+import u8g2_to_bdf
+from u8g2_to_bdf import RLE_PARAMS
+
+
+def loop_pairs(bitmap):
+    # The per-pixel run extraction previously copied into encode_rle,
+    # encode_rle_bits and encode_rle_to_bw
+    pairs = []
+    idx = 0
+    while idx < len(bitmap):
+        zeros = 0
+        while idx < len(bitmap) and bitmap[idx] == 0:
+            zeros += 1
+            idx += 1
+        ones = 0
+        while idx < len(bitmap) and bitmap[idx] == 1:
+            ones += 1
+            idx += 1
+        pairs.append((zeros, ones))
+    return pairs
+
+
+def loop_groups(bitmap, m0, m1):
+    normalized_pairs = []
+    max_0 = (1 << m0) - 1
+    max_1 = (1 << m1) - 1
+    for z, o in loop_pairs(bitmap):
+        while z > max_0:
+            normalized_pairs.append((max_0, 0))
+            z -= max_0
+        while o > max_1:
+            normalized_pairs.append((z, max_1))
+            z = 0
+            o -= max_1
+        normalized_pairs.append((z, o))
+
+    groups = []
+    i = 0
+    while i < len(normalized_pairs):
+        z, o = normalized_pairs[i]
+        repeat = 0
+        j = i + 1
+        while j < len(normalized_pairs) and normalized_pairs[j] == (z, o):
+            repeat += 1
+            j += 1
+        groups.append((z, o, repeat))
+        i += 1 + repeat
+    return groups
+
+
+def loop_bit_counts(bitmap):
+    # Old optimizer: the whole extraction once per candidate
+    return [sum(m0 + m1 + repeat + 1 for _, _, repeat in loop_groups(bitmap, m0, m1))
+            for m0, m1 in RLE_PARAMS]
+
+
+def random_bitmaps(count, seed=1):
+    rnd = random.Random(seed)
+    bitmaps = []
+    for _ in range(count):
+        w = rnd.randint(1, 16)
+        h = rnd.randint(1, 20)
+        ink = rnd.random()
+        bitmaps.append([1 if rnd.random() < ink else 0 for _ in range(w * h)])
+    # Edge cases: empty, all clear, all set, long runs
+    bitmaps += [[], [0] * 300, [1] * 300, [0] * 200 + [1] * 200 + [0]]
+    return bitmaps
+
+
+def bench(label, func, bitmaps, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for bitmap in bitmaps:
+            func(bitmap)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<28} {best * 1000:9.2f} ms  ({len(bitmaps) / best:10.0f} glyphs/s)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RLE run extraction kernel against the per-pixel loops.")
+    parser.add_argument("bdf", nargs='?', help="BDF font to take the glyph bitmaps from (default: random bitmaps)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs, the best one is reported (default: 5)")
+    args = parser.parse_args()
+
+    if args.bdf:
+        with contextlib.redirect_stdout(io.StringIO()):
+            glyphs, _ = u8g2_to_bdf.parse_bdf_file(args.bdf, stats='none')
+        bitmaps = [g['bitmap'] for g in glyphs]
+    else:
+        bitmaps = random_bitmaps(2000)
+
+    for bitmap in bitmaps:
+        runs = u8g2_to_bdf.bitmap_runs(bitmap)
+        for m0, m1 in RLE_PARAMS:
+            if u8g2_to_bdf.rle_groups(runs, m0, m1) != loop_groups(bitmap, m0, m1):
+                raise SystemExit(f"Mismatch for m0={m0}, m1={m1}, bitmap {bitmap}")
+        if u8g2_to_bdf.rle_bit_counts(bitmap) != loop_bit_counts(bitmap):
+            raise SystemExit(f"Bit count mismatch for bitmap {bitmap}")
+    print(f"{len(bitmaps)} bitmaps, {sum(len(b) for b in bitmaps)} pixels: results identical")
+
+    print("Run extraction:")
+    loop = bench("per-pixel loop", loop_pairs, bitmaps, args.repeat)
+    kernel = bench("packed int kernel", u8g2_to_bdf.bitmap_runs, bitmaps, args.repeat)
+    print(f"  speedup {loop / kernel:.1f}x")
+
+    print(f"Bit counts for all {len(RLE_PARAMS)} RLE parameters:")
+    loop = bench("per-pixel loop per candidate", loop_bit_counts, bitmaps, args.repeat)
+    kernel = bench("runs once, then per candidate", u8g2_to_bdf.rle_bit_counts, bitmaps, args.repeat)
+    print(f"  speedup {loop / kernel:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Build agl.dat, the precompiled Adobe Glyph List table used by u8g2_to_bdf.py
+to resolve glyph names of ENCODING -1 characters.
+
+Usage:
+    python3 build_agl_table.py [glyphlist.txt] [aglfn.txt] [-o agl.dat]
+
+glyphlist.txt / aglfn.txt are the files from https://github.com/adobe-type-tools/agl-aglfn;
+the shipped agl.dat is compiled from both. Their names take precedence over
+the names derived from the Unicode character database (Latin, Greek and
+Cyrillic letters, named following the AGL conventions) and the AGL names
+listed below, which only fill in names the Adobe lists don't have (e.g.
+Ismallcapital). Without the Adobe files the table is limited to those.
+
+agl.dat is zlib compressed text, one "name;HEX[ HEX...]" line per glyph name.
+"""
+import argparse
+import re
+import unicodedata
+import zlib
+
+# AGL names that can't be derived from Unicode character names
+AGL_NAMES = {
+    # ASCII
+    'space': 0x0020, 'exclam': 0x0021, 'quotedbl': 0x0022, 'numbersign': 0x0023,
+    'dollar': 0x0024, 'percent': 0x0025, 'ampersand': 0x0026, 'quotesingle': 0x0027,
+    'parenleft': 0x0028, 'parenright': 0x0029, 'asterisk': 0x002A, 'plus': 0x002B,
+    'comma': 0x002C, 'hyphen': 0x002D, 'period': 0x002E, 'slash': 0x002F,
+    'zero': 0x0030, 'one': 0x0031, 'two': 0x0032, 'three': 0x0033, 'four': 0x0034,
+    'five': 0x0035, 'six': 0x0036, 'seven': 0x0037, 'eight': 0x0038, 'nine': 0x0039,
+    'colon': 0x003A, 'semicolon': 0x003B, 'less': 0x003C, 'equal': 0x003D,
+    'greater': 0x003E, 'question': 0x003F, 'at': 0x0040, 'bracketleft': 0x005B,
+    'backslash': 0x005C, 'bracketright': 0x005D, 'asciicircum': 0x005E,
+    'underscore': 0x005F, 'grave': 0x0060, 'braceleft': 0x007B, 'bar': 0x007C,
+    'braceright': 0x007D, 'asciitilde': 0x007E,
+
+    # Latin-1 Supplement
+    'nbspace': 0x00A0, 'nonbreakingspace': 0x00A0, 'exclamdown': 0x00A1, 'cent': 0x00A2,
+    'sterling': 0x00A3, 'currency': 0x00A4, 'yen': 0x00A5, 'brokenbar': 0x00A6,
+    'section': 0x00A7, 'dieresis': 0x00A8, 'copyright': 0x00A9, 'ordfeminine': 0x00AA,
+    'guillemotleft': 0x00AB, 'logicalnot': 0x00AC, 'sfthyphen': 0x00AD,
+    'softhyphen': 0x00AD, 'registered': 0x00AE, 'macron': 0x00AF, 'overscore': 0x00AF,
+    'degree': 0x00B0, 'plusminus': 0x00B1, 'twosuperior': 0x00B2,
+    'threesuperior': 0x00B3, 'acute': 0x00B4, 'mu': 0x00B5, 'mu1': 0x00B5,
+    'paragraph': 0x00B6, 'periodcentered': 0x00B7, 'middot': 0x00B7,
+    'cedilla': 0x00B8, 'onesuperior': 0x00B9, 'ordmasculine': 0x00BA,
+    'guillemotright': 0x00BB, 'onequarter': 0x00BC, 'onehalf': 0x00BD,
+    'threequarters': 0x00BE, 'questiondown': 0x00BF, 'AE': 0x00C6, 'Eth': 0x00D0,
+    'multiply': 0x00D7, 'Oslash': 0x00D8, 'Thorn': 0x00DE, 'germandbls': 0x00DF,
+    'ae': 0x00E6, 'eth': 0x00F0, 'divide': 0x00F7, 'oslash': 0x00F8, 'thorn': 0x00FE,
+
+    # Latin Extended-A/B letters with irregular names
+    'Dcroat': 0x0110, 'dcroat': 0x0111, 'Dslash': 0x0110, 'dmacron': 0x0111,
+    'Hbar': 0x0126, 'hbar': 0x0127, 'Idot': 0x0130, 'Idotaccent': 0x0130,
+    'dotlessi': 0x0131, 'IJ': 0x0132, 'ij': 0x0133, 'kgreenlandic': 0x0138,
+    'Ldot': 0x013F, 'ldot': 0x0140, 'Lslash': 0x0141, 'lslash': 0x0142,
+    'napostrophe': 0x0149, 'quoterightn': 0x0149, 'Eng': 0x014A, 'eng': 0x014B,
+    'OE': 0x0152, 'oe': 0x0153, 'Tbar': 0x0166, 'tbar': 0x0167, 'longs': 0x017F,
+    'slong': 0x017F, 'florin': 0x0192, 'Ohorn': 0x01A0, 'ohorn': 0x01A1,
+    'Uhorn': 0x01AF, 'uhorn': 0x01B0, 'AEacute': 0x01FC, 'aeacute': 0x01FD,
+    'Oslashacute': 0x01FE, 'oslashacute': 0x01FF, 'Scommaaccent': 0x0218,
+    'scommaaccent': 0x0219, 'Gcommaaccent': 0x0122, 'gcommaaccent': 0x0123,
+    'Kcommaaccent': 0x0136, 'kcommaaccent': 0x0137, 'Lcommaaccent': 0x013B,
+    'lcommaaccent': 0x013C, 'Ncommaaccent': 0x0145, 'ncommaaccent': 0x0146,
+    'Rcommaaccent': 0x0156, 'rcommaaccent': 0x0157, 'Tcommaaccent': 0x0162,
+    'tcommaaccent': 0x0163, 'Tcedilla': 0x0162, 'tcedilla': 0x0163,
+    'Gcedilla': 0x0122, 'gcedilla': 0x0123, 'Kcedilla': 0x0136, 'kcedilla': 0x0137,
+    'Lcedilla': 0x013B, 'lcedilla': 0x013C, 'Ncedilla': 0x0145, 'ncedilla': 0x0146,
+    'Rcedilla': 0x0156, 'rcedilla': 0x0157, 'Cdot': 0x010A, 'cdot': 0x010B,
+    'Edot': 0x0116, 'edot': 0x0117, 'Gdot': 0x0120, 'gdot': 0x0121,
+    'Zdot': 0x017B, 'zdot': 0x017C, 'Odblacute': 0x0150, 'odblacute': 0x0151,
+    'Udblacute': 0x0170, 'udblacute': 0x0171,
+
+    # Spacing modifiers
+    'circumflex': 0x02C6, 'caron': 0x02C7, 'breve': 0x02D8, 'dotaccent': 0x02D9,
+    'ring': 0x02DA, 'ogonek': 0x02DB, 'tilde': 0x02DC,
+    'hungarumlaut': 0x02DD,
+
+    # Greek letters with irregular names
+    'Delta': 0x0394, 'Omega': 0x03A9, 'mugreek': 0x03BC, 'sigma1': 0x03C2,
+    'sigmafinal': 0x03C2, 'theta1': 0x03D1, 'thetasymbolgreek': 0x03D1,
+    'Upsilon1': 0x03D2, 'phi1': 0x03D5, 'phisymbolgreek': 0x03D5, 'omega1': 0x03D6,
+    'pisymbolgreek': 0x03D6, 'anoteleia': 0x0387, 'tonos': 0x0384,
+    'dieresistonos': 0x0385, 'questiongreek': 0x037E,
+
+    # Cyrillic (AGL afii names)
+    'afii10023': 0x0401, 'afii10051': 0x0402, 'afii10052': 0x0403, 'afii10053': 0x0404,
+    'afii10054': 0x0405, 'afii10055': 0x0406, 'afii10056': 0x0407, 'afii10057': 0x0408,
+    'afii10058': 0x0409, 'afii10059': 0x040A, 'afii10060': 0x040B, 'afii10061': 0x040C,
+    'afii10062': 0x040E, 'afii10145': 0x040F, 'afii10071': 0x0451, 'afii10099': 0x0452,
+    'afii10100': 0x0453, 'afii10101': 0x0454, 'afii10102': 0x0455, 'afii10103': 0x0456,
+    'afii10104': 0x0457, 'afii10105': 0x0458, 'afii10106': 0x0459, 'afii10107': 0x045A,
+    'afii10108': 0x045B, 'afii10109': 0x045C, 'afii10110': 0x045E, 'afii10193': 0x045F,
+    'afii10050': 0x0490, 'afii10098': 0x0491, 'afii61352': 0x2116,
+
+    # General punctuation
+    'figuredash': 0x2012, 'endash': 0x2013, 'emdash': 0x2014, 'afii00208': 0x2015,
+    'underscoredbl': 0x2017, 'quoteleft': 0x2018, 'quoteright': 0x2019,
+    'quotesinglbase': 0x201A, 'quotereversed': 0x201B, 'quotedblleft': 0x201C,
+    'quotedblright': 0x201D, 'quotedblbase': 0x201E, 'dagger': 0x2020,
+    'daggerdbl': 0x2021, 'bullet': 0x2022, 'onedotenleader': 0x2024,
+    'twodotenleader': 0x2025, 'twodotleader': 0x2025, 'ellipsis': 0x2026,
+    'perthousand': 0x2030, 'minute': 0x2032, 'second': 0x2033,
+    'guilsinglleft': 0x2039, 'guilsinglright': 0x203A, 'exclamdbl': 0x203C,
+    'fraction': 0x2044,
+
+    # Super- and subscripts
+    'zerosuperior': 0x2070, 'foursuperior': 0x2074, 'fivesuperior': 0x2075,
+    'sixsuperior': 0x2076, 'sevensuperior': 0x2077, 'eightsuperior': 0x2078,
+    'ninesuperior': 0x2079, 'parenleftsuperior': 0x207D, 'parenrightsuperior': 0x207E,
+    'nsuperior': 0x207F, 'zeroinferior': 0x2080, 'oneinferior': 0x2081,
+    'twoinferior': 0x2082, 'threeinferior': 0x2083, 'fourinferior': 0x2084,
+    'fiveinferior': 0x2085, 'sixinferior': 0x2086, 'seveninferior': 0x2087,
+    'eightinferior': 0x2088, 'nineinferior': 0x2089, 'parenleftinferior': 0x208D,
+    'parenrightinferior': 0x208E,
+
+    # Currency
+    'colonmonetary': 0x20A1, 'franc': 0x20A3, 'lira': 0x20A4, 'peseta': 0x20A7,
+    'dong': 0x20AB, 'Euro': 0x20AC, 'euro': 0x20AC,
+
+    # Letterlike symbols and number forms
+    'careof': 0x2105, 'Ifraktur': 0x2111, 'afii61289': 0x2113, 'weierstrass': 0x2118,
+    'Rfraktur': 0x211C, 'prescription': 0x211E, 'trademark': 0x2122,
+    'estimated': 0x212E, 'aleph': 0x2135, 'onethird': 0x2153, 'twothirds': 0x2154,
+    'oneeighth': 0x215B, 'threeeighths': 0x215C, 'fiveeighths': 0x215D,
+    'seveneighths': 0x215E,
+
+    # Arrows
+    'arrowleft': 0x2190, 'arrowup': 0x2191, 'arrowright': 0x2192, 'arrowdown': 0x2193,
+    'arrowboth': 0x2194, 'arrowupdn': 0x2195, 'arrowupdnbse': 0x21A8,
+    'carriagereturn': 0x21B5, 'arrowdblleft': 0x21D0, 'arrowdblup': 0x21D1,
+    'arrowdblright': 0x21D2, 'arrowdbldown': 0x21D3, 'arrowdblboth': 0x21D4,
+
+    # Mathematical operators
+    'universal': 0x2200, 'partialdiff': 0x2202, 'existential': 0x2203,
+    'emptyset': 0x2205, 'increment': 0x2206, 'gradient': 0x2207, 'element': 0x2208,
+    'notelement': 0x2209, 'suchthat': 0x220B, 'product': 0x220F,
+    'summation': 0x2211, 'minus': 0x2212, 'asteriskmath': 0x2217, 'radical': 0x221A,
+    'proportional': 0x221D, 'infinity': 0x221E, 'orthogonal': 0x221F,
+    'angle': 0x2220, 'logicaland': 0x2227, 'logicalor': 0x2228,
+    'intersection': 0x2229, 'union': 0x222A, 'integral': 0x222B,
+    'therefore': 0x2234, 'similar': 0x223C, 'congruent': 0x2245,
+    'approxequal': 0x2248, 'notequal': 0x2260, 'equivalence': 0x2261,
+    'lessequal': 0x2264, 'greaterequal': 0x2265, 'propersubset': 0x2282,
+    'propersuperset': 0x2283, 'notsubset': 0x2284, 'reflexsubset': 0x2286,
+    'reflexsuperset': 0x2287, 'circleplus': 0x2295, 'circlemultiply': 0x2297,
+    'perpendicular': 0x22A5, 'dotmath': 0x22C5,
+
+    # Technical
+    'house': 0x2302, 'revlogicalnot': 0x2310, 'integraltp': 0x2320,
+    'integralbt': 0x2321, 'angleleft': 0x2329, 'angleright': 0x232A,
+
+    # Box drawing and block elements
+    'SF100000': 0x2500, 'SF110000': 0x2502, 'SF010000': 0x250C, 'SF030000': 0x2510,
+    'SF020000': 0x2514, 'SF040000': 0x2518, 'SF080000': 0x251C, 'SF090000': 0x2524,
+    'SF060000': 0x252C, 'SF070000': 0x2534, 'SF050000': 0x253C,
+    'upblock': 0x2580, 'dnblock': 0x2584, 'block': 0x2588, 'lfblock': 0x258C,
+    'rtblock': 0x2590, 'ltshade': 0x2591, 'shade': 0x2592, 'dkshade': 0x2593,
+
+    # Geometric shapes and misc symbols
+    'filledbox': 0x25A0, 'H22073': 0x25A1, 'H18543': 0x25AA, 'H18551': 0x25AB,
+    'filledrect': 0x25AC, 'triagup': 0x25B2, 'triagrt': 0x25BA, 'triagdn': 0x25BC,
+    'triaglf': 0x25C4, 'lozenge': 0x25CA, 'circle': 0x25CB, 'H18533': 0x25CF,
+    'invbullet': 0x25D8, 'invcircle': 0x25D9, 'openbullet': 0x25E6,
+    'smileface': 0x263A, 'invsmileface': 0x263B, 'sun': 0x263C, 'female': 0x2640,
+    'male': 0x2642, 'spade': 0x2660, 'club': 0x2663, 'heart': 0x2665,
+    'diamond': 0x2666, 'musicalnote': 0x266A, 'musicalnotedbl': 0x266B,
+
+    # Alphabetic presentation forms
+    'ff': 0xFB00, 'fi': 0xFB01, 'fl': 0xFB02, 'ffi': 0xFB03, 'ffl': 0xFB04,
+}
+
+# Unicode accent names -> AGL accent suffixes, longest first
+ACCENTS = [
+    ('DOUBLE ACUTE', 'hungarumlaut'),
+    ('DOT ABOVE', 'dotaccent'),
+    ('DOT BELOW', 'dotbelow'),
+    ('HOOK ABOVE', 'hookabove'),
+    ('RING ABOVE', 'ring'),
+    ('DIAERESIS', 'dieresis'),
+    ('CIRCUMFLEX', 'circumflex'),
+    ('COMMA BELOW', 'commaaccent'),
+    ('MACRON', 'macron'),
+    ('OGONEK', 'ogonek'),
+    ('CEDILLA', 'cedilla'),
+    ('ACUTE', 'acute'),
+    ('GRAVE', 'grave'),
+    ('TILDE', 'tilde'),
+    ('CARON', 'caron'),
+    ('BREVE', 'breve'),
+    ('HORN', 'horn'),
+    ('TONOS', 'tonos'),
+    ('DIALYTIKA', 'dieresis'),
+]
+
+LATIN_RE = re.compile(r'^LATIN (CAPITAL|SMALL) LETTER ([A-Z]{1,2}) WITH (.+)$')
+GREEK_RE = re.compile(r'^GREEK (CAPITAL|SMALL) LETTER ([A-Z]+)(?: WITH (.+))?$')
+SMALL_CAPITAL_RE = re.compile(r'^LATIN LETTER SMALL CAPITAL ([A-Z]{1,2})$')
+
+# Derived names are only generated for these blocks
+DERIVED_RANGES = [(0x00C0, 0x024F), (0x0250, 0x02AF), (0x0370, 0x03FF),
+                  (0x1D00, 0x1D7F), (0x1E00, 0x1EFF)]
+
+# Cyrillic: AGL uses afii numbers, А..Я = afii10017..afii10049 (without Ё),
+# а..я = afii10065..afii10097
+CYRILLIC_CAPITALS = [cp for cp in range(0x0410, 0x0430)]
+CYRILLIC_SMALLS = [cp for cp in range(0x0430, 0x0450)]
+
+
+def accent_suffix(accents):
+    # "CIRCUMFLEX AND ACUTE" -> "circumflexacute"
+    suffix = ''
+    for part in accents.split(' AND '):
+        for uname, agl in ACCENTS:
+            if part == uname:
+                suffix += agl
+                break
+        else:
+            return None
+    return suffix
+
+
+def derive_name(cp):
+    try:
+        uname = unicodedata.name(chr(cp))
+    except ValueError:
+        return None
+
+    m = LATIN_RE.match(uname)
+    if m:
+        letter = m.group(2)
+        if m.group(1) == 'SMALL':
+            letter = letter.lower()
+        suffix = accent_suffix(m.group(3))
+        return letter + suffix if suffix else None
+
+    m = SMALL_CAPITAL_RE.match(uname)
+    if m:
+        # U+026A LATIN LETTER SMALL CAPITAL I -> Ismallcapital
+        return m.group(1) + 'smallcapital'
+
+    m = GREEK_RE.match(uname)
+    if m and cp < 0x0400:
+        letter = m.group(2).lower()
+        if letter == 'lamda':
+            letter = 'lambda'
+        if m.group(1) == 'CAPITAL':
+            letter = letter.capitalize()
+        if not m.group(3):
+            return letter
+        suffix = accent_suffix(m.group(3))
+        return letter + suffix if suffix else None
+
+    return None
+
+
+def derived_table():
+    table = {}
+    for start, end in DERIVED_RANGES:
+        for cp in range(start, end + 1):
+            name = derive_name(cp)
+            if name and name not in table:
+                table[name] = (cp,)
+
+    # ASCII letters
+    for cp in range(ord('A'), ord('Z') + 1):
+        table[chr(cp)] = (cp,)
+        table[chr(cp).lower()] = (cp + 0x20,)
+
+    afii = 10017
+    for cp in CYRILLIC_CAPITALS:
+        if afii == 10023:
+            afii += 1 # afii10023 is Ё (0x0401)
+        table[f'afii{afii}'] = (cp,)
+        afii += 1
+    afii = 10065
+    for cp in CYRILLIC_SMALLS:
+        if afii == 10071:
+            afii += 1 # afii10071 is ё (0x0451)
+        table[f'afii{afii}'] = (cp,)
+        afii += 1
+
+    for name, cp in AGL_NAMES.items():
+        table[name] = (cp,)
+    return table
+
+
+def read_adobe_list(filepath):
+    """Read glyphlist.txt ("name;HEX HEX") or aglfn.txt ("HEX;name;description")."""
+    table = {}
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(';')
+            if re.fullmatch(r'[0-9A-F]{4,6}', fields[0]):
+                name, codes = fields[1], fields[0]
+            else:
+                name, codes = fields[0], fields[1]
+            if name not in table:
+                table[name] = tuple(int(c, 16) for c in codes.split())
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precompiled Adobe Glyph List table (agl.dat).")
+    parser.add_argument("sources", nargs='*', help="Adobe glyphlist.txt and/or aglfn.txt")
+    parser.add_argument("-o", "--output", default="agl.dat", help="Output file (default: agl.dat)")
+    args = parser.parse_args()
+
+    table = derived_table()
+    for source in args.sources:
+        table.update(read_adobe_list(source))
+
+    text = ''.join(f"{name};{' '.join(f'{cp:04X}' for cp in codes)}\n"
+                   for name, codes in sorted(table.items()))
+    data = zlib.compress(text.encode('ascii'), 9)
+    with open(args.output, 'wb') as f:
+        f.write(data)
+    print(f"Written {len(table)} glyph names ({len(data)} bytes) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
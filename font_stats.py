@@ -0,0 +1,72 @@
+"""
+Glyph coverage statistics per Unicode block, shared by the BDF parser and
+the u8g2 decoder.
+
+Codepoints are sorted once and each block's glyphs are counted with two
+bisects, so even a CJK font with tens of thousands of glyphs ends up as a
+few dozen block lines.
+"""
+import bisect
+import json
+
+from unicode_blocks import block_of, BLOCK_STARTS, UNICODE_BLOCKS
+
+STATS_FORMATS = ['table', 'json', 'none']
+NO_BLOCK = 'No_Block'
+
+
+def block_coverage(codepoints):
+    """
+    Count codepoints per Unicode block.
+    Returns: list of (block start, block end, block name, count) in codepoint
+    order; codepoints outside any block are counted per gap as No_Block
+    """
+    cps = sorted(set(codepoints))
+    coverage = []
+    i = 0
+    while i < len(cps):
+        block = block_of(cps[i])
+        if block is None:
+            # The gap between the previous and the next block
+            nxt = bisect.bisect_right(BLOCK_STARTS, cps[i])
+            start = UNICODE_BLOCKS[nxt - 1][1] + 1 if nxt > 0 else 0
+            end = BLOCK_STARTS[nxt] - 1 if nxt < len(BLOCK_STARTS) else 0x10FFFF
+            name = NO_BLOCK
+        else:
+            start, end, name = block
+        j = bisect.bisect_right(cps, end, i)
+        coverage.append((start, end, name, j - i))
+        i = j
+    return coverage
+
+
+def format_stats_table(coverage, title):
+    total = sum(count for _, _, _, count in coverage)
+    width = max([len(name) for _, _, name, _ in coverage] + [5])
+    lines = [f"{title}: {total} glyphs in {len(coverage)} Unicode blocks"]
+    for start, end, name, count in coverage:
+        size = end - start + 1
+        lines.append(f"  {name:<{width}}  U+{start:04X}-U+{end:04X}  {count:>6} / {size:<6} {100 * count / size:5.1f}%")
+    return '\n'.join(lines)
+
+
+def format_stats_json(coverage, title):
+    return json.dumps({
+        'title': title,
+        'glyphs': sum(count for _, _, _, count in coverage),
+        'blocks': [{'name': name, 'start': start, 'end': end, 'glyphs': count}
+                   for start, end, name, count in coverage],
+    })
+
+
+def print_coverage(codepoints, title, stats_format='table'):
+    """Print the per-block coverage of codepoints as a table, a single JSON line, or not at all ('none')."""
+    if stats_format == 'none':
+        return
+    coverage = block_coverage(codepoints)
+    if not coverage:
+        return
+    if stats_format == 'json':
+        print(format_stats_json(coverage, title))
+    else:
+        print(format_stats_table(coverage, title))
@@ -0,0 +1,222 @@
+"""
+Glyph atlas export for host simulators and web previews: every glyph of a
+font (u8g2 C, raw u8g2 .bin or BDF) is decoded once and packed into a single
+1-bit PBM (P4) image, with a JSON sidecar describing where each codepoint is.
+
+Glyphs are placed with a skyline packer: the atlas keeps the top edge of
+what is already placed as a list of segments, and each glyph (tallest
+first) goes where its top ends up lowest. Glyphs with identical bitmaps
+(e.g. Latin A and Cyrillic A) share one atlas rectangle.
+
+The JSON sidecar:
+
+    {"font": ..., "image": "atlas.pbm", "width": W, "height": H,
+     "bbx": [w, h, x, y], "ascent": a, "descent": d,
+     "glyphs": {"65": {"atlas": [ax, ay, w, h], "offset": [x, y], "advance": d}, ...}}
+
+Metrics follow u8g2 (y up from the baseline, descent negative). A glyph is
+drawn by copying its atlas rectangle to (pen x + x, baseline y - y - h) in
+screen coordinates, then advancing the pen by d - as u8g2_render.py does.
+Empty glyphs (space) have "atlas": null.
+
+Usage:
+    python3 u8g2_atlas.py font.c -o atlas [--width N] [--padding N] [-m RANGE]
+
+Writes atlas.pbm and atlas.json.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import u8g2_to_bdf
+from u8g2_diff import read_bdf_glyph_keys
+from u8g2_render import Framebuffer
+
+
+class SkylinePacker:
+    """Bottom-left skyline rectangle packer for a fixed atlas width."""
+    def __init__(self, width):
+        self.width = width
+        # Top edge of the placed rectangles: [x, y, width] segments, left to right
+        self.skyline = [[0, 0, width]]
+        self.height = 0
+
+    def fit(self, i, w):
+        """Lowest y at which a w wide rectangle fits from segment i on, None if it runs past the right edge."""
+        x = self.skyline[i][0]
+        if x + w > self.width:
+            return None
+        y = 0
+        remaining = w
+        while remaining > 0:
+            _, sy, sw = self.skyline[i]
+            y = max(y, sy)
+            remaining -= sw
+            i += 1
+        return y
+
+    def insert(self, w, h):
+        """Place a w x h rectangle. Returns: (x, y) of its top left corner"""
+        best = None
+        for i in range(len(self.skyline)):
+            y = self.fit(i, w)
+            if y is None:
+                break
+            # Lowest top edge first, then leftmost
+            if best is None or y + h < best[0]:
+                best = (y + h, i, y)
+        _, i, y = best
+        x = self.skyline[i][0]
+        self.skyline.insert(i, [x, y + h, w])
+
+        # Cut the segments below the new one
+        end = x + w
+        j = i + 1
+        while j < len(self.skyline):
+            sx, sy, sw = self.skyline[j]
+            if sx >= end:
+                break
+            if sx + sw <= end:
+                del self.skyline[j]
+                continue
+            self.skyline[j] = [end, sy, sx + sw - end]
+            break
+
+        # Merge neighbours of the same height
+        j = max(i - 1, 0)
+        while j + 1 < len(self.skyline) and j <= i + 1:
+            if self.skyline[j][1] == self.skyline[j + 1][1]:
+                self.skyline[j][2] += self.skyline[j + 1][2]
+                del self.skyline[j + 1]
+            else:
+                j += 1
+
+        self.height = max(self.height, y + h)
+        return x, y
+
+
+def load_font(filepath, allowed_codepoints=None):
+    """
+    Decode every glyph of a font.
+    Returns: ({codepoint: (w, h, x, y, d, packed bitmap)}, font metrics dict)
+    """
+    if filepath.lower().endswith('.bdf'):
+        keys = read_bdf_glyph_keys(filepath)
+        # Font metrics from the lines before the first glyph
+        header_lines = []
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith('STARTCHAR'):
+                    break
+                header_lines.append(line)
+        _, font_bbx = u8g2_to_bdf.parse_bdf_lines(header_lines)
+        metrics = {'font': u8g2_to_bdf.font_name_from_path(filepath),
+                   'bbx': [font_bbx.get(k, 0) for k in ('w', 'h', 'x', 'y')],
+                   'ascent': font_bbx.get('ascent', 0),
+                   'descent': -font_bbx.get('descent', 0)}
+    else:
+        data, name = u8g2_to_bdf.FontLoader().load_u8g2(filepath)
+        if not data:
+            raise ValueError(f"Failed to read font data from {filepath}")
+        header = u8g2_to_bdf.read_u8g2_header(data)
+        if header is None:
+            raise ValueError(f"{filepath}: data too short for header")
+        keys = {uc: u8g2_to_bdf.decode_u8g2_glyph_packed(data, pos, header)
+                for uc, pos, _ in u8g2_to_bdf.iter_u8g2_glyphs(data, header)
+                if allowed_codepoints is None or uc in allowed_codepoints}
+        metrics = {'font': name,
+                   'bbx': [header['bbx_w'], header['bbx_h'], header['bbx_x'], header['bbx_y']],
+                   'ascent': header['ascent_A'],
+                   'descent': header['descent_g']}
+    if allowed_codepoints is not None:
+        keys = {uc: key for uc, key in keys.items() if uc in allowed_codepoints}
+    return keys, metrics
+
+
+def default_width(bitmaps, padding):
+    """Atlas width for a roughly square atlas, a multiple of 8 (whole PBM bytes)."""
+    area = sum((w + padding) * (h + padding) for w, h, _ in bitmaps)
+    widest = max(w + padding for w, _, _ in bitmaps)
+    width = max(widest, math.ceil(math.sqrt(area)))
+    return -(-width // 8) * 8
+
+
+def pack_atlas(keys, width=None, padding=0):
+    """
+    Pack the glyph bitmaps of keys (see load_font) into an atlas.
+    Returns: (Framebuffer, {codepoint: (ax, ay) or None for empty glyphs}, unique bitmaps)
+    """
+    bitmaps = sorted({(w, h, packed) for w, h, _, _, _, packed in keys.values() if w and h},
+                     key=lambda b: (-b[1], -b[0], b[2]))
+    if not bitmaps:
+        return Framebuffer(width or 8, 1), {uc: None for uc in keys}, 0
+    if width is None:
+        width = default_width(bitmaps, padding)
+    if width < max(w for w, _, _ in bitmaps) + padding:
+        raise ValueError(f"atlas width {width} is narrower than the widest glyph")
+
+    packer = SkylinePacker(width)
+    places = {bitmap: packer.insert(bitmap[0] + padding, bitmap[1] + padding) for bitmap in bitmaps}
+
+    fb = Framebuffer(width, max(packer.height - padding, 1))
+    for (w, h, packed), (ax, ay) in places.items():
+        mask = (1 << w) - 1
+        fb.blit({'w': w, 'rows': [packed >> ((h - 1 - r) * w) & mask for r in range(h)]}, ax, ay)
+
+    positions = {uc: places[(key[0], key[1], key[5])] if key[0] and key[1] else None
+                 for uc, key in keys.items()}
+    return fb, positions, len(bitmaps)
+
+
+def atlas_json(keys, positions, metrics, fb, image):
+    glyphs = {}
+    for uc in sorted(keys):
+        w, h, x, y, d, _ = keys[uc]
+        place = positions[uc]
+        glyphs[str(uc)] = {'atlas': [place[0], place[1], w, h] if place else None,
+                           'offset': [x, y],
+                           'advance': d}
+    return {'font': metrics['font'], 'image': image, 'width': fb.width, 'height': fb.height,
+            'bbx': metrics['bbx'], 'ascent': metrics['ascent'], 'descent': metrics['descent'],
+            'glyphs': glyphs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack all glyphs of a font into a 1-bit PBM atlas with a JSON sidecar.")
+    parser.add_argument("font", help="u8g2 C, raw u8g2 .bin or BDF font")
+    parser.add_argument("-o", "--output", default="atlas", help="Output path without extension, writes <output>.pbm and <output>.json (default: atlas)")
+    parser.add_argument("-m", "--map", help="Codepoints to include (same range spec as u8g2_to_bdf.py -m)")
+    parser.add_argument("--width", type=int, help="Atlas width in pixels (default: about square, a multiple of 8)")
+    parser.add_argument("--padding", type=int, default=0, help="Empty pixels to the right of and below each glyph (default: 0)")
+    args = parser.parse_args()
+
+    try:
+        allowed_codepoints = u8g2_to_bdf.parse_map_range(args.map)
+        start = time.perf_counter()
+        keys, metrics = load_font(args.font, allowed_codepoints)
+        decoded = time.perf_counter()
+        fb, positions, unique = pack_atlas(keys, args.width, args.padding)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    packed = time.perf_counter()
+
+    image = args.output + '.pbm'
+    with open(image, 'wb') as f:
+        f.write(fb.to_pbm())
+    with open(args.output + '.json', 'w') as f:
+        json.dump(atlas_json(keys, positions, metrics, fb, os.path.basename(image)), f, separators=(',', ':'))
+        f.write('\n')
+
+    used = sum(w * h for w, h, _, _, _, _ in {(k[0], k[1], k[5]): k for k in keys.values()}.values())
+    fill = 100 * used / (fb.width * fb.height)
+    print(f"{len(keys)} glyphs, {unique} unique bitmaps, atlas {fb.width}x{fb.height} ({fill:.1f}% used)")
+    print(f"Decoded in {decoded - start:.3f}s, packed in {packed - decoded:.3f}s")
+    print(f"Written {image} and {args.output}.json")
+
+
+if __name__ == "__main__":
+    main()
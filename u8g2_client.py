@@ -0,0 +1,65 @@
+"""
+Drop-in replacement for u8g2_to_bdf.py that sends the command line to a
+running u8g2_server.py. Takes the same arguments and prints the same output;
+falls back to converting in-process when no server is listening.
+
+Usage:
+    python3 u8g2_client.py <u8g2_to_bdf.py arguments>
+"""
+import json
+import os
+import socket
+import sys
+
+import u8g2_to_bdf
+from u8g2_server import DEFAULT_SOCKET, SOCKET_ENV
+
+
+def absolute_paths(args):
+    # The server may run in another working directory
+    for name in u8g2_to_bdf.PATH_ARGS:
+        value = getattr(args, name, None)
+        if isinstance(value, list):
+            setattr(args, name, [os.path.abspath(v) for v in value])
+        elif value:
+            setattr(args, name, os.path.abspath(value))
+
+
+def call_server(path, args):
+    """Returns: the run result dict, or None if no server is listening on path."""
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': 'run', 'params': {'args': vars(args)}}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as f:
+                line = f.readline()
+    except (OSError, AttributeError):
+        # No server (or no Unix sockets on this platform)
+        return None
+
+    if not line:
+        return None
+    response = json.loads(line)
+    if 'error' in response:
+        print(f"Server error: {response['error']['message']}")
+        sys.exit(1)
+    return response['result']
+
+
+def main():
+    args = u8g2_to_bdf.build_parser().parse_args()
+
+    # Watch mode and BDF record extraction print as they go, run them locally
+    if not args.watch and not args.extract:
+        absolute_paths(args)
+        result = call_server(os.environ.get(SOCKET_ENV, DEFAULT_SOCKET), args)
+        if result is not None:
+            sys.stdout.write(result['stdout'])
+            sys.exit(result['exit_code'])
+
+    u8g2_to_bdf.run(args)
+
+
+if __name__ == "__main__":
+    main()
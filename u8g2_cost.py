@@ -0,0 +1,195 @@
+"""
+Decode cost model for u8g2 fonts: estimates how many CPU cycles the device
+spends to find and draw each glyph.
+
+The glyphs are decoded with the regular decoder (decode_u8g2_glyph) while it
+counts its operations, and the glyph lookup of u8g2_font_get_glyph_data() is
+replayed to count the glyph records it steps over. Each operation costs a
+configurable number of cycles:
+
+- glyphs:       per drawn glyph (call overhead, header setup)
+- lookup_steps: per glyph record or jump table entry passed while searching
+- field_reads:  per bit field read (5 metrics fields, 2 per RLE pair)
+- bits:         per bit in those fields
+- pairs:        per RLE pair (loop overhead)
+- repeat_bits:  per unary repeat bit
+- segments:     per drawn run piece (runs are split at row ends), i.e. per line draw call
+- pixels:       per pixel of the glyph box
+
+The defaults are a rough guess for a small Cortex-M0 class MCU drawing into
+a frame buffer; calibrate them with --cycles against a measurement on the
+real device.
+
+Usage:
+    python3 u8g2_cost.py font.c [--strings strings.po] [--top N] [--cycles pairs=12,segments=40] [--mhz 48]
+"""
+import argparse
+import sys
+
+import u8g2_to_bdf
+
+DEFAULT_CYCLES = {
+    'glyphs': 150,
+    'lookup_steps': 12,
+    'field_reads': 20,
+    'bits': 4,
+    'pairs': 15,
+    'repeat_bits': 10,
+    'segments': 40,
+    'pixels': 2,
+}
+DEFAULT_TOP = 20
+
+
+def parse_cycles(spec):
+    """Parse "op=cycles,op=cycles" into a copy of DEFAULT_CYCLES with those values replaced."""
+    cycles = dict(DEFAULT_CYCLES)
+    if not spec:
+        return cycles
+    for item in spec.split(','):
+        op, sep, value = item.partition('=')
+        op = op.strip()
+        if not sep or op not in cycles:
+            raise ValueError(f"expected op=cycles with op one of {', '.join(cycles)}, got '{item}'")
+        cycles[op] = float(value)
+    return cycles
+
+
+def _word(data, pos):
+    return (data[pos] << 8) | data[pos + 1]
+
+
+def u8g2_lookup_steps(data, codepoint):
+    """
+    Replay u8g2_font_get_glyph_data() for codepoint.
+    Returns: number of glyph records and jump table entries it reads
+    """
+    font = 23
+    steps = 0
+    if codepoint <= 255:
+        if codepoint >= ord('a'):
+            font += _word(data, 19)
+        elif codepoint >= ord('A'):
+            font += _word(data, 17)
+        while font + 1 < len(data):
+            steps += 1
+            if data[font + 1] == 0 or data[font] == codepoint:
+                break
+            font += data[font + 1]
+        return steps
+
+    font += _word(data, 21)
+    table = font
+    while table + 3 < len(data):
+        steps += 1
+        font += _word(data, table)
+        last = _word(data, table + 2)
+        table += 4
+        if last >= codepoint:
+            break
+    while font + 2 < len(data):
+        steps += 1
+        uc = _word(data, font)
+        if uc == 0 or uc == codepoint:
+            break
+        font += data[font + 2]
+    return steps
+
+
+class FontCostModel:
+    """Per glyph operation counts and cycle estimates of a u8g2 font."""
+    def __init__(self, data, cycles=None):
+        self.data = data
+        self.cycles = cycles or dict(DEFAULT_CYCLES)
+        self.header = u8g2_to_bdf.read_u8g2_header(data)
+        if self.header is None:
+            raise ValueError("Data too short for header")
+        self.glyphs = {}
+        for uc, pos, _ in u8g2_to_bdf.iter_u8g2_glyphs(data, self.header):
+            counts = {'glyphs': 1, 'lookup_steps': u8g2_lookup_steps(data, uc)}
+            glyph = u8g2_to_bdf.decode_u8g2_glyph(data, pos, self.header, counts)
+            self.glyphs[uc] = (glyph, counts, self.cost(counts))
+
+    def cost(self, counts):
+        return sum(self.cycles[op] * n for op, n in counts.items())
+
+    def string_cost(self, text):
+        """Returns: (cycles to draw text, codepoints not in the font)"""
+        total = 0
+        missing = []
+        for ch in text:
+            entry = self.glyphs.get(ord(ch))
+            if entry is None:
+                # u8g2 still searches the font before skipping the glyph
+                missing.append(ord(ch))
+                total += self.cycles['glyphs'] + self.cycles['lookup_steps'] * u8g2_lookup_steps(self.data, ord(ch))
+            else:
+                total += entry[2]
+        return total, missing
+
+
+def format_cycles(cycles, mhz):
+    if mhz:
+        return f"{cycles:.0f} cycles ({cycles / mhz:.1f} us)"
+    return f"{cycles:.0f} cycles"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate the decode and draw cost of u8g2 font glyphs on the device.")
+    parser.add_argument("font", help="u8g2 C or raw u8g2 .bin font")
+    parser.add_argument("--strings", help="Also estimate the cost of these strings (UTF-8 text, gettext .po or JSON string table)")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help=f"Number of most expensive glyphs/strings to list (default: {DEFAULT_TOP}, 0 for all)")
+    parser.add_argument("--cycles", help="Cycles per operation, e.g. \"pairs=12,segments=40\" (ops: " + ', '.join(DEFAULT_CYCLES) + ")")
+    parser.add_argument("--mhz", type=float, help="CPU clock in MHz, to also print times")
+    args = parser.parse_args()
+
+    try:
+        cycles = parse_cycles(args.cycles)
+    except ValueError as e:
+        print(f"Invalid --cycles: {e}")
+        sys.exit(1)
+
+    data, name = u8g2_to_bdf.FontLoader().load_u8g2(args.font)
+    if not data:
+        print("Failed to read data")
+        sys.exit(1)
+    model = FontCostModel(data, cycles)
+    if not model.glyphs:
+        print("No glyphs in font")
+        sys.exit(1)
+
+    entries = sorted(model.glyphs.items(), key=lambda item: item[1][2], reverse=True)
+    costs = [cost for _, (_, _, cost) in entries]
+    print(f"Font {name}: {len(entries)} glyphs, m0={model.header['m0']}, m1={model.header['m1']}")
+    print(f"  average {format_cycles(sum(costs) / len(costs), args.mhz)}, "
+          f"max {format_cycles(costs[0], args.mhz)}, whole font {format_cycles(sum(costs), args.mhz)}")
+    print(f"  cycles per op: {', '.join(f'{op}={n:g}' for op, n in cycles.items())}")
+
+    shown = entries if args.top == 0 else entries[:args.top]
+    print("\nMost expensive glyphs:")
+    print(f"  {'glyph':<8} {'size':>7} {'lookup':>6} {'fields':>6} {'bits':>6} {'pairs':>6} {'repeat':>6} {'runs':>6} {'cycles':>8}")
+    for uc, (glyph, counts, cost) in shown:
+        size = f"{glyph['w']}x{glyph['h']}"
+        print(f"  U+{uc:04X}   {size:>7} {counts['lookup_steps']:>6} {counts['field_reads']:>6} {counts['bits']:>6} "
+              f"{counts['pairs']:>6} {counts['repeat_bits']:>6} {counts['segments']:>6} {cost:>8.0f}")
+
+    if args.strings:
+        results = []
+        missing = set()
+        for text in u8g2_to_bdf.iter_corpus_strings(args.strings):
+            cost, string_missing = model.string_cost(text)
+            missing.update(string_missing)
+            results.append((cost, text))
+        if results:
+            total = sum(cost for cost, _ in results)
+            print(f"\nStrings: {len(results)}, average {format_cycles(total / len(results), args.mhz)}, "
+                  f"total {format_cycles(total, args.mhz)}")
+            results.sort(key=lambda r: r[0], reverse=True)
+            for cost, text in (results if args.top == 0 else results[:args.top]):
+                print(f"  {format_cycles(cost, args.mhz)}: {text!r}")
+        if missing:
+            print(f"Warning: {len(missing)} codepoints are not in the font")
+
+
+if __name__ == "__main__":
+    main()
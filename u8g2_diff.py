@@ -0,0 +1,223 @@
+"""
+Glyph level diff of two font versions, in any combination of BDF, u8g2 C
+and raw u8g2 .bin fonts.
+
+Every glyph is reduced to a key of its metrics (w, h, x, y, d) and its
+bitmap packed into one int (row major, first pixel in the most significant
+bit). The int is built straight from the BDF hex rows or from the u8g2 RLE
+runs, so no per-pixel lists are created. Between two u8g2 fonts with the
+same RLE parameters and field widths, glyphs whose record bytes are equal
+are equal without decoding anything; only the other ones are decoded.
+
+Like the encoder, empty BDF glyphs other than space are ignored, so a BDF
+compares equal to the u8g2 font made from it.
+
+Usage:
+    python3 u8g2_diff.py old.c new.bdf [--art] [--limit N]
+
+Exit code 1 if the fonts differ.
+"""
+import argparse
+import sys
+
+import u8g2_to_bdf
+
+DEFAULT_LIMIT = 50
+
+
+def read_bdf_glyph_keys(filepath):
+    """Returns: {codepoint: (w, h, x, y, d, packed bitmap)} of a BDF file"""
+    keys = {}
+    uc = name = bbx = None
+    d = 0
+    rows = None
+    with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if rows is not None:
+                if not line.startswith('ENDCHAR'):
+                    rows.append(line)
+                    continue
+                if uc is not None and bbx is not None:
+                    w, h = bbx[0], bbx[1]
+                    packed = 0
+                    for row in rows[:h]:
+                        bits = len(row) * 4
+                        val = int(row, 16) if row else 0
+                        # Drop the padding bits of the last hex digit
+                        val = val >> (bits - w) if bits >= w else val << (w - bits)
+                        packed = (packed << w) | (val & ((1 << w) - 1))
+                    packed <<= w * max(0, h - len(rows))
+                    if (w and h and packed) or uc == 32:
+                        keys[uc] = (w, h, bbx[2], bbx[3], d, packed)
+                rows = None
+            elif line.startswith('STARTCHAR'):
+                parts = line.split(None, 1)
+                name = parts[1] if len(parts) > 1 else None
+                uc = bbx = None
+                d = 0
+            elif line.startswith('ENCODING'):
+                encoding = int(line.split()[1])
+                uc = encoding if encoding >= 0 else u8g2_to_bdf.char_name_to_unicode(name)
+            elif line.startswith('DWIDTH'):
+                d = int(line.split()[1])
+            elif line.startswith('BBX'):
+                bbx = tuple(int(v) for v in line.split()[1:5])
+            elif line.startswith('BITMAP'):
+                rows = []
+    return keys
+
+
+class FontGlyphs:
+    """Glyph keys of a font; u8g2 glyphs are only decoded when their key is asked for."""
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.data = self.header = None
+        self.keys = {}
+        self.records = {}
+        if filepath.lower().endswith('.bdf'):
+            self.keys = read_bdf_glyph_keys(filepath)
+            self.codepoints = set(self.keys)
+            return
+        self.data, _ = u8g2_to_bdf.FontLoader().load_u8g2(filepath)
+        if not self.data:
+            raise ValueError(f"Failed to read font data from {filepath}")
+        self.header = u8g2_to_bdf.read_u8g2_header(self.data)
+        if self.header is None:
+            raise ValueError(f"{filepath}: data too short for header")
+        # Glyph record: start of the bit fields and the whole record size
+        self.records = {uc: (pos, size) for uc, pos, size in u8g2_to_bdf.iter_u8g2_glyphs(self.data, self.header)}
+        self.codepoints = set(self.records)
+
+    @property
+    def is_u8g2(self):
+        return self.data is not None
+
+    def encoding(self):
+        """RLE parameters and field widths (header bytes 2-8): equal glyphs have equal bytes"""
+        return bytes(self.data[2:9]) if self.is_u8g2 else None
+
+    def key(self, uc):
+        key = self.keys.get(uc)
+        if key is None:
+            pos = self.records[uc][0]
+            key = u8g2_to_bdf.decode_u8g2_glyph_packed(self.data, pos, self.header)
+            self.keys[uc] = key
+        return key
+
+    def raw(self, uc):
+        """Bit fields of a u8g2 glyph record"""
+        pos, size = self.records[uc]
+        # The record starts with 2 (Block 1) or 3 (Block 2) bytes of unicode and offset
+        start = pos - (2 if uc <= 255 else 3)
+        return bytes(self.data[pos:start + size])
+
+    def size(self, uc):
+        """Record bytes of a u8g2 glyph, None for BDF fonts"""
+        record = self.records.get(uc)
+        return record[1] if record else None
+
+    def describe(self):
+        if self.is_u8g2:
+            return f"u8g2, {len(self.codepoints)} glyphs, {len(self.data)} bytes"
+        return f"BDF, {len(self.codepoints)} glyphs"
+
+
+def diff_fonts(old, new):
+    """Returns: (added, removed, changed) sorted codepoint lists"""
+    added = sorted(new.codepoints - old.codepoints)
+    removed = sorted(old.codepoints - new.codepoints)
+    same_encoding = old.is_u8g2 and new.is_u8g2 and old.encoding() == new.encoding()
+    changed = []
+    for uc in sorted(old.codepoints & new.codepoints):
+        if same_encoding and old.raw(uc) == new.raw(uc):
+            continue
+        if old.key(uc) != new.key(uc):
+            changed.append(uc)
+    return added, removed, changed
+
+
+def format_ranges(codepoints):
+    """"U+0041-U+005A, U+0104" style list of codepoint ranges"""
+    ranges = u8g2_to_bdf.CodepointRangeSet.from_codepoints(codepoints).intervals()
+    return ', '.join(f"U+{a:04X}" if a == b else f"U+{a:04X}-U+{b:04X}" for a, b in ranges)
+
+
+def format_char(uc):
+    ch = chr(uc)
+    return repr(ch) if ch.isprintable() else ''
+
+
+def format_metrics(key):
+    w, h, x, y, d, _ = key
+    return f"{w}x{h}{x:+d}{y:+d} d{d}"
+
+
+def glyph_art(key):
+    """Rows of '#' and '.' for a glyph key."""
+    w, h, _, _, _, packed = key
+    return [format(packed >> ((h - 1 - r) * w) & ((1 << w) - 1), f'0{w}b').replace('0', '.').replace('1', '#')
+            for r in range(h)] if w else []
+
+
+def print_side_by_side(old_key, new_key):
+    left = glyph_art(old_key)
+    right = glyph_art(new_key)
+    width = max([len(row) for row in left] + [3])
+    for i in range(max(len(left), len(right))):
+        a = left[i] if i < len(left) else ''
+        b = right[i] if i < len(right) else ''
+        print(f"    {a:<{width}}   {b}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two fonts (BDF, u8g2 C or .bin) glyph by glyph.")
+    parser.add_argument("old", help="Old font")
+    parser.add_argument("new", help="New font")
+    parser.add_argument("--art", action="store_true", help="Print the changed glyphs as ASCII art, old left, new right")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help=f"Number of changed glyphs to list (default: {DEFAULT_LIMIT}, 0 for all)")
+    args = parser.parse_args()
+
+    try:
+        old = FontGlyphs(args.old)
+        new = FontGlyphs(args.new)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    added, removed, changed = diff_fonts(old, new)
+    sizes = old.is_u8g2 and new.is_u8g2
+
+    print(f"Old: {args.old} ({old.describe()})")
+    print(f"New: {args.new} ({new.describe()})")
+    if sizes:
+        print(f"Size: {len(old.data)} -> {len(new.data)} bytes ({len(new.data) - len(old.data):+d})")
+
+    if added:
+        extra = f", {sum(new.size(uc) for uc in added)} bytes" if sizes else ""
+        print(f"Added {len(added)}{extra}: {format_ranges(added)}")
+    if removed:
+        extra = f", {sum(old.size(uc) for uc in removed)} bytes" if sizes else ""
+        print(f"Removed {len(removed)}{extra}: {format_ranges(removed)}")
+    if changed:
+        print(f"Changed {len(changed)}:")
+        for uc in changed if args.limit == 0 else changed[:args.limit]:
+            old_key = old.key(uc)
+            new_key = new.key(uc)
+            line = f"  U+{uc:04X} {format_char(uc):<4} {format_metrics(old_key)} -> {format_metrics(new_key)}"
+            if sizes:
+                line += f", {old.size(uc)} -> {new.size(uc)} bytes ({new.size(uc) - old.size(uc):+d})"
+            print(line)
+            if args.art:
+                print_side_by_side(old_key, new_key)
+        if args.limit and len(changed) > args.limit:
+            print(f"  ... {len(changed) - args.limit} more")
+
+    if not (added or removed or changed):
+        print("No glyph differences")
+    else:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Metrics-only string measurement for u8g2 and BDF fonts, for bulk layout checks.
+
+Only the w/h/x/y/d fields of each glyph are read (for u8g2 fonts the RLE
+bitmaps are never decoded) and kept in a codepoint table. String widths
+follow u8g2_GetStrWidth(): the sum of the advance widths, except that the
+last glyph counts with its ink extent (x + w) instead of its advance.
+Glyphs missing from the font are skipped, as u8g2 does.
+
+Usage:
+    python3 u8g2_measure.py font.c strings.po --max-width 128
+
+Lists every string wider than --max-width pixels. Strings containing
+newlines are measured line by line.
+"""
+import argparse
+import sys
+import time
+from itertools import repeat
+
+import u8g2_to_bdf
+
+
+class FontMetrics:
+    """Codepoint table of glyph metrics: codepoint -> (w, h, x, y, d)."""
+    def __init__(self, metrics, ascent=0, descent=0):
+        self.metrics = metrics
+        self.ascent = ascent
+        self.descent = descent
+        # Per character tables for the string width fast path
+        self.advance = {chr(uc): m[4] for uc, m in metrics.items()}
+        self.last_adjust = {chr(uc): (m[2] + m[0] - m[4] if m[0] else 0) for uc, m in metrics.items()}
+
+    @classmethod
+    def from_u8g2(cls, data):
+        header = u8g2_to_bdf.read_u8g2_header(data)
+        if header is None:
+            raise ValueError("Data too short for header")
+        metrics = {}
+        for uc, pos, _ in u8g2_to_bdf.iter_u8g2_glyphs(data, header):
+            br = u8g2_to_bdf.BitReader(data, pos)
+            metrics[uc] = u8g2_to_bdf.read_u8g2_glyph_metrics(br, header)
+        return cls(metrics, header['ascent_A'], header['descent_g'])
+
+    @classmethod
+    def from_bdf(cls, filepath):
+        """
+        Read the metrics of a BDF without converting any bitmaps. Like the
+        encoder, empty glyphs other than space are dropped (they are not in
+        the encoded font either).
+        """
+        metrics = {}
+        ascent = descent = 0
+        uc = name = bbx = None
+        d = 0
+        inked = in_bitmap = False
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if in_bitmap:
+                    if line.startswith('ENDCHAR'):
+                        in_bitmap = False
+                        if uc is not None and bbx is not None and ((inked and bbx[0] and bbx[1]) or uc == 32):
+                            metrics[uc] = (bbx[0], bbx[1], bbx[2], bbx[3], d)
+                    elif not inked and line.strip().strip('0'):
+                        inked = True
+                    continue
+                line = line.strip()
+                if line.startswith('STARTCHAR'):
+                    parts = line.split(None, 1)
+                    name = parts[1] if len(parts) > 1 else None
+                    uc = bbx = None
+                    d = 0
+                    inked = False
+                elif line.startswith('ENCODING'):
+                    encoding = int(line.split()[1])
+                    uc = encoding if encoding >= 0 else u8g2_to_bdf.char_name_to_unicode(name)
+                elif line.startswith('DWIDTH'):
+                    d = int(line.split()[1])
+                elif line.startswith('BBX'):
+                    bbx = tuple(int(v) for v in line.split()[1:5])
+                elif line.startswith('BITMAP'):
+                    in_bitmap = True
+                elif line.startswith('FONT_ASCENT'):
+                    ascent = int(line.split()[1])
+                elif line.startswith('FONT_DESCENT'):
+                    descent = -int(line.split()[1])
+        return cls(metrics, ascent, descent)
+
+    @classmethod
+    def from_file(cls, filepath):
+        if filepath.lower().endswith('.bdf'):
+            return cls.from_bdf(filepath)
+        data, _ = u8g2_to_bdf.FontLoader().load_u8g2(filepath)
+        if not data:
+            raise ValueError(f"Failed to read font data from {filepath}")
+        return cls.from_u8g2(data)
+
+    def string_width(self, text):
+        """Pixel width of a single line, as u8g2_GetStrWidth() computes it."""
+        if not text:
+            return 0
+        width = sum(map(self.advance.get, text, repeat(0)))
+        # Last glyph that is in the font: ink extent instead of advance
+        for ch in reversed(text):
+            if ch in self.last_adjust:
+                return width + self.last_adjust[ch]
+        return width
+
+    def text_width(self, text):
+        """Width of the widest line."""
+        if '\n' not in text:
+            return self.string_width(text)
+        return max(self.string_width(line) for line in text.split('\n'))
+
+    def measure(self, text):
+        """
+        Full measurement of a single line.
+        Returns: dict with width (u8g2_GetStrWidth), advance (sum of d) and the
+        ink bounding box (left, right, top, bottom) relative to the start of the
+        baseline, y up; None for the box if nothing is drawn.
+        """
+        pen = 0
+        left = top = right = bottom = None
+        for ch in text:
+            m = self.metrics.get(ord(ch))
+            if m is None:
+                continue
+            w, h, x, y, d = m
+            if w and h:
+                left = pen + x if left is None else min(left, pen + x)
+                right = pen + x + w if right is None else max(right, pen + x + w)
+                top = y + h if top is None else max(top, y + h)
+                bottom = y if bottom is None else min(bottom, y)
+            pen += d
+        bbox = None if left is None else (left, right, top, bottom)
+        return {'width': self.string_width(text), 'advance': pen, 'bbox': bbox}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure strings with the metrics of a u8g2 or BDF font.")
+    parser.add_argument("font", help="u8g2 C, raw u8g2 .bin or BDF font")
+    parser.add_argument("strings", help="Strings to measure: UTF-8 text (one per line), gettext .po or JSON string table")
+    parser.add_argument("--max-width", type=int, required=True, help="Maximum string width in pixels")
+    args = parser.parse_args()
+
+    try:
+        font = FontMetrics.from_file(args.font)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    strings = list(u8g2_to_bdf.iter_corpus_strings(args.strings))
+    start = time.perf_counter()
+    text_width = font.text_width
+    max_width = args.max_width
+    overflows = [(i, text, w) for i, text, w in
+                 ((i, text, text_width(text)) for i, text in enumerate(strings)) if w > max_width]
+    elapsed = time.perf_counter() - start
+
+    for i, text, w in overflows:
+        print(f"{i + 1}: {w}px (+{w - max_width}): {text!r}")
+    rate = len(strings) / elapsed if elapsed > 0 else 0
+    print(f"{len(overflows)} of {len(strings)} strings wider than {max_width}px "
+          f"(measured in {elapsed:.3f}s, {rate:.0f} strings/s)")
+    if overflows:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Host side text renderer for u8g2 fonts, for screenshot / visual regression tests.
+
+Lays out UTF-8 strings the way u8g2 draws them with the default baseline
+font position: each glyph is drawn at pen x + glyph x, with its bottom edge
+at baseline - glyph y, and the pen advances by glyph d. Lines are separated
+by "\\n" and are ascent - descent high (the ascent of 'A' and the descent
+of 'g' from the font header), with the first baseline at the ascent, as
+with u8g2_SetFontPosTop(); like on the device, pixels above the ascent
+(e.g. accents on capitals) are cut off in the first line. Pixels are
+blitted into a packed 1-bit framebuffer and written as binary PBM (P4) files.
+
+Glyphs are decoded on first use and kept in a bounded LRU cache, so the
+characters shared by thousands of screens are decoded once.
+
+Usage:
+    python3 u8g2_render.py font.c strings.txt -o screens/ [--cache-size N]
+
+The strings file is read like a --corpus file (text lines, .po or .json);
+each string is written to <output dir>/NNNNN.pbm.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import u8g2_to_bdf
+
+DEFAULT_CACHE_SIZE = 512
+
+
+class Framebuffer:
+    """
+    1-bit framebuffer, one Python int per row with the leftmost pixel in the
+    most significant bit - which is exactly the PBM P4 byte layout.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.rows = [0] * height
+
+    def blit(self, glyph, x, y):
+        """OR glyph (see GlyphCache.glyph) into the framebuffer with its top left corner at x, y."""
+        w = glyph['w']
+        for r, row in enumerate(glyph['rows']):
+            fy = y + r
+            if not row or fy < 0 or fy >= self.height:
+                continue
+            shift = self.width - x - w
+            # Clip at the left and right edge
+            row = row << shift if shift >= 0 else row >> -shift
+            self.rows[fy] |= row & ((1 << self.width) - 1)
+
+    def get_pixel(self, x, y):
+        return (self.rows[y] >> (self.width - 1 - x)) & 1
+
+    def to_pbm(self):
+        stride = (self.width + 7) // 8
+        pad = stride * 8 - self.width
+        data = b''.join((row << pad).to_bytes(stride, 'big') for row in self.rows)
+        return f"P4\n{self.width} {self.height}\n".encode('ascii') + data
+
+
+class GlyphCache:
+    """
+    Glyph lookup for a u8g2 font. The glyph list is walked once to map
+    codepoints to their bit fields; bitmaps are decoded on demand and kept in
+    an LRU cache of at most max_entries glyphs.
+    """
+    def __init__(self, data, max_entries=DEFAULT_CACHE_SIZE):
+        self.data = data
+        self.header = u8g2_to_bdf.read_u8g2_header(data)
+        if self.header is None:
+            raise ValueError("Data too short for header")
+        self.positions = {uc: pos for uc, pos, _ in u8g2_to_bdf.iter_u8g2_glyphs(data, self.header)}
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def glyph(self, codepoint):
+        """Returns: dict with w, h, x, y, d and the bitmap as one int per row, None if not in the font"""
+        glyph = self.cache.get(codepoint)
+        if glyph is not None:
+            self.cache.move_to_end(codepoint)
+            self.hits += 1
+            return glyph
+
+        pos = self.positions.get(codepoint)
+        if pos is None:
+            return None
+        self.misses += 1
+        glyph = u8g2_to_bdf.decode_u8g2_glyph(self.data, pos, self.header)
+        bitmap = glyph.pop('bitmap')
+        w = glyph['w']
+        glyph['rows'] = [int(''.join(map(str, bitmap[r * w:(r + 1) * w])) or '0', 2)
+                         for r in range(glyph['h'])]
+
+        self.cache[codepoint] = glyph
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return glyph
+
+
+def layout_text(cache, text):
+    """
+    Place the glyphs of text.
+    Returns: (list of (glyph, x, baseline y), width, height, missing codepoints)
+    """
+    header = cache.header
+    # descent_g is negative (below the baseline)
+    line_height = header['ascent_A'] - header['descent_g']
+    # Baseline of the first line: the ascent ends at y = 0
+    baseline = header['ascent_A']
+
+    placed = []
+    missing = []
+    width = 0
+    lines = text.split('\n')
+    for line in lines:
+        pen = 0
+        for ch in line:
+            glyph = cache.glyph(ord(ch))
+            if glyph is None:
+                # u8g2 skips glyphs that are not in the font
+                missing.append(ord(ch))
+                continue
+            placed.append((glyph, pen, baseline))
+            width = max(width, pen + glyph['x'] + glyph['w'], pen + glyph['d'])
+            pen += glyph['d']
+        baseline += line_height
+    return placed, max(width, 1), max(line_height * len(lines), 1), missing
+
+
+def render_text(cache, text):
+    """Returns: (Framebuffer, missing codepoints)"""
+    placed, width, height, missing = layout_text(cache, text)
+    fb = Framebuffer(width, height)
+    for glyph, x, baseline in placed:
+        fb.blit(glyph, x + glyph['x'], baseline - glyph['y'] - glyph['h'])
+    return fb, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render strings with a u8g2 font to PBM images.")
+    parser.add_argument("font", help="u8g2 C or raw u8g2 .bin font")
+    parser.add_argument("strings", help="Strings to render: UTF-8 text (one per line), gettext .po or JSON string table")
+    parser.add_argument("-o", "--output", default="screens", help="Output directory for the PBM files (default: screens)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help=f"Decoded glyphs kept in the LRU cache (default: {DEFAULT_CACHE_SIZE})")
+    args = parser.parse_args()
+
+    data, _ = u8g2_to_bdf.FontLoader().load_u8g2(args.font)
+    if not data:
+        print("Failed to read data")
+        sys.exit(1)
+    cache = GlyphCache(data, args.cache_size)
+    os.makedirs(args.output, exist_ok=True)
+
+    count = 0
+    missing = set()
+    start = time.perf_counter()
+    for text in u8g2_to_bdf.iter_corpus_strings(args.strings):
+        fb, string_missing = render_text(cache, text)
+        missing.update(string_missing)
+        with open(os.path.join(args.output, f"{count:05d}.pbm"), 'wb') as f:
+            f.write(fb.to_pbm())
+        count += 1
+    elapsed = time.perf_counter() - start
+
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"Rendered {count} strings in {elapsed:.3f}s ({rate:.0f} strings/s) to {args.output}")
+    print(f"Glyph cache: {cache.misses} decoded, {cache.hits} hits, {len(cache.cache)}/{cache.max_entries} cached")
+    if missing:
+        listed = ', '.join(f"U+{uc:04X}" for uc in sorted(missing)[:20])
+        print(f"Warning: {len(missing)} codepoints are not in the font: {listed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Persistent conversion server for u8g2_to_bdf.py.
+
+Build systems that call the converter hundreds of times pay interpreter
+startup, module import and a cold font parse on every call. This server
+stays running, keeps an LRU cache of parsed fonts (keyed by the SHA-256 of
+the file content, so edits are picked up) and answers JSON-RPC 2.0 requests,
+one JSON object per line, either on a Unix socket or on stdin/stdout.
+
+Methods:
+- run:           {"args": {...}} - a full command line as parsed by u8g2_client.py
+- encode:        {"input": "font.bdf", "output": "font.c", "map": "32-126"}
+- decode:        {"input": "font.c", "output": "font.bdf", "map": null}
+- encode_corpus: {"input": "font.bdf", "output": "font.c", "corpus": ["strings.po"], "corpus_base": "32-126"}
+- stats:         {} - cache statistics
+
+Every method returns {"exit_code": int, "stdout": str} with what the CLI
+would have printed. Paths should be absolute (the client shim takes care
+of that).
+
+Usage:
+    python3 u8g2_server.py [--socket PATH | --stdio] [--workers N] [--cache-size N]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import u8g2_to_bdf
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'u8g2_to_bdf.sock')
+SOCKET_ENV = 'U8G2_SERVER_SOCKET'
+DEFAULT_WORKERS = 4
+DEFAULT_CACHE_SIZE = 32
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class ThreadLocalStdout:
+    """
+    sys.stdout replacement that sends each worker thread's output to its own
+    buffer, so concurrent requests each get exactly what they printed.
+    Captures nest (the innermost one gets the output). Threads without a
+    buffer write to the original stream.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def _buffers(self):
+        if not hasattr(self.local, 'buffers'):
+            self.local.buffers = []
+        return self.local.buffers
+
+    def capture(self):
+        self._buffers().append(io.StringIO())
+
+    def release(self):
+        return self._buffers().pop().getvalue()
+
+    def write(self, text):
+        buffers = self._buffers()
+        return (buffers[-1] if buffers else self.stream).write(text)
+
+    def flush(self):
+        if not self._buffers():
+            self.stream.flush()
+
+
+class CachingFontLoader(u8g2_to_bdf.FontLoader):
+    """
+    FontLoader with an LRU cache of parsed fonts keyed by content hash.
+    What a BDF parse prints (block coverage, ENCODING -1 warnings) is
+    captured through stdout (a ThreadLocalStdout) and cached with the
+    glyphs, so a cache hit prints the same as the parse did.
+    """
+    def __init__(self, stdout, max_entries=DEFAULT_CACHE_SIZE):
+        self.stdout = stdout
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key, parse):
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+        # Parse outside the lock, other requests keep going meanwhile
+        value = parse()
+        with self.lock:
+            self.misses += 1
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _content_hash(filepath):
+        h = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    def load_bdf(self, filepath, allowed_codepoints=None, jobs=1, stats='table'):
+        key = ('bdf', self._content_hash(filepath), str(allowed_codepoints), stats)
+
+        def parse():
+            self.stdout.capture()
+            try:
+                glyphs, font_bbx = u8g2_to_bdf.parse_bdf_file(filepath, allowed_codepoints, jobs, stats)
+            finally:
+                output = self.stdout.release()
+            return glyphs, font_bbx, output
+
+        glyphs, font_bbx, output = self._lookup(key, parse)
+        print(output, end='')
+        # Callers may reorder or filter the glyph list, hand out copies
+        return list(glyphs), dict(font_bbx)
+
+    def load_u8g2(self, filepath):
+        key = ('u8g2', self._content_hash(filepath), u8g2_to_bdf.is_bin_file(filepath))
+
+        def parse():
+            if u8g2_to_bdf.is_bin_file(filepath):
+                # Cached data must outlive the request, so read instead of mmap
+                with open(filepath, 'rb') as f:
+                    return f.read() or None, u8g2_to_bdf.font_name_from_path(filepath)
+            return u8g2_to_bdf.parse_c_file(filepath)
+
+        data, name = self._lookup(key, parse)
+        if data is None:
+            with self.lock:
+                self.cache.pop(key, None)
+        return data, name
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.cache), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+def default_args():
+    """All options with their CLI defaults."""
+    return vars(u8g2_to_bdf.build_parser().parse_args(['-']))
+
+
+class ConversionServer:
+    def __init__(self, workers=DEFAULT_WORKERS, cache_size=DEFAULT_CACHE_SIZE):
+        self.stdout = ThreadLocalStdout(sys.stdout)
+        sys.stdout = self.stdout
+        self.loader = CachingFontLoader(self.stdout, cache_size)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def close(self):
+        self.pool.shutdown()
+        sys.stdout = self.stdout.stream
+
+    def run_args(self, overrides):
+        args = default_args()
+        unknown = set(overrides) - set(args)
+        if unknown:
+            raise ValueError(f"Unknown options: {', '.join(sorted(unknown))}")
+        args.update(overrides)
+        if args['watch']:
+            raise ValueError("--watch is not supported by the server")
+
+        self.stdout.capture()
+        exit_code = 0
+        try:
+            u8g2_to_bdf.run(argparse.Namespace(**args), self.loader)
+        except SystemExit as e:
+            if isinstance(e.code, str):
+                print(e.code)
+                exit_code = 1
+            else:
+                exit_code = e.code or 0
+        except Exception as e:
+            print(f"Error: {e!r}")
+            exit_code = 1
+        finally:
+            output = self.stdout.release()
+        return {'exit_code': exit_code, 'stdout': output}
+
+    # JSON-RPC methods
+
+    def rpc_run(self, args):
+        return self.run_args(args)
+
+    def rpc_encode(self, input, output, map=None, **options):
+        return self.run_args(dict(options, input_file=input, output=output, map=map, encode=True))
+
+    def rpc_decode(self, input, output, map=None, **options):
+        return self.run_args(dict(options, input_file=input, output=output, map=map, encode=False))
+
+    def rpc_encode_corpus(self, input, output, corpus, corpus_base=u8g2_to_bdf.DEFAULT_CORPUS_BASE, map=None, **options):
+        return self.run_args(dict(options, input_file=input, output=output, map=map, encode=True,
+                                  corpus=corpus, corpus_base=corpus_base))
+
+    def rpc_stats(self):
+        return self.loader.stats()
+
+    def handle(self, line):
+        """Handle one JSON-RPC request line. Returns: response dict, or None for notifications"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return error_response(None, PARSE_ERROR, f"Parse error: {e}")
+
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return error_response(None, INVALID_REQUEST, "Invalid request")
+
+        request_id = request.get('id')
+        method = getattr(self, 'rpc_' + request['method'], None)
+        if method is None:
+            return error_response(request_id, METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+
+        params = request.get('params') or {}
+        try:
+            result = method(**params) if isinstance(params, dict) else method(*params)
+        except (TypeError, ValueError) as e:
+            return error_response(request_id, INVALID_PARAMS, str(e))
+        except Exception as e:
+            return error_response(request_id, INTERNAL_ERROR, repr(e))
+
+        if 'id' not in request:
+            return None
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    def submit(self, line):
+        return self.pool.submit(self.handle, line)
+
+
+def error_response(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+def serve_stdio(server):
+    """Requests on stdin, responses on stdout (possibly out of order, match them by id)."""
+    out = server.stdout.stream
+    write_lock = threading.Lock()
+
+    def respond(future):
+        response = future.result()
+        if response is not None:
+            with write_lock:
+                out.write(json.dumps(response) + '\n')
+                out.flush()
+
+    for line in sys.stdin:
+        if line.strip():
+            server.submit(line).add_done_callback(respond)
+
+
+def serve_socket(server, path):
+    """Requests on a Unix socket, one JSON object per line, any number per connection."""
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                response = server.submit(line.decode('utf-8')).result()
+                if response is not None:
+                    self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+                    self.wfile.flush()
+
+    class ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    if os.path.exists(path):
+        os.unlink(path)
+    with ThreadingUnixServer(path, Handler) as unix_server:
+        server.stdout.stream.write(f"Listening on {path}\n")
+        server.stdout.stream.flush()
+        try:
+            unix_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent u8g2/BDF conversion server (JSON-RPC 2.0).")
+    parser.add_argument("--socket", default=os.environ.get(SOCKET_ENV, DEFAULT_SOCKET),
+                        help=f"Unix socket path (default: ${SOCKET_ENV} or {DEFAULT_SOCKET})")
+    parser.add_argument("--stdio", action="store_true", help="Serve on stdin/stdout instead of a socket")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Worker threads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help=f"Parsed fonts kept in the LRU cache (default: {DEFAULT_CACHE_SIZE})")
+    args = parser.parse_args()
+
+    server = ConversionServer(args.workers, args.cache_size)
+    try:
+        if args.stdio:
+            serve_stdio(server)
+        else:
+            serve_socket(server, args.socket)
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
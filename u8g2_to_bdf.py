@@ -1,6 +1,21 @@
 import sys
+import os
 import re
+import mmap
+import hashlib
+import time
+import json
+import bisect
+import zlib
 import argparse
+import fnmatch
+import threading
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from unicode_blocks import find_block, block_of
+from font_stats import print_coverage, STATS_FORMATS
 
 # PostScript character name to Unicode mapping for common characters
 # Based on Adobe Glyph List and common PostScript names
@@ -116,13 +131,102 @@ POSTSCRIPT_TO_UNICODE = {
     'asciitilde': 0x007E,
 }
 
+# Adobe Glyph List names, precompiled by build_agl_table.py from Adobe's
+# glyphlist.txt and aglfn.txt (plus derived names they don't cover).
+# Loaded on first use only, i.e. when a glyph name is not in
+# POSTSCRIPT_TO_UNICODE.
+AGL_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agl.dat')
+
+_agl_table = None
+_agl_lock = threading.Lock()
+_ligature_table = None
+
+
+def load_agl_table():
+    """
+    Return the Adobe Glyph List as dict name -> tuple of codepoints.
+    agl.dat is zlib compressed "name;HEX[ HEX...]" lines.
+    """
+    global _agl_table
+    if _agl_table is not None:
+        return _agl_table
+    # Server threads may ask at the same time: the table is loaded once and
+    # only published when it is complete
+    with _agl_lock:
+        if _agl_table is None:
+            table = {}
+            try:
+                with open(AGL_TABLE_FILE, 'rb') as f:
+                    text = zlib.decompress(f.read()).decode('ascii')
+            except (OSError, zlib.error) as e:
+                print(f"Warning: Could not load Adobe Glyph List {AGL_TABLE_FILE}: {e}")
+                text = ''
+            for line in text.splitlines():
+                name, codes = line.split(';')
+                table[name] = tuple(int(c, 16) for c in codes.split())
+            _agl_table = table
+    return _agl_table
+
+
+def _ligature_codepoint(sequence):
+    # f_i -> U+FB01: presentation forms whose compatibility decomposition is the sequence
+    global _ligature_table
+    if _ligature_table is None:
+        # Filled before it is published, like the AGL table
+        table = {}
+        for cp in range(0xFB00, 0xFB50):
+            decomposed = unicodedata.normalize('NFKD', chr(cp))
+            if len(decomposed) > 1 and decomposed != chr(cp):
+                table.setdefault(decomposed, cp)
+        _ligature_table = table
+    return _ligature_table.get(sequence)
+
+
+def _is_scalar_value(cp):
+    # Unicode scalar values exclude surrogates
+    return cp <= 0x10FFFF and not (0xD800 <= cp <= 0xDFFF)
+
+
+def agl_component_to_unicode(component):
+    """
+    Map one component of a glyph name to a codepoint sequence following the
+    AGL specification: AGL names, uniXXXX[XXXX...] and uXXXX[X[X]].
+    Returns: tuple of codepoints, or None
+    """
+    codes = POSTSCRIPT_TO_UNICODE.get(component)
+    if codes is not None:
+        return (codes,)
+
+    codes = load_agl_table().get(component)
+    if codes is not None:
+        return codes
+
+    hex_part = component[3:]
+    if (component.startswith('uni') and hex_part and len(hex_part) % 4 == 0 and
+            re.fullmatch(r'[0-9A-F]+', hex_part)):
+        codes = tuple(int(hex_part[i:i + 4], 16) for i in range(0, len(hex_part), 4))
+        if all(_is_scalar_value(cp) for cp in codes):
+            return codes
+
+    hex_part = component[1:]
+    if component.startswith('u') and 4 <= len(hex_part) <= 6 and re.fullmatch(r'[0-9A-F]+', hex_part):
+        cp = int(hex_part, 16)
+        if _is_scalar_value(cp):
+            return (cp,)
+
+    return None
+
+
 def char_name_to_unicode(char_name):
     """
     Convert character name to Unicode codepoint.
-    Handles three formats:
+    Handles these formats:
     1. U+XXXX format (e.g., U+0104)
-    2. PostScript names (e.g., Aogonek, cacute, lslash)
-    3. uni+XXXX format (alternative Unicode format)
+    2. PostScript names (e.g., Aogonek, cacute, lslash), including the full
+       Adobe Glyph List (loaded on first use)
+    3. uniXXXX and uXXXX[X[X]] names as defined by the AGL specification
+    4. Ligature names joined by '_' (e.g., f_i), mapped to the single
+       precomposed or presentation form codepoint if there is one
     
     Returns: Unicode codepoint as int, or None if not found
     """
@@ -136,21 +240,42 @@ def char_name_to_unicode(char_name):
         except ValueError:
             pass
     
-    # Try uni+XXXX format (alternative)
+    # Try common PostScript names first, without loading the full table
+    if char_name in POSTSCRIPT_TO_UNICODE:
+        return POSTSCRIPT_TO_UNICODE[char_name]
+
+    sequence = []
+    for component in char_name.split('_'):
+        codes = agl_component_to_unicode(component)
+        if codes is None:
+            sequence = None
+            break
+        sequence.extend(codes)
+
+    if sequence:
+        if len(sequence) == 1:
+            return sequence[0]
+        # A u8g2 glyph has a single codepoint: compose the sequence if possible
+        text = ''.join(chr(cp) for cp in sequence)
+        composed = unicodedata.normalize('NFC', text)
+        if len(composed) == 1:
+            return ord(composed)
+        return _ligature_codepoint(text)
+    
+    # Try uni+XXXX format (alternative, lenient: any case and length)
     if char_name.startswith('uni'):
         try:
             return int(char_name[3:], 16)
         except ValueError:
             pass
     
-    # Try PostScript name mapping
-    return POSTSCRIPT_TO_UNICODE.get(char_name)
+    return None
 
 
 class BitReader:
-    def __init__(self, data):
+    def __init__(self, data, start=0):
         self.data = data
-        self.byte_idx = 0
+        self.byte_idx = start # Byte offset into data, avoids slicing (and copying) the font buffer
         self.bit_idx = 0 # 0 to 7, 7 is MSB? No, u8g2 usually LSB first or MSB? 
         # "The data format of U8G2 fonts is based on the BDF font format. Its glyph bitmaps are compressed with a run-length-encoding algorithm"
         # "All following glyph data does not rely on byte boundaries"
@@ -182,132 +307,282 @@ class BitReader:
         val -= (1 << (num_bits - 1))
         return val
 
-def parse_c_file(filepath):
-    with open(filepath, 'r') as f:
-        content = f.read()
-    
-    # regex to find the array
-    # const uint8_t u8g2_font_logisoso16_tn[287] U8G2_FONT_SECTION("u8g2_font_logisoso16_tn") = 
-    #   "\22\0\3\3\4\5\3\5\5\11\23\0\377\20\374\20\0\0\0\0\0\1\2 \5\0\10\65*\21x\272"
-    # ...
-    #   "\377\377\0";
-    
-    # We need to extract the string content.
-    # It might be split across lines.
-    
-    match = re.search(r'=\s*((?:"(?:[^"\\]|\\.)*"\s*)+);', content, re.DOTALL)
-    if not match:
-        print("Could not find font data array in file. Regex match failed.")
-        print(f"Content snippet: {content[:200]}...")
-        return None, None
+# Font arrays in C sources, e.g.
+# const uint8_t u8g2_font_logisoso16_tn[287] U8G2_FONT_SECTION("u8g2_font_logisoso16_tn") = 
+#   "\22\0\3\3\4\5\3\5\5\11\23\0\377\20\374\20\0\0\0\0\0\1\2 \5\0\10\65*\21x\272"
+#   ...
+#   "\377\377\0";
+# Attribute macros without arguments (PROGMEM, ...) may appear before the
+# name or before the '='; 'section' is the macro with a name argument.
+C_FONT_RE = re.compile(
+    r'(?:const\s+)?uint8_t\s+(?:\w+\s+)*?(?P<name>\w+)\s*\[\s*\w*\s*\]\s*'
+    r'(?:(?:(?P<section>\w+)\s*\(\s*"[^"]*"\s*\)|\w+)\s*)*'
+    r'=\s*(?P<data>(?:"(?:[^"\\]|\\.)*"\s*)+);', re.DOTALL)
 
-    raw_string = match.group(1)
-    # Clean up the string: remove quotes and whitespace between parts
-    # "part1"
-    # "part2" -> "part1part2"
-    
-    # This is a bit tricky because of escapes.
-    # We should probably just eval it if it's safe-ish, or parse it manually.
-    # Since it's C string literal syntax, python's ast.literal_eval might not work directly if it has C-specific escapes (like octal \123).
-    # Python supports octal escapes in strings too.
-    
-    # Let's try to join them and use a custom parser or simple eval if format allows.
-    # The example has "\22\0...", which is octal. Python supports this.
-    
+
+def iter_c_fonts(content):
+    """
+    Yield a match for every font array in C source text, with the groups
+    'name', 'section' (e.g. U8G2_FONT_SECTION, may be None) and 'data' (the string literal).
+    """
+    return C_FONT_RE.finditer(content)
+
+
+def decode_c_string(raw_string):
+    """
+    Convert a (possibly split) C string literal to bytes, including the
+    terminating NUL the compiler appends: u8g2 fonts rely on it as their
+    last byte.
+    """
     # Remove newlines and surrounding whitespace between quotes
     combined_string = re.sub(r'"\s*"', '', raw_string)
     # Remove leading/trailing quotes
     combined_string = combined_string.strip().strip('"')
+
+    decoded_data = bytearray()
     
-    # Now we have a string like \22\0\3...
-    # We need to convert this to bytes.
-    # We can use python's string escape decoding.
-    
-    # In Python 3, we can use:
-    # bytes(combined_string, "utf-8").decode("unicode_escape").encode("latin1")
-    # But wait, \22 is octal 22 = 18 decimal.
-    # Python's unicode_escape handles octal.
-    
-    try:
-        # We need to wrap it in quotes to make it a valid python string literal for evaluation,
-        # OR just process it.
-        # simpler:
-        # Use a dummy byte string literal
-        # b = b"\22\0..."
-        
-        # But we have it as a string variable.
-        # Let's try:
-        decoded_data = b""
-        
-        # Manual parsing of octal/hex escapes might be safer and robust
-        i = 0
-        while i < len(combined_string):
-            if combined_string[i] == '\\':
+    # Manual parsing of octal/hex escapes might be safer and robust
+    i = 0
+    while i < len(combined_string):
+        if combined_string[i] == '\\':
+            i += 1
+            if i >= len(combined_string): break
+            c = combined_string[i]
+            if '0' <= c <= '7':
+                # Octal, up to 3 digits
+                octal_str = c
                 i += 1
-                if i >= len(combined_string): break
-                c = combined_string[i]
-                if '0' <= c <= '7':
-                    # Octal, up to 3 digits
-                    octal_str = c
+                if i < len(combined_string) and '0' <= combined_string[i] <= '7':
+                    octal_str += combined_string[i]
                     i += 1
                     if i < len(combined_string) and '0' <= combined_string[i] <= '7':
                         octal_str += combined_string[i]
                         i += 1
-                        if i < len(combined_string) and '0' <= combined_string[i] <= '7':
-                            octal_str += combined_string[i]
-                            i += 1
-                    decoded_data += bytes([int(octal_str, 8)])
-                elif c == 'x':
-                    # Hex
-                    i += 1
-                    hex_str = combined_string[i:i+2]
-                    decoded_data += bytes([int(hex_str, 16)])
-                    i += 2
-                elif c == '\\':
-                    decoded_data += b'\\'
-                    i += 1
-                elif c == '"':
-                    decoded_data += b'"'
-                    i += 1
-                else:
-                    # other escapes like \n, \r, but font data usually uses octal/hex for binary
-                    # or just literal char
-                    # If it's just a char escaped, take it?
-                    # But wait, standard C escapes: \n \t etc.
-                    # The example file only shows octal so far.
-                    pass 
-            else:
-                decoded_data += bytes([ord(combined_string[i])])
+                decoded_data += bytes([int(octal_str, 8)])
+            elif c == 'x':
+                # Hex
                 i += 1
-                
-        return decoded_data, "font_name_placeholder" # TODO extract name
-        
+                hex_str = combined_string[i:i+2]
+                decoded_data += bytes([int(hex_str, 16)])
+                i += 2
+            elif c == '\\':
+                decoded_data += b'\\'
+                i += 1
+            elif c == '"':
+                decoded_data += b'"'
+                i += 1
+            else:
+                # other escapes like \n, \r, but font data usually uses octal/hex for binary
+                # or just literal char
+                # If it's just a char escaped, take it?
+                # But wait, standard C escapes: \n \t etc.
+                # The example file only shows octal so far.
+                pass 
+        else:
+            decoded_data += bytes([ord(combined_string[i])])
+            i += 1
+            
+    return bytes(decoded_data) + b'\0'
+
+
+def parse_c_file(filepath):
+    """Returns: (data, name) of the first font array in a C file, (None, None) on error"""
+    with open(filepath, 'r') as f:
+        content = f.read()
+
+    match = next(iter_c_fonts(content), None)
+    if match:
+        name, raw_string = match.group('name'), match.group('data')
+    else:
+        # Not a declaration we know, take any string literal assignment
+        match = re.search(r'=\s*((?:"(?:[^"\\]|\\.)*"\s*)+);', content, re.DOTALL)
+        if not match:
+            print("Could not find font data array in file. Regex match failed.")
+            print(f"Content snippet: {content[:200]}...")
+            return None, None
+        name, raw_string = font_name_from_path(filepath), match.group(1)
+
+    try:
+        return decode_c_string(raw_string), name
     except Exception as e:
         print(f"Error parsing string data: {e}")
         return None, None
 
 
-def parse_bdf_file(filepath, map_range=None):
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-        
-    glyphs = []
-    current_glyph = None
-    
-    font_bbx = {}
-    
-    # Parse map range
-    allowed_codepoints = set()
-    if map_range:
-        # Format: "32-255, 300"
-        parts = map_range.split(',')
-        for p in parts:
-            if '-' in p:
-                start, end = map(int, p.split('-'))
-                allowed_codepoints.update(range(start, end + 1))
+def is_bin_file(filepath):
+    """Raw binary font blobs (as stored in external flash) use the .bin extension."""
+    return filepath.lower().endswith('.bin')
+
+
+def font_name_from_path(filepath):
+    # "fonts/my_font.bin" -> "my_font"
+    return os.path.splitext(os.path.basename(filepath))[0]
+
+
+def read_bin_file(filepath):
+    """
+    Map a raw u8g2 font blob into memory.
+
+    The file is accessed through mmap, so even multi-megabyte fonts are
+    decoded straight from the page cache without reading or copying them.
+    The caller should close() the returned buffer when done.
+
+    Returns: (buffer, font name) or (None, None) on error
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                print(f"Font file is empty: {filepath}")
+                return None, None
+            # The mapping stays valid after the file object is closed
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        print(f"Error mapping binary font file: {e}")
+        return None, None
+
+    return data, font_name_from_path(filepath)
+
+
+
+def parse_codepoint(text):
+    """Parse a single codepoint given as decimal, 0x hex or U+ hex."""
+    text = text.strip()
+    if text[:2].upper() in ('U+', '0X'):
+        return int(text[2:], 16)
+    # Decimal, leading zeros allowed ("032-126")
+    return int(text, 10)
+
+
+MAX_CODEPOINT = 0x10FFFF
+
+
+class CodepointRangeSet:
+    """
+    Set of codepoints stored as sorted, merged [start, end] intervals.
+    Membership is a bisect over the interval starts, so "0-65535" costs two
+    ints instead of 65536 set entries.
+    """
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if start > end:
+                continue
+            if self.ends and start <= self.ends[-1] + 1:
+                # Overlapping or adjacent, merge
+                self.ends[-1] = max(self.ends[-1], end)
             else:
-                allowed_codepoints.add(int(p))
-    
+                self.starts.append(start)
+                self.ends.append(end)
+
+    @classmethod
+    def from_codepoints(cls, codepoints):
+        return cls((cp, cp) for cp in codepoints)
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Parse a range spec. Comma separated items, each one of:
+        - a codepoint: 300, 0x12C, U+012C
+        - a range: 32-126, 0x100-0x17F, U+0100-U+017F
+        - a Unicode block name: Latin Extended-A, latin_extended_a
+        A leading ~ excludes the item ("32-255,~0x7F-0x9F"). A spec with only
+        exclusions starts from the full Unicode range.
+        Raises ValueError on a malformed item.
+        """
+        include = []
+        exclude = []
+        for item in spec.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            target = include
+            if item.startswith('~'):
+                target = exclude
+                item = item[1:].strip()
+
+            block = find_block(item)
+            if block:
+                target.append((block[0], block[1]))
+            elif '-' in item:
+                start, end = item.split('-', 1)
+                target.append((parse_codepoint(start), parse_codepoint(end)))
+            else:
+                cp = parse_codepoint(item)
+                target.append((cp, cp))
+
+        if not include and exclude:
+            include = [(0, MAX_CODEPOINT)]
+        return cls(include).difference(cls(exclude))
+
+    def __contains__(self, codepoint):
+        i = bisect.bisect_right(self.starts, codepoint) - 1
+        return i >= 0 and codepoint <= self.ends[i]
+
+    def __len__(self):
+        return sum(end - start + 1 for start, end in self.intervals())
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def __iter__(self):
+        for start, end in self.intervals():
+            yield from range(start, end + 1)
+
+    def __eq__(self, other):
+        return (isinstance(other, CodepointRangeSet) and
+                self.starts == other.starts and self.ends == other.ends)
+
+    def intervals(self):
+        return list(zip(self.starts, self.ends))
+
+    def union(self, other):
+        return CodepointRangeSet(self.intervals() + other.intervals())
+
+    def difference(self, other):
+        result = []
+        for start, end in self.intervals():
+            # Cut every overlapping excluded interval out of [start, end]
+            i = max(0, bisect.bisect_right(other.starts, start) - 1)
+            while i < len(other.starts) and other.starts[i] <= end:
+                if other.ends[i] >= start:
+                    if other.starts[i] > start:
+                        result.append((start, other.starts[i] - 1))
+                    start = other.ends[i] + 1
+                i += 1
+            if start <= end:
+                result.append((start, end))
+        return CodepointRangeSet(result)
+
+    def intersection(self, other):
+        return self.difference(CodepointRangeSet([(0, MAX_CODEPOINT)]).difference(other))
+
+    def __str__(self):
+        return ','.join(str(start) if start == end else f"{start}-{end}"
+                        for start, end in self.intervals())
+
+    def __repr__(self):
+        return f"CodepointRangeSet({self.intervals()!r})"
+
+
+def parse_map_range(map_range):
+    """
+    Parse a -m range spec (see CodepointRangeSet.parse).
+    Returns: CodepointRangeSet, or None if no filter was given
+    """
+    if not map_range:
+        return None
+    return CodepointRangeSet.parse(map_range)
+
+
+def parse_bdf_lines(lines, allowed_codepoints=None):
+    """
+    BDF state machine. Works on a whole file as well as on any range of
+    complete STARTCHAR..ENDCHAR records (see parse_bdf_file with jobs > 1).
+
+    Returns: (glyphs, font_bbx)
+    """
+    font_bbx = {}
     
     glyphs = []
     current_glyph = None
@@ -363,32 +638,8 @@ def parse_bdf_file(filepath, map_range=None):
         elif line.startswith("ENDCHAR"):
             in_bitmap = False
             if current_glyph and 'uc' in current_glyph:
-                if not map_range or current_glyph['uc'] in allowed_codepoints:
+                if allowed_codepoints is None or current_glyph['uc'] in allowed_codepoints:
                     # Process bitmap
-                    flat_bitmap = []
-                    for hex_line in current_glyph['bitmap_hex']:
-                        val = int(hex_line, 16)
-                        total_bits_in_line = len(hex_line) * 4
-                        for i in range(total_bits_in_line):
-                            bit = (val >> (total_bits_in_line - 1 - i)) & 1
-                            flat_bitmap.append(bit)
-                        # Truncate row to width (BDF pads to byte)
-                        # Wait, flat_bitmap is growing. We need to slice the last added row.
-                        # Actually, easier to slice after appending row.
-                        
-                        # Correct logic:
-                        # We appended total_bits_in_line bits.
-                        # We only want the first w bits of this row.
-                        # But we already appended them to flat_bitmap? 
-                        # No, we appended all.
-                        
-                        # Let's fix:
-                        # We need to keep only w bits from the current row.
-                        # The current row starts at len(flat_bitmap) - total_bits_in_line
-            # Let's rewrite the inner loop
-                        pass
-                    
-                    # Re-implementation of bitmap processing
                     final_bitmap = []
                     for hex_line in current_glyph['bitmap_hex']:
                         val = int(hex_line, 16)
@@ -417,212 +668,834 @@ def parse_bdf_file(filepath, map_range=None):
         else:
             if in_bitmap and current_glyph:
                 current_glyph['bitmap_hex'].append(line)
-                
-    # Print statistics about parsed glyphs
-    if glyphs:
-        unicode_ranges = {}
-        for g in glyphs:
-            uc = g['uc']
-            if uc < 128:
-                unicode_ranges['ASCII (0-127)'] = unicode_ranges.get('ASCII (0-127)', 0) + 1
-            elif uc < 256:
-                unicode_ranges['Latin-1 (128-255)'] = unicode_ranges.get('Latin-1 (128-255)', 0) + 1
-            elif uc < 0x0180:
-                unicode_ranges['Latin Extended-A (0x100-0x17F)'] = unicode_ranges.get('Latin Extended-A (0x100-0x17F)', 0) + 1
-            elif uc < 0x0250:
-                unicode_ranges['Latin Extended-B (0x180-0x24F)'] = unicode_ranges.get('Latin Extended-B (0x180-0x24F)', 0) + 1
-            else:
-                unicode_ranges[f'Other (0x{uc:04X})'] = unicode_ranges.get(f'Other (0x{uc:04X})', 0) + 1
-        
-        print(f"Parsed {len(glyphs)} glyphs from BDF:")
-        for range_name, count in sorted(unicode_ranges.items()):
-            print(f"  {range_name}: {count} glyphs")
-    
+
     return glyphs, font_bbx
 
-def main():
-    parser = argparse.ArgumentParser(description='Convert u8g2 font C file to BDF, or BDF to u8g2 C file.')
-    parser.add_argument('input_file', help='Input file (C or BDF)')
-    parser.add_argument('-o', '--output', help='Output file', default='output')
-    parser.add_argument('-e', '--encode', action='store_true', help='Encode BDF to u8g2 C file')
-    parser.add_argument('-m', '--map', help='Unicode range to export (e.g. "32-255,300")', default=None)
-    
-    args = parser.parse_args()
-    
 
-class BitWriter:
-    def __init__(self):
-        self.data = bytearray()
-        self.current_byte = 0
-        self.bit_idx = 0 # 0 to 7
-        
-    def write_bits(self, val, num_bits):
-        for i in range(num_bits):
-            bit = (val >> i) & 1
-            if bit:
-                self.current_byte |= (1 << self.bit_idx)
-            
-            self.bit_idx += 1
-            if self.bit_idx == 8:
-                self.data.append(self.current_byte)
-                self.current_byte = 0
-                self.bit_idx = 0
-                
-    def write_signed_bits(self, val, num_bits):
-        # Excess-K encoding
-        # val = stored_val - (1 << (num_bits - 1))
-        # stored_val = val + (1 << (num_bits - 1))
-        stored_val = val + (1 << (num_bits - 1))
-        self.write_bits(stored_val, num_bits)
-        
-    def flush(self):
-        if self.bit_idx > 0:
-            self.data.append(self.current_byte)
-            self.current_byte = 0
-            self.bit_idx = 0
-            
-    def get_bytes(self):
-        self.flush()
-        return bytes(self.data)
+# BDF glyph index
+#
+# One pass over an mmap of the BDF records the byte offsets of every
+# STARTCHAR, ENCODING and ENDCHAR line. The index is stored next to the BDF
+# (font.bdf -> font.bdf.idx) and rebuilt whenever the BDF size or mtime changes.
 
-def encode_rle(bitmap, m0, m1):
-    # RLE compression
-    # m0 bits for zeros
-    # m1 bits for ones
-    # n bits for repeat
-    
-    # We need to find runs of 0s and 1s.
-    # Sequence: 0s, 1s.
-    # If we have 0s then 1s, that's one sequence.
-    # If we have 0s then 0s? No, runs are greedy.
-    
-    # But wait, the format is:
-    # run_0 (m0 bits)
-    # run_1 (m1 bits)
-    # repeat (unary)
-    
-    # So we must encode pairs of (zeros, ones).
-    # If we have only zeros, run_1 = 0.
-    # If we have only ones, run_0 = 0.
-    
-    encoded_bits = [] # List of (val, bits) tuples to write later
-    
-    # First, convert bitmap to RLE pairs
-    pairs = []
-    idx = 0
-    while idx < len(bitmap):
-        # Count zeros
-        zeros = 0
-        while idx < len(bitmap) and bitmap[idx] == 0:
-            zeros += 1
-            idx += 1
-            
-        # Count ones
-        ones = 0
-        while idx < len(bitmap) and bitmap[idx] == 1:
-            ones += 1
-            idx += 1
-            
-        pairs.append((zeros, ones))
-        
-    # Now compress pairs
-    # We can repeat the previous pair if it matches.
-    
-    # We need to handle field overflows.
-    # Max zeros = (1 << m0) - 1
-    # Max ones = (1 << m1) - 1
-    
-    # If a run is too long, we must split it.
-    # Splitting strategy:
-    # If zeros > max, we emit (max, 0) and remaining zeros.
-    # If ones > max, we emit (zeros, max) and remaining ones (with 0 zeros).
-    
-    # Let's normalize pairs first to fit in m0/m1
-    normalized_pairs = []
-    max_0 = (1 << m0) - 1
-    max_1 = (1 << m1) - 1
-    
-    for z, o in pairs:
-        while z > max_0:
-            normalized_pairs.append((max_0, 0))
-            z -= max_0
-        
-        while o > max_1:
-            normalized_pairs.append((z, max_1))
-            z = 0
-            o -= max_1
-            
-        normalized_pairs.append((z, o))
-        
-    # Now encode with repeats
-    i = 0
-    bw = BitWriter()
-    
-    while i < len(normalized_pairs):
-        z, o = normalized_pairs[i]
-        
-        # Count repeats
-        repeat = 0
-        j = i + 1
-        while j < len(normalized_pairs) and normalized_pairs[j] == (z, o):
-            repeat += 1
-            j += 1
-            
-        # Write z (m0 bits)
-        bw.write_bits(z, m0)
-        # Write o (m1 bits)
-        bw.write_bits(o, m1)
-        # Write repeat (unary: 1s then 0)
-        for _ in range(repeat):
-            bw.write_bits(1, 1)
-        bw.write_bits(0, 1)
-        
-        i += 1 + repeat
-        
-    return bw.get_bytes(), bw.bit_idx + len(bw.data)*8 # Approximate bit count? No.
-    # BitWriter logic is a bit complex for just counting.
-    # Let's return the bit count properly.
-    # Actually get_bytes flushes, so len * 8 is upper bound.
-    # We need exact bit count for optimization?
-    # Yes, to pick best m0/m1.
-    
-    # Let's make BitWriter track bit count.
-    return bw
+BDF_INDEX_SUFFIX = '.idx'
+BDF_INDEX_VERSION = 1
 
-def calculate_encoded_size(glyphs, m0, m1):
-    total_bits = 0
-    for g in glyphs:
-        bw = encode_rle(g['bitmap'], m0, m1)
-        # We need exact bits written.
-        # BitWriter doesn't expose it easily in my implementation above.
-        # Let's update BitWriter.
-        # But wait, encode_rle returns a BitWriter instance now (in my thought).
-        # Let's fix encode_rle to return bits.
-        
-        # Actually, for optimization we don't need the bytes, just the size.
-        # But we need to do the work.
+BDF_RECORD_RE = re.compile(rb'^[ \t]*(STARTCHAR|ENCODING|ENDCHAR)\b[ \t]*([^\r\n]*)', re.MULTILINE)
+
+
+def scan_bdf_index(buf):
+    """
+    Scan a BDF buffer (bytes or mmap) for glyph records.
+
+    Returns: dict with 'header_end' (offset of the first STARTCHAR) and
+    'glyphs', a list of [startchar, encoding, endchar, record end,
+    ENCODING value, char name] entries in file order.
+    """
+    glyphs = []
+    header_end = None
+    start = enc_pos = None
+    encoding = None
+    name = None
+
+    for m in BDF_RECORD_RE.finditer(buf):
+        keyword = m.group(1)
+        if keyword == b'STARTCHAR':
+            start = m.start()
+            if header_end is None:
+                header_end = start
+            name = m.group(2).strip().decode('utf-8', 'replace') or None
+            enc_pos = None
+            encoding = None
+        elif keyword == b'ENCODING':
+            if start is not None:
+                enc_pos = m.start()
+                try:
+                    encoding = int(m.group(2).split()[0])
+                except (ValueError, IndexError):
+                    encoding = None
+        elif start is not None:
+            # ENDCHAR, the record ends after its line break
+            end = buf.find(b'\n', m.end())
+            end = len(buf) if end < 0 else end + 1
+            glyphs.append([start, enc_pos, m.start(), end, encoding, name])
+            start = None
+
+    return {
+        'header_end': len(buf) if header_end is None else header_end,
+        'glyphs': glyphs,
+    }
+
+
+def bdf_index_path(filepath):
+    return filepath + BDF_INDEX_SUFFIX
+
+
+def load_bdf_index(filepath, persist=True):
+    """
+    Return the glyph index of a BDF file, reusing the stored index if it
+    still matches the file. A fresh index is written next to the BDF
+    when persist is set (failures to write it are not fatal).
+    """
+    st = os.stat(filepath)
+    idx_path = bdf_index_path(filepath)
+
+    try:
+        with open(idx_path, 'r') as f:
+            index = json.load(f)
+        if (index.get('version') == BDF_INDEX_VERSION and
+                index.get('size') == st.st_size and
+                index.get('mtime_ns') == st.st_mtime_ns):
+            return index
+    except (OSError, ValueError):
         pass
-    return total_bits
 
-# Helper to get bit width of a value
-def get_bit_width(val):
-    if val == 0: return 0
-    return val.bit_length()
+    with open(filepath, 'rb') as f:
+        if st.st_size == 0:
+            index = scan_bdf_index(b'')
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                index = scan_bdf_index(buf)
 
-def get_signed_bit_width(val):
-    # For Excess-K, we need range.
-    # But u8g2 uses fixed bit width for all glyphs for a field.
-    # We need to find min/max of all glyphs.
-    pass
+    index['version'] = BDF_INDEX_VERSION
+    index['size'] = st.st_size
+    index['mtime_ns'] = st.st_mtime_ns
 
-def encode_u8g2(glyphs, font_bbx, font_name):
-    # 1. Determine optimal m0, m1
-    # Try all combinations m0=2..8, m1=2..7 (from bdfconv)
-    best_size = float('inf')
-    best_m0 = 3
-    best_m1 = 3
-    
-    # We need a fast way to calculate size without full encoding if possible.
+    if persist:
+        try:
+            with open(idx_path, 'w') as f:
+                json.dump(index, f, separators=(',', ':'))
+        except OSError as e:
+            print(f"Warning: Could not write BDF index {idx_path}: {e}")
+
+    return index
+
+
+def bdf_index_codepoint(entry):
+    """Codepoint of an index entry, resolving ENCODING -1 through the char name."""
+    encoding = entry[4]
+    if encoding is None:
+        return None
+    if encoding >= 0:
+        return encoding
+    if encoding == -1:
+        return char_name_to_unicode(entry[5])
+    return None
+
+
+def extract_bdf_record(filepath, codepoint, index=None):
+    """
+    Random access to a single glyph: returns the raw STARTCHAR..ENDCHAR text
+    of the given codepoint, or None if the font does not contain it.
+    """
+    if index is None:
+        index = load_bdf_index(filepath)
+
+    for entry in index['glyphs']:
+        if bdf_index_codepoint(entry) == codepoint:
+            with open(filepath, 'rb') as f:
+                f.seek(entry[0])
+                return f.read(entry[3] - entry[0]).decode('utf-8', 'replace')
+    return None
+
+
+def extract_bdf_glyph(filepath, codepoint, index=None):
+    """Parse a single glyph by codepoint. Returns: glyph dict or None"""
+    record = extract_bdf_record(filepath, codepoint, index)
+    if record is None:
+        return None
+    glyphs, _ = parse_bdf_lines(record.splitlines())
+    return glyphs[0] if glyphs else None
+
+
+def _parse_bdf_byte_ranges(filepath, ranges, allowed_codepoints):
+    # Worker: parse the complete glyph records in the given [start, end) byte ranges
+    glyphs = []
+    with open(filepath, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for start, end in ranges:
+                text = buf[start:end].decode('utf-8', 'replace')
+                glyphs.extend(parse_bdf_lines(text.splitlines(), allowed_codepoints)[0])
+    return glyphs
+
+
+def split_bdf_index(index, parts, allowed_codepoints=None):
+    """
+    Split the indexed glyph records into at most `parts` chunks of about equal
+    byte size, cut at glyph boundaries. Records whose ENCODING is known to be
+    outside the allowed codepoints are left out.
+
+    Returns: list of chunks in file order, each a list of (start, end) byte
+    ranges of adjacent records
+    """
+    entries = index['glyphs']
+    if allowed_codepoints is not None:
+        entries = [e for e in entries
+                   if e[4] is None or e[4] < 0 or e[4] in allowed_codepoints]
+    if not entries:
+        return []
+
+    total = sum(e[3] - e[0] for e in entries)
+    target = total / max(1, parts)
+
+    chunks = []
+    ranges = []
+    size = 0
+    for e in entries:
+        if size >= target and len(chunks) < parts - 1:
+            chunks.append(ranges)
+            ranges = []
+            size = 0
+        if ranges and ranges[-1][1] == e[0]:
+            # Adjacent record, extend the current range
+            ranges[-1] = (ranges[-1][0], e[3])
+        else:
+            ranges.append((e[0], e[3]))
+        size += e[3] - e[0]
+    chunks.append(ranges)
+
+    return chunks
+
+
+def parse_bdf_file(filepath, map_range=None, jobs=1, stats='table'):
+    # map_range: range spec string, or a codepoint container such as CodepointRangeSet
+    if map_range is None or isinstance(map_range, str):
+        allowed_codepoints = parse_map_range(map_range)
+    else:
+        allowed_codepoints = map_range
+
+    if jobs and jobs > 1:
+        # Indexed parallel parse: header serially, glyph records in a process pool
+        index = load_bdf_index(filepath)
+        with open(filepath, 'rb') as f:
+            header_text = f.read(index['header_end']).decode('utf-8', 'replace')
+        _, font_bbx = parse_bdf_lines(header_text.splitlines())
+
+        chunks = split_bdf_index(index, jobs, allowed_codepoints)
+        glyphs = []
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_parse_bdf_byte_ranges, filepath, ranges, allowed_codepoints)
+                       for ranges in chunks]
+            # Collect in submission order, so glyphs stay in file order
+            for future in futures:
+                glyphs.extend(future.result())
+    else:
+        with open(filepath, 'r') as f:
+            glyphs, font_bbx = parse_bdf_lines(f, allowed_codepoints)
+                
+    print_coverage([g['uc'] for g in glyphs], "Parsed glyphs from BDF", stats)
+
+    return glyphs, font_bbx
+
+
+# C font index
+#
+# Upstream u8g2 keeps thousands of fonts in one u8g2_fonts.c. A single scan
+# records the name, section, declared size and the byte range of the string
+# literal of every font array; the index is stored next to the C file
+# (u8g2_fonts.c -> u8g2_fonts.c.idx) and rebuilt when its size or mtime
+# changes, like the BDF glyph index. Selected fonts are then decoded straight
+# from their byte ranges.
+
+C_FONT_INDEX_VERSION = 2
+
+C_ARRAY_SIZE_RE = re.compile(r'\[\s*(\d+)\s*\]')
+
+
+def scan_c_font_index(content):
+    """
+    Scan C source text for font arrays.
+
+    Returns: list of [name, section, size in bytes, literal start, literal
+    end] entries in file order
+    """
+    fonts = []
+    for m in iter_c_fonts(content):
+        # The declared array size, like upstream's [287], includes the NUL as decode_c_string does
+        size = C_ARRAY_SIZE_RE.search(content, m.start(), m.start('data'))
+        size = int(size.group(1)) if size else len(decode_c_string(m.group('data')))
+        fonts.append([m.group('name'), m.group('section'), size, m.start('data'), m.end('data')])
+    return fonts
+
+
+def load_c_font_index(filepath, persist=True):
+    """
+    Return the font index of a C file, reusing the stored index if it still
+    matches the file. A fresh index is written next to the C file when
+    persist is set (failures to write it are not fatal).
+    """
+    st = os.stat(filepath)
+    idx_path = filepath + BDF_INDEX_SUFFIX
+
+    try:
+        with open(idx_path, 'r') as f:
+            index = json.load(f)
+        if (index.get('version') == C_FONT_INDEX_VERSION and
+                index.get('size') == st.st_size and
+                index.get('mtime_ns') == st.st_mtime_ns and
+                'fonts' in index):
+            return index
+    except (OSError, ValueError):
+        pass
+
+    # latin-1 maps every byte to one character, so string offsets are file offsets
+    with open(filepath, 'rb') as f:
+        content = f.read().decode('latin-1')
+    index = {
+        'version': C_FONT_INDEX_VERSION,
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'fonts': scan_c_font_index(content),
+    }
+
+    if persist:
+        try:
+            with open(idx_path, 'w') as f:
+                json.dump(index, f, separators=(',', ':'))
+        except OSError as e:
+            print(f"Warning: Could not write C font index {idx_path}: {e}")
+
+    return index
+
+
+def select_c_fonts(index, patterns=None):
+    """
+    Index entries whose name matches any of the names or glob patterns
+    (e.g. "u8g2_font_6x10_tf", "u8g2_font_helvB*_tf"), in file order.
+    All fonts without patterns.
+    """
+    if not patterns:
+        return list(index['fonts'])
+    return [e for e in index['fonts'] if any(fnmatch.fnmatchcase(e[0], p) for p in patterns)]
+
+
+def read_c_font(filepath, entry):
+    """Returns: font data of an index entry"""
+    with open(filepath, 'rb') as f:
+        f.seek(entry[3])
+        raw = f.read(entry[4] - entry[3]).decode('latin-1')
+    return decode_c_string(raw)
+
+
+def print_c_font_catalogue(entries):
+    width = max([len(e[0]) for e in entries] + [4])
+    for name, section, size, start, end in entries:
+        print(f"  {name:<{width}}  {section or '-':<18} {size:>7} bytes")
+    print(f"{len(entries)} font(s)")
+
+
+def _extract_c_font(filepath, entry, output_dir, allowed_codepoints):
+    # Worker: decode one indexed font to <output_dir>/<name>.bdf
+    output_file = os.path.join(output_dir, entry[0] + '.bdf')
+    # Quiet: the caller reports each font, and stdout may be shared with other server threads
+    count = convert_u8g2_to_bdf(read_c_font(filepath, entry), entry[0], output_file,
+                                allowed_codepoints, stats='none', verbose=False)
+    return output_file, count
+
+
+def extract_c_fonts(filepath, patterns, output_dir, allowed_codepoints=None, jobs=1):
+    """
+    Decode the u8g2 fonts of a C file matching patterns to BDF files in
+    output_dir, using jobs worker processes.
+    Returns: number of fonts written
+    """
+    index = load_c_font_index(filepath)
+    # u8x8 tile fonts can not be decoded as u8g2 fonts
+    entries = [e for e in select_c_fonts(index, patterns) if e[1] != 'U8X8_FONT_SECTION']
+    if not entries:
+        return 0
+    os.makedirs(output_dir, exist_ok=True)
+
+    if jobs and jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_extract_c_font, filepath, e, output_dir, allowed_codepoints)
+                       for e in entries]
+            results = [future.result() for future in futures]
+    else:
+        results = [_extract_c_font(filepath, e, output_dir, allowed_codepoints) for e in entries]
+
+    written = 0
+    for (output_file, count), entry in zip(results, entries):
+        if count is None:
+            print(f"  {entry[0]}: not a u8g2 font, skipped")
+        else:
+            print(f"  {entry[0]}: {count} glyphs -> {output_file}")
+            written += 1
+    return written
+
+
+# Corpus-driven subsetting
+#
+# The codepoints actually used by an application are collected from its
+# string tables and merged with a base range (by default printable ASCII).
+
+DEFAULT_CORPUS_BASE = '32-126'
+
+PO_STRING_RE = re.compile(r'^(?:msgid|msgid_plural|msgstr(?:\[\d+\])?)?\s*"(.*)"\s*$')
+PO_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\'}
+
+
+def _unescape_po(text):
+    return re.sub(r'\\(.)', lambda m: PO_ESCAPES.get(m.group(1), m.group(1)), text)
+
+
+def _iter_json_strings(node):
+    # Only values are displayed text, keys are message ids
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, dict):
+        for value in node.values():
+            yield from _iter_json_strings(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _iter_json_strings(value)
+
+
+def iter_corpus_strings(filepath):
+    """
+    Yield the strings of a corpus file:
+    - .json: every string value (e.g. i18n string tables)
+    - .po/.pot: msgid and msgstr strings of a gettext catalog
+    - anything else: lines of a UTF-8 text file
+    Text and gettext files are streamed line by line.
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == '.json':
+        with open(filepath, 'r', encoding='utf-8') as f:
+            yield from _iter_json_strings(json.load(f))
+    elif ext in ('.po', '.pot'):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                m = PO_STRING_RE.match(line)
+                if m:
+                    yield _unescape_po(m.group(1))
+    else:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield line.rstrip('\r\n')
+
+
+def collect_corpus_codepoints(filepaths):
+    """Return the set of printable codepoints used in the given corpus files."""
+    used = set()
+    for filepath in filepaths:
+        for text in iter_corpus_strings(filepath):
+            used.update(text)
+    # Control characters (newlines, tabs, ...) are never drawn
+    return {ord(c) for c in used if ord(c) >= 32}
+
+
+def corpus_filter(corpus_files, base_range=DEFAULT_CORPUS_BASE, allowed_codepoints=None):
+    """
+    Glyph filter for corpus subsetting, applied while the fonts are loaded:
+    the codepoints used by the corpus plus the base range, within
+    allowed_codepoints (-m) if given.
+    Returns: (CodepointRangeSet, set of codepoints used by the corpus)
+    """
+    used = collect_corpus_codepoints(corpus_files)
+    allowed = CodepointRangeSet.from_codepoints(used).union(CodepointRangeSet.parse(base_range))
+    if allowed_codepoints is not None:
+        allowed = allowed.intersection(allowed_codepoints)
+    return allowed, used
+
+
+def report_corpus_usage(used, glyphs, corpus_files, allowed_codepoints=None):
+    """Print how many codepoints the corpus uses and which of them the loaded font lacks."""
+    available = {g['uc'] for g in glyphs}
+    missing = sorted(uc for uc in used
+                     if uc not in available and (allowed_codepoints is None or uc in allowed_codepoints))
+
+    print(f"Corpus uses {len(used)} distinct codepoints ({len(corpus_files)} file(s)).")
+    if missing:
+        listed = ', '.join(f"U+{uc:04X}" for uc in missing[:20])
+        more = f" (+{len(missing) - 20} more)" if len(missing) > 20 else ""
+        print(f"Warning: {len(missing)} used codepoints are not in the font: {listed}{more}")
+
+
+def bdf_record_is_empty(record):
+    """Whether parse_bdf_lines drops a raw STARTCHAR..ENDCHAR record as empty (zero size or no pixel set)."""
+    w = h = 0
+    in_bitmap = False
+    rows = []
+    for line in record.splitlines():
+        line = line.strip()
+        if line.startswith(b'BBX'):
+            parts = line.split()
+            w, h = int(parts[1]), int(parts[2])
+        elif line.startswith(b'BITMAP'):
+            in_bitmap = True
+        elif line.startswith(b'ENDCHAR'):
+            break
+        elif in_bitmap and line:
+            rows.append(line)
+    if w == 0 or h == 0:
+        return True
+    # Only the first w bits of a row count, the rest is byte padding
+    return all(int(row, 16) >> max(len(row) * 4 - w, 0) == 0 for row in rows)
+
+
+def bdf_glyph_count(filepath, allowed_codepoints=None):
+    """
+    Number of glyphs (in allowed_codepoints) parse_bdf_file would load from
+    a BDF, without parsing it: the glyph index is scanned (not written next
+    to the font) and only the bitmap rows are checked for empty glyphs.
+    """
+    count = 0
+    index = load_bdf_index(filepath, persist=False)
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for entry in index['glyphs']:
+                uc = bdf_index_codepoint(entry)
+                if uc is None or (allowed_codepoints is not None and uc not in allowed_codepoints):
+                    continue
+                if uc == 32 or not bdf_record_is_empty(buf[entry[0]:entry[3]]):
+                    count += 1
+    return count
+
+
+def report_corpus_savings(total, kept, u8g2_size=None):
+    """
+    Print the glyphs removed by corpus subsetting. The removed glyphs are
+    never parsed, so the bytes saved are only an estimate: the average
+    glyph size of the encoded subset (u8g2_size) times the glyphs removed.
+    """
+    removed = max(total - kept, 0)
+    line = f"Subsetting: kept {kept} of {total} glyphs ({removed} removed)"
+    if u8g2_size and kept:
+        line += f", estimated {removed * u8g2_size // kept} bytes saved"
+    print(line)
+
+
+# Font merging
+#
+# Several BDF and u8g2 fonts are combined into one, so the firmware looks up
+# glyphs in a single font instead of a fallback chain. A codepoint is taken
+# from the first input (in priority order) that has it. Inputs are loaded
+# one at a time, and glyphs already taken are skipped while parsing (BDF) or
+# never decoded (u8g2), so only the merged glyph list stays in memory.
+
+class MergeFilter:
+    """
+    allowed_codepoints filter for one merge input: rejects codepoints outside
+    the -m range and those taken from a higher priority input, which are
+    recorded as conflicts.
+    """
+    def __init__(self, allowed_codepoints, taken):
+        self.allowed_codepoints = allowed_codepoints
+        self.taken = taken
+        self.conflicts = set()
+
+    def __contains__(self, codepoint):
+        if self.allowed_codepoints is not None and codepoint not in self.allowed_codepoints:
+            return False
+        if codepoint in self.taken:
+            self.conflicts.add(codepoint)
+            return False
+        return True
+
+    def __str__(self):
+        # Cache key of the conversion server's loader
+        return f"{self.allowed_codepoints};~{CodepointRangeSet.from_codepoints(self.taken)}"
+
+
+def font_bbx_from_header(header):
+    """font_bbx dict (as parsed from a BDF) of a u8g2 font header."""
+    return {'w': header['bbx_w'], 'h': header['bbx_h'], 'x': header['bbx_x'], 'y': header['bbx_y'],
+            'ascent': header['ascent_A'], 'descent': -header['descent_g']}
+
+
+def load_merge_input(filepath, allowed_codepoints, loader, jobs=1):
+    """Returns: (glyphs, font_bbx) of a BDF, u8g2 C or .bin font"""
+    if filepath.lower().endswith('.bdf'):
+        return loader.load_bdf(filepath, allowed_codepoints, jobs, 'none')
+    data, _ = loader.load_u8g2(filepath)
+    if not data:
+        raise ValueError(f"failed to read font data from {filepath}")
+    header = read_u8g2_header(data)
+    if header is None:
+        raise ValueError(f"{filepath} is too short for a u8g2 font header")
+    glyphs = decode_u8g2_glyphs(data, header, allowed_codepoints, jobs)
+    if isinstance(data, mmap.mmap):
+        data.close()
+    return glyphs, font_bbx_from_header(header)
+
+
+MERGE_METRICS = [('ascent', 'ascent'), ('descent', 'descent'), ('h', 'bounding box height')]
+
+
+def check_merge_metrics(base, font_bbx, filepath):
+    """Warn about metrics of a merge input that differ from the primary font."""
+    for key, label in MERGE_METRICS:
+        if key in base and key in font_bbx and base[key] != font_bbx[key]:
+            print(f"Warning: {filepath}: {label} {font_bbx[key]} differs from {base[key]} of the primary font")
+
+
+def merge_font_bbx(bbxs):
+    """Bounding box covering all fonts, largest ascent and descent."""
+    merged = {}
+    boxes = [b for b in bbxs if all(k in b for k in ('w', 'h', 'x', 'y'))]
+    if boxes:
+        x = min(b['x'] for b in boxes)
+        y = min(b['y'] for b in boxes)
+        merged = {'x': x, 'y': y,
+                  'w': max(b['x'] + b['w'] for b in boxes) - x,
+                  'h': max(b['y'] + b['h'] for b in boxes) - y}
+    for key in ('ascent', 'descent'):
+        values = [b[key] for b in bbxs if key in b]
+        if values:
+            merged[key] = max(values)
+    return merged
+
+
+def merge_fonts(filepaths, allowed_codepoints=None, loader=None, jobs=1):
+    """
+    Merge fonts in priority order (the first one wins a codepoint).
+    Returns: (glyphs in codepoint order, font_bbx)
+    """
+    if loader is None:
+        loader = FontLoader()
+    taken = set()
+    merged = []
+    bbxs = []
+    for filepath in filepaths:
+        merge_filter = MergeFilter(allowed_codepoints, taken)
+        try:
+            glyphs, font_bbx = load_merge_input(filepath, merge_filter, loader, jobs)
+        except ValueError as e:
+            raise ValueError(f"Cannot merge {filepath}: {e}")
+        added = 0
+        for g in glyphs:
+            # Duplicates within one font, or filtered in a worker process
+            if g['uc'] in taken:
+                merge_filter.conflicts.add(g['uc'])
+                continue
+            taken.add(g['uc'])
+            merged.append(g)
+            added += 1
+
+        if bbxs:
+            check_merge_metrics(bbxs[0], font_bbx, filepath)
+        bbxs.append(font_bbx)
+
+        line = f"Merged {filepath}: {added} glyphs"
+        if merge_filter.conflicts:
+            conflicts = sorted(merge_filter.conflicts)
+            listed = ', '.join(f"U+{uc:04X}" for uc in conflicts[:10])
+            more = f" (+{len(conflicts) - 10} more)" if len(conflicts) > 10 else ""
+            line += f", {len(conflicts)} already taken from a higher priority font: {listed}{more}"
+        print(line)
+
+    merged.sort(key=lambda g: g['uc'])
+    return merged, merge_font_bbx(bbxs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert u8g2 font C file to BDF, or BDF to u8g2 C file.')
+    parser.add_argument('input_file', help='Input file (C or BDF)')
+    parser.add_argument('-o', '--output', help='Output file', default='output')
+    parser.add_argument('-e', '--encode', action='store_true', help='Encode BDF to u8g2 C file')
+    parser.add_argument('-m', '--map', help='Unicode range to export (e.g. "32-255,300")', default=None)
+    
+    args = parser.parse_args()
+    
+
+class BitWriter:
+    def __init__(self):
+        self.data = bytearray()
+        self.current_byte = 0
+        self.bit_idx = 0 # 0 to 7
+        
+    def write_bits(self, val, num_bits):
+        for i in range(num_bits):
+            bit = (val >> i) & 1
+            if bit:
+                self.current_byte |= (1 << self.bit_idx)
+            
+            self.bit_idx += 1
+            if self.bit_idx == 8:
+                self.data.append(self.current_byte)
+                self.current_byte = 0
+                self.bit_idx = 0
+                
+    def write_signed_bits(self, val, num_bits):
+        # Excess-K encoding
+        # val = stored_val - (1 << (num_bits - 1))
+        # stored_val = val + (1 << (num_bits - 1))
+        stored_val = val + (1 << (num_bits - 1))
+        self.write_bits(stored_val, num_bits)
+        
+    def flush(self):
+        if self.bit_idx > 0:
+            self.data.append(self.current_byte)
+            self.current_byte = 0
+            self.bit_idx = 0
+            
+    def get_bytes(self):
+        self.flush()
+        return bytes(self.data)
+
+# RLE run extraction
+#
+# The glyph bitmap is packed into one int (pixel i in bit i). XOR with a
+# copy shifted by one pixel leaves a set bit at every pixel whose value
+# differs from the previous one, so the runs are the distances between those
+# edges, found with whole-int operations instead of a loop over the pixels.
+# The runs only depend on the bitmap: they are extracted once per glyph and
+# then split and grouped for each (m0, m1) candidate.
+
+_BIT_CHARS = bytes.maketrans(b'\x00\x01', b'01')
+
+
+def pack_bitmap(bitmap):
+    """Bitmap (list of 0/1 or bytes) as an int with pixel i in bit i."""
+    if not bitmap:
+        return 0
+    return int(bytes(bitmap[::-1]).translate(_BIT_CHARS), 2)
+
+
+def rle_runs(packed, n):
+    """
+    Alternating runs of an n pixel bitmap packed by pack_bitmap.
+    Returns: list of (zeros, ones) pairs, the last one may have no ones
+    """
+    # Edges always come in pairs: bits above n are 0, so a bitmap ending in
+    # ones has its closing edge at bit n
+    edges = packed ^ (packed << 1)
+    pairs = []
+    pos = 0
+    while edges:
+        low = edges & -edges
+        start = low.bit_length() - 1
+        edges ^= low
+        low = edges & -edges
+        end = low.bit_length() - 1
+        edges ^= low
+        pairs.append((start - pos, end - start))
+        pos = end
+    if pos < n:
+        pairs.append((n - pos, 0))
+    return pairs
+
+
+def bitmap_runs(bitmap):
+    return rle_runs(pack_bitmap(bitmap), len(bitmap))
+
+
+def rle_groups(runs, m0, m1):
+    """
+    Split runs (from rle_runs) to fit into m0/m1 bit fields and merge equal
+    consecutive pairs.
+    Returns: list of (zeros, ones, repeat) groups as written to the font
+    """
+    max_0 = (1 << m0) - 1
+    max_1 = (1 << m1) - 1
+    groups = []
+    last = None
+    for z, o in runs:
+        if z > max_0 or o > max_1:
+            pieces = []
+            while z > max_0:
+                pieces.append((max_0, 0))
+                z -= max_0
+            while o > max_1:
+                pieces.append((z, max_1))
+                z = 0
+                o -= max_1
+            pieces.append((z, o))
+        else:
+            pieces = ((z, o),)
+        for pair in pieces:
+            if pair == last:
+                z_, o_, repeat = groups[-1]
+                groups[-1] = (z_, o_, repeat + 1)
+            else:
+                groups.append(pair + (0,))
+                last = pair
+    return groups
+
+
+def rle_bit_count(runs, m0, m1):
+    """Size in bits of the RLE data: m0 + m1 bits per group plus one unary bit per pair."""
+    groups = rle_groups(runs, m0, m1)
+    return len(groups) * (m0 + m1) + sum(repeat + 1 for _, _, repeat in groups)
+
+
+def rle_bit_counts(bitmap):
+    """RLE bit counts of a bitmap for every RLE_PARAMS entry."""
+    runs = bitmap_runs(bitmap)
+    max_0 = max((z for z, _ in runs), default=0)
+    max_1 = max((o for _, o in runs), default=0)
+    # Candidates whose fields hold every run need no splitting, so they all
+    # write the same groups: only count them once
+    unsplit = None
+    counts = []
+    for m0, m1 in RLE_PARAMS:
+        if max_0 >> m0 == 0 and max_1 >> m1 == 0:
+            if unsplit is None:
+                unsplit = sum(1 for i, pair in enumerate(runs) if i == 0 or pair != runs[i - 1])
+            counts.append(unsplit * (m0 + m1) + len(runs))
+        else:
+            counts.append(rle_bit_count(runs, m0, m1))
+    return counts
+
+
+def write_rle_groups(bw, groups, m0, m1):
+    """Write groups to a BitWriter. Returns: number of bits written"""
+    total_bits = 0
+    for z, o, repeat in groups:
+        bw.write_bits(z, m0)
+        bw.write_bits(o, m1)
+        # Unary repeat: 1s then 0
+        for _ in range(repeat):
+            bw.write_bits(1, 1)
+        bw.write_bits(0, 1)
+        total_bits += m0 + m1 + repeat + 1
+    return total_bits
+
+
+def encode_rle(bitmap, m0, m1):
+    # Kept for old callers, same as encode_rle_bits
+    return encode_rle_bits(bitmap, m0, m1)
+
+def calculate_encoded_size(glyphs, m0, m1):
+    total_bits = 0
+    for g in glyphs:
+        bw = encode_rle(g['bitmap'], m0, m1)
+        # We need exact bits written.
+        # BitWriter doesn't expose it easily in my implementation above.
+        # Let's update BitWriter.
+        # But wait, encode_rle returns a BitWriter instance now (in my thought).
+        # Let's fix encode_rle to return bits.
+        
+        # Actually, for optimization we don't need the bytes, just the size.
+        # But we need to do the work.
+        pass
+    return total_bits
+
+# Helper to get bit width of a value
+def get_bit_width(val):
+    if val == 0: return 0
+    return val.bit_length()
+
+def get_signed_bit_width(val):
+    # For Excess-K, we need range.
+    # But u8g2 uses fixed bit width for all glyphs for a field.
+    # We need to find min/max of all glyphs.
+    pass
+
+def encode_u8g2(glyphs, font_bbx, font_name):
+    # 1. Determine optimal m0, m1
+    # Try all combinations m0=2..8, m1=2..7 (from bdfconv)
+    best_size = float('inf')
+    best_m0 = 3
+    best_m1 = 3
+    
+    # We need a fast way to calculate size without full encoding if possible.
     # But full encoding is robust.
     
     # 2. Determine bit widths for fields
@@ -707,107 +1580,267 @@ def encode_u8g2(glyphs, font_bbx, font_name):
     pass
 
 def encode_rle_bits(bitmap, m0, m1):
-    # Returns (bytearray, bit_count)
-    pairs = []
-    idx = 0
-    while idx < len(bitmap):
-        zeros = 0
-        while idx < len(bitmap) and bitmap[idx] == 0:
-            zeros += 1
-            idx += 1
-        ones = 0
-        while idx < len(bitmap) and bitmap[idx] == 1:
-            ones += 1
-            idx += 1
-        pairs.append((zeros, ones))
-        
-    normalized_pairs = []
-    max_0 = (1 << m0) - 1
-    max_1 = (1 << m1) - 1
-    
-    for z, o in pairs:
-        while z > max_0:
-            normalized_pairs.append((max_0, 0))
-            z -= max_0
-        while o > max_1:
-            normalized_pairs.append((z, max_1))
-            z = 0
-            o -= max_1
-        normalized_pairs.append((z, o))
-        
+    # Returns (bytes, bit_count)
     bw = BitWriter()
-    total_bits = 0
-    
-    i = 0
-    while i < len(normalized_pairs):
-        z, o = normalized_pairs[i]
-        repeat = 0
-        j = i + 1
-        while j < len(normalized_pairs) and normalized_pairs[j] == (z, o):
-            repeat += 1
-            j += 1
-            
-        bw.write_bits(z, m0)
-        bw.write_bits(o, m1)
-        # Unary repeat: 1s then 0
-        for _ in range(repeat):
-            bw.write_bits(1, 1)
-        bw.write_bits(0, 1)
-        
-        total_bits += m0 + m1 + repeat + 1
-        i += 1 + repeat
-        
+    total_bits = write_rle_groups(bw, rle_groups(bitmap_runs(bitmap), m0, m1), m0, m1)
     return bw.get_bytes(), total_bits
 
+
 def encode_rle_to_bw(bitmap, m0, m1, bw):
-    pairs = []
-    idx = 0
-    while idx < len(bitmap):
-        zeros = 0
-        while idx < len(bitmap) and bitmap[idx] == 0:
-            zeros += 1
-            idx += 1
-        ones = 0
-        while idx < len(bitmap) and bitmap[idx] == 1:
-            ones += 1
-            idx += 1
-        pairs.append((zeros, ones))
-        
-    normalized_pairs = []
-    max_0 = (1 << m0) - 1
-    max_1 = (1 << m1) - 1
+    return write_rle_groups(bw, rle_groups(bitmap_runs(bitmap), m0, m1), m0, m1)
+
+# RLE parameter candidates (from bdfconv)
+RLE_M0_RANGE = range(2, 9)
+RLE_M1_RANGE = range(2, 8)
+RLE_PARAMS = [(m0, m1) for m0 in RLE_M0_RANGE for m1 in RLE_M1_RANGE]
+
+
+def encode_glyph_body(g, bitcnts, m0, m1):
+    """
+    Encode the bit fields and RLE bitmap of one glyph (everything after the
+    unicode and next-offset bytes). bitcnts is (W, H, X, Y, D).
+    """
+    bitcntW, bitcntH, bitcntX, bitcntY, bitcntD = bitcnts
+    bw = BitWriter()
+    bw.write_bits(g['w'], bitcntW)
+    bw.write_bits(g['h'], bitcntH)
+    bw.write_signed_bits(g['x'], bitcntX)
+    bw.write_signed_bits(g['y'], bitcntY)
+    bw.write_signed_bits(g['d'], bitcntD)
     
-    for z, o in pairs:
-        while z > max_0:
-            normalized_pairs.append((max_0, 0))
-            z -= max_0
-        while o > max_1:
-            normalized_pairs.append((z, max_1))
-            z = 0
-            o -= max_1
-        normalized_pairs.append((z, o))
-        
-    total_bits = 0
-    i = 0
-    while i < len(normalized_pairs):
-        z, o = normalized_pairs[i]
-        repeat = 0
-        j = i + 1
-        while j < len(normalized_pairs) and normalized_pairs[j] == (z, o):
-            repeat += 1
-            j += 1
-            
-        bw.write_bits(z, m0)
-        bw.write_bits(o, m1)
-        for _ in range(repeat):
-            bw.write_bits(1, 1)
-        bw.write_bits(0, 1)
-        
-        total_bits += m0 + m1 + repeat + 1
-        i += 1 + repeat
-    return total_bits
+    encode_rle_to_bw(g['bitmap'], m0, m1, bw)
+    
+    return bw.get_bytes()
 
-def generate_u8g2_c(glyphs, font_bbx, name):
+
+class GlyphEncodeCache:
+    """
+    Per-glyph encoding results kept between encodes of the same, edited font
+    (see --watch): the RLE bit counts for every (m0, m1) candidate and the
+    encoded glyph bodies. Entries not used by the latest encode are dropped.
+    """
+    def __init__(self):
+        self.sizes = {}
+        self.bodies = {}
+        self._used_sizes = {}
+        self._used_bodies = {}
+        self.hits = 0
+        self.misses = 0
+        self._companion = None
+
+    def companion(self):
+        """Second cache for another glyph set encoded on every pass (e.g. the untransformed font)."""
+        if self._companion is None:
+            self._companion = GlyphEncodeCache()
+        return self._companion
+
+    def start_pass(self):
+        self._used_sizes = {}
+        self._used_bodies = {}
+        self.hits = 0
+        self.misses = 0
+
+    def finish_pass(self):
+        self.sizes = self._used_sizes
+        self.bodies = self._used_bodies
+
+    def rle_sizes(self, g):
+        # Bit count per RLE_PARAMS entry, depends on the bitmap only
+        key = tuple(g['bitmap'])
+        sizes = self._used_sizes.get(key) or self.sizes.get(key)
+        if sizes is None:
+            sizes = rle_bit_counts(g['bitmap'])
+            self.misses += 1
+        else:
+            self.hits += 1
+        self._used_sizes[key] = sizes
+        return sizes
+
+    def glyph_body(self, g, bitcnts, m0, m1):
+        key = (g['w'], g['h'], g['x'], g['y'], g['d'], tuple(g['bitmap']), bitcnts, m0, m1)
+        body = self._used_bodies.get(key) or self.bodies.get(key)
+        if body is None:
+            body = encode_glyph_body(g, bitcnts, m0, m1)
+        self._used_bodies[key] = body
+        return body
+
+
+# Size vs. decode speed
+#
+# By default the (m0, m1) pair with the fewest bits wins. A policy can trade
+# a few bytes for fewer decoder operations: for every candidate the exact
+# font size and the operations the device decoder performs (bit field
+# reads, unary repeat bits and drawn run pieces, as counted by
+# decode_u8g2_glyph) are evaluated.
+
+RLE_POLICY_HELP = ("size (fewest bytes, default), speed (fewest decode operations), "
+                   "within=X%% (smallest whose decode operations are within X%% of the fastest) "
+                   "or budget=N (fastest that fits into N bytes)")
+
+
+def parse_rle_policy(text):
+    """Returns: (mode, value) for "size", "speed", "within=X%" or "budget=N" """
+    mode, sep, value = text.strip().partition('=')
+    mode = mode.strip().lower()
+    if mode in ('size', 'speed') and not sep:
+        return mode, None
+    try:
+        if mode == 'within' and sep:
+            return mode, float(value.strip().rstrip('%'))
+        if mode == 'budget' and sep:
+            return mode, int(value.strip(), 0)
+    except ValueError:
+        pass
+    raise ValueError(f"invalid RLE policy '{text}', expected size, speed, within=X% or budget=N")
+
+
+def rle_cost(runs, n, w, m0, m1):
+    """Returns: (RLE bits, decoder operations) of the runs (from rle_runs) of an n pixel, w wide glyph"""
+    bits = 0
+    ops = 0
+    pos = 0
+    for z, o, repeat in rle_groups(runs, m0, m1):
+        bits += m0 + m1 + repeat + 1
+        # 2 field reads, the unary repeat bits, one draw per row piece of each run
+        ops += 2 + repeat + 1
+        for _ in range(repeat + 1):
+            for run in (z, o):
+                run = min(run, n - pos)
+                if run > 0:
+                    ops += (pos + run - 1) // w - pos // w + 1
+                    pos += run
+    return bits, ops
+
+
+def evaluate_rle_params(glyphs, bitcnts):
+    """Returns: list of (m0, m1, font size in bytes, decoder operations) for all RLE_PARAMS"""
+    metric_bits = sum(bitcnts)
+    block2 = sum(1 for g in glyphs if g['uc'] > 255)
+    # Header, Block 1 terminator, jump table, end marker
+    fixed = 23 + 2 + 4 * max(1, -(-block2 // U8G2_JUMP_TABLE_GLYPHS)) + 2
+    runs = [bitmap_runs(g['bitmap']) for g in glyphs]
+    results = []
+    for m0, m1 in RLE_PARAMS:
+        size = fixed
+        ops = 0
+        for g, glyph_runs in zip(glyphs, runs):
+            bits, glyph_ops = rle_cost(glyph_runs, len(g['bitmap']), g['w'], m0, m1)
+            size += (metric_bits + bits + 7) // 8 + (2 if g['uc'] <= 255 else 3)
+            ops += glyph_ops
+        results.append((m0, m1, size, ops))
+    return results
+
+
+def pareto_frontier(candidates):
+    """Candidates not beaten in both size and operations by another one, by increasing size."""
+    frontier = []
+    for c in sorted(candidates, key=lambda c: (c[2], c[3])):
+        if not frontier or c[3] < frontier[-1][3]:
+            frontier.append(c)
+    return frontier
+
+
+def select_rle_params(candidates, policy, smallest):
+    """
+    Pick (m0, m1) from evaluate_rle_params() results according to a parse_rle_policy() policy.
+    smallest: the (m0, m1) chosen by bit count, used for 'size'
+    """
+    mode, value = policy
+    if mode == 'speed':
+        best = min(candidates, key=lambda c: (c[3], c[2]))
+    elif mode == 'within':
+        fastest = min(c[3] for c in candidates)
+        best = min((c for c in candidates if c[3] <= fastest * (1 + value / 100)), key=lambda c: (c[2], c[3]))
+    elif mode == 'budget':
+        fitting = [c for c in candidates if c[2] <= value]
+        if not fitting:
+            print(f"Warning: no RLE parameters fit into {value} bytes, using the smallest")
+            return smallest
+        best = min(fitting, key=lambda c: (c[3], c[2]))
+    else:
+        return smallest
+    return best[0], best[1]
+
+
+def print_rle_frontier(candidates, chosen):
+    print("RLE size / decode speed Pareto frontier:")
+    print(f"  {'m0':>3} {'m1':>3} {'bytes':>8} {'decode ops':>11}")
+    for m0, m1, size, ops in pareto_frontier(candidates):
+        mark = " <-" if (m0, m1) == chosen else ""
+        print(f"  {m0:>3} {m1:>3} {size:>8} {ops:>11}{mark}")
+    if chosen not in [(c[0], c[1]) for c in pareto_frontier(candidates)]:
+        m0, m1, size, ops = next(c for c in candidates if (c[0], c[1]) == chosen)
+        print(f"  chosen m0={m0}, m1={m1}: {size} bytes, {ops} decode ops (not on the frontier)")
+
+
+# Glyphs per jump table entry: u8g2 jumps to the entry's first glyph and
+# walks the rest of the entry linearly
+U8G2_JUMP_TABLE_GLYPHS = 100
+
+
+def build_u8g2_jump_table(codepoints, starts):
+    """
+    Build the unicode jump table for Block 2 glyphs (codepoints sorted,
+    starts = glyph positions relative to the first glyph). Each 4 byte entry
+    holds the offset from the previous entry's target (the first one from the
+    start of the table) and the last unicode reached by it; the final entry
+    has unicode 0xFFFF.
+    """
+    groups = [(starts[i], codepoints[min(i + U8G2_JUMP_TABLE_GLYPHS, len(codepoints)) - 1])
+              for i in range(0, len(codepoints), U8G2_JUMP_TABLE_GLYPHS)] or [(0, 0xFFFF)]
+    groups[-1] = (groups[-1][0], 0xFFFF)
+
+    table = bytearray()
+    previous = -4 * len(groups) # The first target is relative to the table start
+    for start, last_uc in groups:
+        offset = start - previous
+        table.extend([(offset >> 8) & 0xFF, offset & 0xFF, last_uc >> 8, last_uc & 0xFF])
+        previous = start
+    return table
+
+
+# u8g2 format limits
+U8G2_MAX_RECORD = 255 # 8 bit offset to the next glyph
+U8G2_MAX_CODEPOINT = 0xFFFF # 16 bit unicode in Block 2
+U8G2_MAX_OFFSET = 0xFFFF # 16 bit offsets of 'A', 'a' and Block 2 in the header
+
+
+def u8g2_header_byte(problems, label, value, signed=False):
+    """value as a header byte; a problem is recorded if it doesn't fit."""
+    lo, hi = (-128, 127) if signed else (0, 255)
+    if not lo <= value <= hi:
+        problems.append(f"{label} {value} does not fit into a {'signed ' if signed else ''}byte ({lo}..{hi})")
+    return value & 0xFF
+
+
+def format_limit_error(problems):
+    listed = ''.join(f"\n  - {p}" for p in problems)
+    error = ValueError(f"font exceeds u8g2 format limits:{listed}")
+    error.problems = problems
+    return error
+
+
+def encode_u8g2_for_report(glyphs, font_bbx, cache=None):
+    """
+    u8g2 encoding of glyphs for the size comparisons printed next to other
+    formats, which may hold fonts the u8g2 format can't.
+    Returns: (font data, None), or (None, reason) if the glyphs exceed the u8g2 limits
+    """
+    try:
+        return encode_u8g2_font(list(glyphs), font_bbx, cache), None
+    except ValueError as e:
+        return None, '; '.join(getattr(e, 'problems', [str(e)]))
+
+
+def encode_u8g2_font(glyphs, font_bbx, cache=None, rle_policy=None, pareto=False):
+    """
+    Encode glyphs into the binary u8g2 font format.
+    cache: optional GlyphEncodeCache, reuses work from earlier encodes
+    rle_policy: optional parse_rle_policy() result, default is the smallest font
+    pareto: print the size / decode operations frontier of the RLE parameters
+    Returns: bytearray with the 23 byte header followed by the glyph data
+    Raises: ValueError listing every u8g2 format limit the font exceeds
+    """
     # 1. Optimize RLE
     best_size = float('inf')
     best_m0 = 3
@@ -847,27 +1880,47 @@ def generate_u8g2_c(glyphs, font_bbx, name):
     bitcntY = needed_bits_signed(min_y, max_y)
     bitcntD = needed_bits_signed(min_d, max_d)
     
+    bitcnts = (bitcntW, bitcntH, bitcntX, bitcntY, bitcntD)
+
+    if cache is not None:
+        cache.start_pass()
+        size_tables = [cache.rle_sizes(g) for g in glyphs]
+    else:
+        size_tables = [rle_bit_counts(g['bitmap']) for g in glyphs]
+
     # Optimize
-    for m0 in range(2, 9):
-        for m1 in range(2, 8):
+    for m0 in RLE_M0_RANGE:
+        for m1 in RLE_M1_RANGE:
+            i = RLE_PARAMS.index((m0, m1))
             size = 0
-            for g in glyphs:
-                _, bits = encode_rle_bits(g['bitmap'], m0, m1)
-                size += bits
+            for sizes in size_tables:
+                size += sizes[i]
             if size < best_size:
                 best_size = size
                 best_m0 = m0
                 best_m1 = m1
                 
+    if (rle_policy is not None and rle_policy[0] != 'size') or pareto:
+        candidates = evaluate_rle_params(glyphs, bitcnts)
+        best_m0, best_m1 = select_rle_params(candidates, rle_policy or ('size', None), (best_m0, best_m1))
+        print_rle_frontier(candidates, (best_m0, best_m1))
+
     print(f"Optimal RLE: m0={best_m0}, m1={best_m1}")
     
 
     # 2. Generate Data
+    # Format limits are collected while encoding and reported together
+    problems = []
+    too_big = [g['uc'] for g in glyphs if not 0 <= g['uc'] <= U8G2_MAX_CODEPOINT]
+    if too_big:
+        listed = ', '.join(f"U+{uc:04X}" for uc in sorted(too_big)[:10])
+        problems.append(f"{len(too_big)} codepoint(s) above U+FFFF: {listed}")
+
     # Header construction
     header = bytearray(23)
-    # n_glyphs: 0 means 256? Or just number of glyphs.
-    # If > 255, we might have issues with standard u8g2 format if it uses 1 byte count.
-    # But let's use len(glyphs) & 0xFF.
+    # n_glyphs is informational only, u8g2 walks the glyph list instead
+    if len(glyphs) > 255:
+        print(f"Warning: {len(glyphs)} glyphs, header byte 0 only holds the glyph count modulo 256")
     header[0] = len(glyphs) & 0xFF
     
     header[1] = 0 # BBX Mode 0
@@ -879,10 +1932,10 @@ def generate_u8g2_c(glyphs, font_bbx, name):
     header[7] = bitcntY
     header[8] = bitcntD
     
-    header[9] = font_bbx.get('w', max_w)
-    header[10] = font_bbx.get('h', max_h)
-    header[11] = font_bbx.get('x', 0)
-    header[12] = font_bbx.get('y', 0) & 0xFF 
+    header[9] = u8g2_header_byte(problems, "bounding box width", font_bbx.get('w', max_w))
+    header[10] = u8g2_header_byte(problems, "bounding box height", font_bbx.get('h', max_h))
+    header[11] = u8g2_header_byte(problems, "bounding box x", font_bbx.get('x', 0), signed=True)
+    header[12] = u8g2_header_byte(problems, "bounding box y", font_bbx.get('y', 0), signed=True)
     
     # Ascent/Descent
     # Need to find 'A', 'g', '('
@@ -903,11 +1956,12 @@ def generate_u8g2_c(glyphs, font_bbx, name):
     ascent_para = (g_para['h'] + g_para['y']) if g_para else ascent_A
     descent_para = g_para['y'] if g_para else descent_g
     
-    header[13] = font_bbx.get('ascent', ascent_A) & 0xFF
-    header[14] = (-font_bbx.get('descent', descent_g)) & 0xFF # u8g2 stores descent as negative
+    header[13] = u8g2_header_byte(problems, "ascent", font_bbx.get('ascent', ascent_A), signed=True)
+    # u8g2 stores descent as negative
+    header[14] = u8g2_header_byte(problems, "descent", -font_bbx.get('descent', descent_g), signed=True)
     
-    header[15] = font_bbx.get('ascent', ascent_para) & 0xFF
-    header[16] = (-font_bbx.get('descent', descent_para)) & 0xFF 
+    header[15] = u8g2_header_byte(problems, "ascent of '('", font_bbx.get('ascent', ascent_para), signed=True)
+    header[16] = u8g2_header_byte(problems, "descent of '('", -font_bbx.get('descent', descent_para), signed=True)
     
     # Offsets
     # We need to calculate offsets after generating data.
@@ -953,62 +2007,60 @@ def generate_u8g2_c(glyphs, font_bbx, name):
         glyph_data.append(g['uc'])
         glyph_data.append(0) # Offset placeholder
         
-        bw = BitWriter()
-        bw.write_bits(g['w'], bitcntW)
-        bw.write_bits(g['h'], bitcntH)
-        bw.write_signed_bits(g['x'], bitcntX)
-        bw.write_signed_bits(g['y'], bitcntY)
-        bw.write_signed_bits(g['d'], bitcntD)
-        
-        encode_rle_to_bw(g['bitmap'], best_m0, best_m1, bw)
-        
-        data_bytes = bw.get_bytes()
+        if cache is not None:
+            data_bytes = cache.glyph_body(g, bitcnts, best_m0, best_m1)
+        else:
+            data_bytes = encode_glyph_body(g, bitcnts, best_m0, best_m1)
         glyph_data.extend(data_bytes)
         
         # Update offset
         next_pos = len(glyph_data)
         offset = next_pos - start_pos
-        if offset > 255:
-            print(f"Warning: Glyph {g['uc']} too large for 8-bit offset ({offset})")
+        if offset > U8G2_MAX_RECORD:
+            problems.append(f"glyph U+{g['uc']:04X} is {offset} bytes, more than the 8 bit next glyph offset allows ({U8G2_MAX_RECORD})")
         glyph_data[start_pos + 1] = offset & 0xFF
         
+    # End of Block 1: a glyph with offset 0
+    glyph_data.extend(b'\0\0')
+
     # Block 2 (Unicode > 255)
     offset_100 = len(glyph_data)
-    
-    # If block2 is empty, offset_100 should point to end?
-    # Or 0?
-    # If block2 exists:
+    block2_data = bytearray()
+    block2_starts = []
+
     for g in block2:
-        start_pos = len(glyph_data)
+        start_pos = len(block2_data)
+        block2_starts.append(start_pos)
         # Unicode 2 bytes
-        glyph_data.append((g['uc'] >> 8) & 0xFF)
-        glyph_data.append(g['uc'] & 0xFF)
-        glyph_data.append(0) # Offset placeholder
-        
-        bw = BitWriter()
-        bw.write_bits(g['w'], bitcntW)
-        bw.write_bits(g['h'], bitcntH)
-        bw.write_signed_bits(g['x'], bitcntX)
-        bw.write_signed_bits(g['y'], bitcntY)
-        bw.write_signed_bits(g['d'], bitcntD)
-        
-        encode_rle_to_bw(g['bitmap'], best_m0, best_m1, bw)
+        block2_data.append((g['uc'] >> 8) & 0xFF)
+        block2_data.append(g['uc'] & 0xFF)
+        block2_data.append(0) # Offset placeholder
         
-        data_bytes = bw.get_bytes()
-        glyph_data.extend(data_bytes)
+        if cache is not None:
+            data_bytes = cache.glyph_body(g, bitcnts, best_m0, best_m1)
+        else:
+            data_bytes = encode_glyph_body(g, bitcnts, best_m0, best_m1)
+        block2_data.extend(data_bytes)
         
-        next_pos = len(glyph_data)
+        next_pos = len(block2_data)
         offset = next_pos - start_pos
-        if offset > 255:
-            print(f"Warning: Glyph {g['uc']} too large for 8-bit offset ({offset})")
-        glyph_data[start_pos + 2] = offset & 0xFF
-        
-    # Terminator for Block 2?
-    # "All glyphs start with the unicode (2 bytes)..."
-    # Is there a terminator?
-    # Example file ends with \2\0\0\0\4\377\377\0
-    # Maybe 0 offset?
-    
+        if offset > U8G2_MAX_RECORD:
+            problems.append(f"glyph U+{g['uc']:04X} is {offset} bytes, more than the 8 bit next glyph offset allows ({U8G2_MAX_RECORD})")
+        block2_data[start_pos + 2] = offset & 0xFF
+
+    # Block 2 starts with the jump table (u8g2 v2.23+) and ends with unicode 0
+    glyph_data.extend(build_u8g2_jump_table([g['uc'] for g in block2], block2_starts))
+    glyph_data.extend(block2_data)
+    glyph_data.extend(b'\0\0')
+    
+    for label, offset in (("offset of 'A'", offset_A), ("offset of 'a'", offset_a), ("offset of Block 2", offset_100)):
+        if offset > U8G2_MAX_OFFSET:
+            problems.append(f"{label} {offset} does not fit into 16 bits")
+    if cache is not None:
+        cache.finish_pass()
+    if problems:
+        raise format_limit_error(problems)
+
     # Fill Header Offsets
     header[17] = (offset_A >> 8) & 0xFF
     header[18] = offset_A & 0xFF
@@ -1016,11 +2068,17 @@ def generate_u8g2_c(glyphs, font_bbx, name):
     header[20] = offset_a & 0xFF
     header[21] = (offset_100 >> 8) & 0xFF
     header[22] = offset_100 & 0xFF
-    
+
     # Combine
-    full_data = header + glyph_data
-    
-    
+    return header + glyph_data
+
+
+def format_c_string_literal(full_data):
+    """The (split) C string literal of font data, without quotes at the ends."""
+    # The compiler appends a NUL to the string literal, that is the last byte
+    if full_data[-1:] == b'\0':
+        full_data = full_data[:-1]
+
     # Convert to C string with octal escaping (matching original u8g2 format)
     c_str = ""
     line_len = 0
@@ -1053,199 +2111,721 @@ def generate_u8g2_c(glyphs, font_bbx, name):
             line_len = 0
         c_str += s
         line_len += len(s)
-        
-    return f'const uint8_t {name}[] U8G2_FONT_SECTION("{name}") = \n  "{c_str}";\n'
+    return c_str
+
+
+def format_u8g2_c(full_data, name, section='U8G2_FONT_SECTION'):
+    c_str = format_c_string_literal(full_data)
+    return f'const uint8_t {name}[] {section}("{name}") = \n  "{c_str}";\n'
+
+
+def generate_u8g2_c(glyphs, font_bbx, name):
+    return format_u8g2_c(encode_u8g2_font(glyphs, font_bbx), name)
+
+
+# u8x8 tile fonts
+#
+# u8x8 draws characters as 8x8 pixel tiles without any decoding. A font is a
+# 4 byte header (first char, last char, tiles horizontally, tiles vertically)
+# followed by th * tv tiles per char from first to last, tiles in row-major
+# order. Each tile is 8 bytes, one per pixel column with the top pixel in the
+# LSB. Only 8-bit codepoints are supported and the font is monospaced.
+
+U8X8_TILE = 8
+
+
+# Splitting oversized fonts
+#
+# Fonts above a size budget (e.g. 32767 bytes, the largest PROGMEM object
+# on AVR) are partitioned into several u8g2 fonts covering contiguous
+# codepoint ranges. Unicode blocks are kept together where possible (a block
+# larger than the budget is cut between glyphs) and the parts are balanced
+# by encoded size. A routing table maps each range to its font.
+
+def u8g2_part_overhead(block2):
+    """Bytes besides the glyph records: header, Block 1 terminator, jump table, end marker."""
+    return 23 + 2 + 4 * max(1, -(-block2 // U8G2_JUMP_TABLE_GLYPHS)) + 2
+
+
+def split_block_units(records, max_size):
+    """
+    Group (codepoint, record bytes) records by Unicode block; blocks above
+    max_size become one unit per glyph, to be cut anywhere.
+    Returns: list of (records, record bytes, Block 2 glyphs) units
+    """
+    blocks = []
+    key = None
+    for rec in records:
+        block = block_of(rec[0])
+        # Codepoints outside any block stay with their neighbours
+        rec_key = block[0] if block else key
+        if blocks and rec_key == key:
+            blocks[-1].append(rec)
+        else:
+            blocks.append([rec])
+        key = rec_key
+
+    units = []
+    for block in blocks:
+        size = sum(n for _, n in block)
+        block2 = sum(1 for uc, _ in block if uc > 255)
+        if u8g2_part_overhead(block2) + size <= max_size:
+            units.append((block, size, block2))
+        else:
+            units.extend(([rec], rec[1], int(rec[0] > 255)) for rec in block)
+    return units
+
+
+def pack_split_units(units, capacity):
+    """Fill parts in codepoint order, starting a new part when the next unit doesn't fit."""
+    parts = []
+    size = block2 = 0
+    for records, unit_size, unit_block2 in units:
+        if parts and u8g2_part_overhead(block2 + unit_block2) + size + unit_size <= capacity:
+            parts[-1].extend(records)
+            size += unit_size
+            block2 += unit_block2
+        else:
+            parts.append(list(records))
+            size = unit_size
+            block2 = unit_block2
+    return parts
+
+
+def partition_u8g2_records(records, max_size):
+    """
+    Partition glyph records into the fewest parts of at most max_size bytes,
+    then balance them: the smallest capacity that still needs no more parts.
+    Returns: list of parts, each a list of (codepoint, record bytes)
+    """
+    units = split_block_units(records, max_size)
+    largest = 0
+    for unit_records, size, block2 in units:
+        if u8g2_part_overhead(block2) + size > max_size:
+            raise ValueError(f"glyph U+{unit_records[0][0]:04X} alone does not fit into {max_size} bytes")
+        largest = max(largest, u8g2_part_overhead(block2) + size)
+    count = len(pack_split_units(units, max_size))
+    lo = largest
+    hi = max_size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if len(pack_split_units(units, mid)) <= count:
+            hi = mid
+        else:
+            lo = mid + 1
+    return pack_split_units(units, lo)
+
+
+def split_u8g2_font(glyphs, font_bbx, max_size, cache=None, rle_policy=None):
+    """
+    Encode glyphs as several u8g2 fonts of at most max_size bytes each.
+    Every part is optimized on its own (m0/m1, field widths) and shares the
+    font bounding box and ascent/descent, so text lines up across parts.
+    Returns: list of (first codepoint, last codepoint, font data)
+    Raises: ValueError if the font exceeds other format limits or a glyph doesn't fit
+    """
+    glyphs = sorted(glyphs, key=lambda g: g['uc'])
+    data = encode_u8g2_font(list(glyphs), font_bbx, cache, rle_policy)
+    header = read_u8g2_header(data)
+    records = [(uc, size) for uc, _, size in iter_u8g2_glyphs(data, header)]
+    by_uc = {g['uc']: g for g in glyphs}
+
+    # Re-optimized parts are usually smaller than their estimate from the
+    # whole font, but per glyph byte rounding can make one a bit larger
+    budget = max_size
+    for _ in range(8):
+        parts = []
+        for part in partition_u8g2_records(records, budget):
+            part_glyphs = [by_uc[uc] for uc, _ in part]
+            parts.append((part[0][0], part[-1][0], encode_u8g2_font(part_glyphs, font_bbx, None, rle_policy)))
+        excess = max(len(part_data) for _, _, part_data in parts) - max_size
+        if excess <= 0:
+            return parts
+        budget -= excess
+    raise ValueError(f"could not split the font into parts of at most {max_size} bytes")
+
+
+def format_u8g2_split_c(parts, name):
+    """C source with one font per part and the codepoint range routing table."""
+    out = [format_u8g2_c(part_data, f"{name}_{i}") + '\n' for i, (_, _, part_data) in enumerate(parts)]
+    out.append("/* Codepoint -> font: the font of the entry with first <= codepoint <= last */\n")
+    out.append(f"const struct {{ uint16_t first; uint16_t last; const uint8_t *font; }} {name}_routes[{len(parts)}] = {{\n")
+    for i, (first, last, _) in enumerate(parts):
+        out.append(f"  {{ 0x{first:04X}, 0x{last:04X}, {name}_{i} }},\n")
+    out.append("};\n")
+    return ''.join(out)
+
+
+def report_u8g2_split(parts, name, max_size):
+    total = sum(len(part_data) for _, _, part_data in parts)
+    print(f"Split into {len(parts)} font(s) of at most {max_size} bytes, {total} bytes total:")
+    for i, (first, last, part_data) in enumerate(parts):
+        print(f"  {name}_{i}: U+{first:04X}-U+{last:04X}, {len(part_data)} bytes")
+
+
+def parse_tile_size(text):
+    """Parse a "WxH" tile count (e.g. "2x2")."""
+    m = re.fullmatch(r'\s*(\d+)\s*[xX]\s*(\d+)\s*', text)
+    if not m or not (1 <= int(m.group(1)) <= 255 and 1 <= int(m.group(2)) <= 255):
+        raise ValueError(f"invalid tile size '{text}', expected e.g. 1x1 or 2x2")
+    return int(m.group(1)), int(m.group(2))
+
+
+def u8x8_cell_layout(glyphs, tiles=None):
+    """
+    Find the tile count of the character cell and where glyphs go in it.
+    The glyph origins share one column and the lowest descender touches the
+    bottom of the cell.
+    tiles: (th, tv) to use instead of the smallest cell that fits all glyphs
+    Returns: (th, tv, left, bottom), left/bottom being the glyph coordinates
+    of the cell's lower left pixel
+    Raises: ValueError if a glyph does not fit
+    """
+    inked = [g for g in glyphs if g['w'] and g['h']]
+    left = min([0] + [g['x'] for g in inked])
+    bottom = min([0] + [g['y'] for g in inked])
+    width = max([1] + [g['x'] + g['w'] - left for g in inked])
+    height = max([1] + [g['y'] + g['h'] - bottom for g in inked])
+
+    if tiles is None:
+        return (width + U8X8_TILE - 1) // U8X8_TILE, (height + U8X8_TILE - 1) // U8X8_TILE, left, bottom
+
+    th, tv = tiles
+    too_big = [g for g in inked
+               if g['x'] + g['w'] - left > th * U8X8_TILE or g['y'] + g['h'] - bottom > tv * U8X8_TILE]
+    if too_big:
+        listed = ', '.join(f"U+{g['uc']:04X} ({g['w']}x{g['h']}{g['x']:+d}{g['y']:+d})" for g in too_big[:10])
+        raise ValueError(f"{len(too_big)} glyphs don't fit into {th}x{tv} tiles "
+                         f"({th * U8X8_TILE}x{tv * U8X8_TILE} pixels): {listed}")
+    return th, tv, left, bottom
+
+
+def encode_u8x8_font(glyphs, tiles=None):
+    """
+    Encode glyphs into the u8x8 tile font format.
+    tiles: optional (th, tv), by default the smallest cell that fits all glyphs
+    Returns: (bytearray with the font, th, tv)
+    Raises: ValueError if the glyphs can't be represented
+    """
+    if not glyphs:
+        raise ValueError("no glyphs to encode")
+    wide = sorted(g['uc'] for g in glyphs if g['uc'] > 255)
+    if wide:
+        listed = ', '.join(f"U+{uc:04X}" for uc in wide[:10])
+        raise ValueError(f"u8x8 fonts only hold codepoints 0-255, found {len(wide)} above (e.g. {listed}); "
+                         f"use -m to select a range")
+
+    th, tv, left, bottom = u8x8_cell_layout(glyphs, tiles)
+    cell_h = tv * U8X8_TILE
+    by_uc = {g['uc']: g for g in glyphs}
+    first = min(by_uc)
+    last = max(by_uc)
+    glyph_size = th * tv * U8X8_TILE
+
+    data = bytearray([first, last, th, tv])
+    data.extend(bytes(glyph_size * (last - first + 1)))
+    for uc, g in by_uc.items():
+        base = 4 + (uc - first) * glyph_size
+        # Cell row (from the top) of the glyph's first bitmap row
+        top_row = cell_h - (g['y'] - bottom) - g['h']
+        for r in range(g['h']):
+            row = top_row + r
+            for c in range(g['w']):
+                if g['bitmap'][r * g['w'] + c]:
+                    col = g['x'] - left + c
+                    tile = (row // U8X8_TILE) * th + col // U8X8_TILE
+                    data[base + tile * U8X8_TILE + col % U8X8_TILE] |= 1 << (row % U8X8_TILE)
+
+    proportional = len({g['d'] for g in glyphs}) > 1
+    if proportional:
+        print(f"Note: u8x8 fonts are monospaced, advance widths are replaced by {th * U8X8_TILE} pixels")
+    return data, th, tv
+
+
+def report_u8x8_tradeoff(glyphs, font_bbx, u8x8_data, th, tv):
+    """
+    Print flash size and render cost of the u8x8 font next to the u8g2 encoding of the same glyphs.
+    Returns: (u8g2 size, None), or (None, reason) if the glyphs don't fit the u8g2 format
+    """
+    first, last = u8x8_data[0], u8x8_data[1]
+    slots = last - first + 1
+    print(f"u8x8: {th}x{tv} tiles ({th * U8X8_TILE}x{tv * U8X8_TILE} pixels), chars {first}-{last} "
+          f"({slots - len(glyphs)} empty slots), {len(u8x8_data)} bytes")
 
+    u8g2_data, reason = encode_u8g2_for_report(glyphs, font_bbx)
+    if u8g2_data is None:
+        print(f"u8g2: n/a ({reason})")
+        return None, reason
+    header = read_u8g2_header(u8g2_data)
+    records = [(uc, pos, size) for uc, pos, size in iter_u8g2_glyphs(u8g2_data, header)]
+    avg_bits = sum(size for _, _, size in records) * 8 / max(len(records), 1)
+    avg_pixels = sum(g['w'] * g['h'] for g in glyphs) / max(len(glyphs), 1)
+    print(f"u8g2: {len(u8g2_data)} bytes")
+    print(f"Flash: u8x8 is {len(u8x8_data) - len(u8g2_data):+d} bytes "
+          f"({len(u8x8_data) / len(u8g2_data):.1f}x) compared to u8g2")
+    print(f"Render: u8x8 sends {th * tv} tile(s) of 8 bytes per char straight to the display; "
+          f"u8g2 decodes {avg_bits:.0f} bits of RLE data into {avg_pixels:.0f} pixels per glyph on average "
+          f"and needs a frame or page buffer")
+    return len(u8g2_data), None
 
-def convert_u8g2_to_bdf(data, name, output_file):
+
+# Uncompressed direct-indexed fonts
+#
+# For targets where RLE decoding at draw time is too slow: a C header with
+# row-packed bitmaps (each row padded to whole bytes, leftmost pixel in the
+# MSB), a metrics table and a codepoint index, plus inline lookup code. Two
+# index layouts give O(1) lookup:
+# - dense:  one uint16_t glyph number per codepoint from first to last
+# - sparse: a page table with one entry per 256 codepoints, pointing to
+#           256-entry index blocks for the pages that hold glyphs
+# 0xFFFF marks codepoints (or pages) without a glyph.
+
+DIRECT_INDEX_MODES = ['auto', 'dense', 'sparse']
+DIRECT_NONE = 0xFFFF
+DIRECT_PAGE = 256
+
+
+def _c_array(ctype, name, values, per_line=16, fmt='{}'):
+    lines = []
+    for i in range(0, len(values), per_line):
+        lines.append('  ' + ', '.join(fmt.format(v) for v in values[i:i + per_line]) + ',')
+    return f"static const {ctype} {name}[{len(values)}] = {{\n" + '\n'.join(lines) + "\n};\n"
+
+
+def build_direct_index(codepoints, mode):
+    """
+    Build the codepoint index for glyph numbers 0..n-1 (codepoints sorted).
+    Returns: (mode, dict of uint16_t tables: 'index' and for sparse 'pages')
+    """
+    first = codepoints[0]
+    last = codepoints[-1]
+
+    dense = [DIRECT_NONE] * (last - first + 1)
+    for i, uc in enumerate(codepoints):
+        dense[uc - first] = i
+
+    pages = [DIRECT_NONE] * ((last // DIRECT_PAGE) + 1)
+    blocks = []
+    for i, uc in enumerate(codepoints):
+        page = uc // DIRECT_PAGE
+        if pages[page] == DIRECT_NONE:
+            pages[page] = len(blocks) // DIRECT_PAGE
+            blocks.extend([DIRECT_NONE] * DIRECT_PAGE)
+        blocks[pages[page] * DIRECT_PAGE + uc % DIRECT_PAGE] = i
+
+    if mode == 'auto':
+        mode = 'dense' if len(dense) <= len(pages) + len(blocks) else 'sparse'
+    if mode == 'dense':
+        return mode, {'index': dense}
+    return mode, {'pages': pages, 'index': blocks}
+
+
+def encode_direct_font(glyphs, name, index_mode='auto'):
+    """
+    Generate the C header of an uncompressed direct-indexed font.
+    Returns: (header text, dict with the flash size of each table)
+    Raises: ValueError if the glyphs can't be represented
+    """
+    if not glyphs:
+        raise ValueError("no glyphs to encode")
+    glyphs = sorted(glyphs, key=lambda g: g['uc'])
+    if len(glyphs) >= DIRECT_NONE:
+        raise ValueError(f"direct-indexed fonts hold at most {DIRECT_NONE - 1} glyphs, got {len(glyphs)}")
+    for key, lo, hi in (('w', 0, 255), ('h', 0, 255), ('x', -128, 127), ('y', -128, 127), ('d', -128, 127)):
+        bad = [g for g in glyphs if not lo <= g[key] <= hi]
+        if bad:
+            raise ValueError(f"glyph U+{bad[0]['uc']:04X}: {key}={bad[0][key]} doesn't fit into {lo}..{hi}")
+
+    bitmaps = []
+    offsets = []
+    for g in glyphs:
+        offsets.append(len(bitmaps))
+        stride = (g['w'] + 7) // 8
+        for r in range(g['h']):
+            row = g['bitmap'][r * g['w']:(r + 1) * g['w']]
+            value = int(''.join(map(str, row)) or '0', 2) << (stride * 8 - g['w'])
+            bitmaps.extend(value.to_bytes(stride, 'big'))
+
+    offset_type = 'uint16_t' if len(bitmaps) <= 0xFFFF else 'uint32_t'
+    # offset + w, h, x, y, d padded to the alignment of the offset
+    glyph_size = 8 if offset_type == 'uint16_t' else 12
+    codepoints = [g['uc'] for g in glyphs]
+    mode, tables = build_direct_index(codepoints, index_mode)
+
+    guard = re.sub(r'\W', '_', name).upper() + '_H'
+    out = [f"/* {len(glyphs)} glyphs, uncompressed, {mode} index. Generated by u8g2_to_bdf.py */\n",
+           f"#ifndef {guard}\n#define {guard}\n\n#include <stddef.h>\n#include <stdint.h>\n\n",
+           f"typedef struct {{\n  {offset_type} offset; /* into {name}_bitmaps, rows of (w + 7) / 8 bytes, MSB left */\n"
+           f"  uint8_t w, h;\n  int8_t x, y, d;\n}} {name}_glyph_t;\n\n",
+           f"#define {name.upper()}_FIRST {codepoints[0]}u\n#define {name.upper()}_LAST {codepoints[-1]}u\n\n",
+           _c_array('uint8_t', f"{name}_bitmaps", bitmaps or [0], fmt='0x{:02X}'), "\n"]
+    out.append(f"static const {name}_glyph_t {name}_glyphs[{len(glyphs)}] = {{\n")
+    for g, offset in zip(glyphs, offsets):
+        out.append(f"  {{{offset}, {g['w']}, {g['h']}, {g['x']}, {g['y']}, {g['d']}}}, /* U+{g['uc']:04X} */\n")
+    out.append("};\n\n")
+    for table in ('pages', 'index'):
+        if table in tables:
+            out.append(_c_array('uint16_t', f"{name}_{table}", tables[table], fmt='0x{:04X}'))
+            out.append("\n")
+
+    out.append(f"/* Glyph of a codepoint, NULL if it is not in the font */\n"
+               f"static inline const {name}_glyph_t *{name}_lookup(uint32_t cp) {{\n")
+    if mode == 'dense':
+        out.append(f"  uint16_t i;\n"
+                   f"  if (cp < {name.upper()}_FIRST || cp > {name.upper()}_LAST) return NULL;\n"
+                   f"  i = {name}_index[cp - {name.upper()}_FIRST];\n")
+    else:
+        out.append(f"  uint16_t page, i;\n"
+                   f"  if (cp > {name.upper()}_LAST) return NULL;\n"
+                   f"  page = {name}_pages[cp >> 8];\n"
+                   f"  if (page == 0xFFFF) return NULL;\n"
+                   f"  i = {name}_index[((uint32_t)page << 8) | (cp & 0xFF)];\n")
+    out.append(f"  return i == 0xFFFF ? NULL : &{name}_glyphs[i];\n}}\n\n")
+    out.append(f"/* Pixel (px, py) of a glyph, (0, 0) is the top left */\n"
+               f"static inline int {name}_pixel(const {name}_glyph_t *g, uint8_t px, uint8_t py) {{\n"
+               f"  return ({name}_bitmaps[g->offset + (size_t)py * ((g->w + 7u) >> 3) + (px >> 3)] >> (7 - (px & 7))) & 1;\n"
+               f"}}\n\n#endif /* {guard} */\n")
+
+    sizes = {'bitmaps': len(bitmaps), 'glyphs': glyph_size * len(glyphs),
+             'index': 2 * sum(len(t) for t in tables.values())}
+    return ''.join(out), sizes
+
+
+def report_direct_size(glyphs, font_bbx, sizes):
+    """
+    Print the flash size of the direct-indexed tables next to the compressed u8g2 size.
+    Returns: (u8g2 size, None), or (None, reason) if the glyphs don't fit the u8g2 format
+    """
+    total = sum(sizes.values())
+    print(f"Direct: {sizes['bitmaps']} bytes bitmaps + {sizes['glyphs']} bytes metrics + "
+          f"{sizes['index']} bytes index = {total} bytes")
+    u8g2_data, reason = encode_u8g2_for_report(glyphs, font_bbx)
+    if u8g2_data is None:
+        print(f"u8g2: n/a ({reason})")
+        return None, reason
+    u8g2_size = len(u8g2_data)
+    print(f"u8g2: {u8g2_size} bytes compressed, direct is {total - u8g2_size:+d} bytes "
+          f"({total / u8g2_size:.1f}x)")
+    return u8g2_size, None
+
+
+def read_u8g2_header(data):
+    """
+    Decode the 23 byte u8g2 font header.
+    Returns: dict with the header fields, or None if the data is too short
+    """
     if len(data) < 23:
-        print("Data too short for header")
-        return
+        return None
 
-    n_glyphs = data[0]
-    bbx_mode = data[1]
-    m0 = data[2]
-    m1 = data[3]
-    bitcntW = data[4]
-    bitcntH = data[5]
-    bitcntX = data[6]
-    bitcntY = data[7]
-    bitcntD = data[8]
-    
-    font_bbx_w = data[9]
-    font_bbx_h = data[10]
     font_bbx_x = data[11]
-    font_bbx_y = data[12] 
+    if font_bbx_x > 127: font_bbx_x -= 256 # Signed byte
+    font_bbx_y = data[12]
     if font_bbx_y > 127: font_bbx_y -= 256 # Signed byte
-    
-    ascent_A = data[13]
-    descent_g = data[14] 
+    descent_g = data[14]
     if descent_g > 127: descent_g -= 256 # Signed byte
-    
-    # Get offset to Unicode block (glyphs > 255)
-    offset_100 = (data[21] << 8) | data[22]
-    
+
+    return {
+        'n_glyphs': data[0],
+        'bbx_mode': data[1],
+        'm0': data[2],
+        'm1': data[3],
+        'bitcntW': data[4],
+        'bitcntH': data[5],
+        'bitcntX': data[6],
+        'bitcntY': data[7],
+        'bitcntD': data[8],
+        'bbx_w': data[9],
+        'bbx_h': data[10],
+        'bbx_x': font_bbx_x,
+        'bbx_y': font_bbx_y,
+        'ascent_A': data[13],
+        'descent_g': descent_g,
+        # Offset to Unicode block (glyphs > 255)
+        'offset_100': (data[21] << 8) | data[22],
+    }
+
+
+def skip_u8g2_jump_table(data, idx):
+    """
+    Block 2 of fonts from u8g2 v2.23 on starts with a jump table of 4 byte
+    (offset, last unicode) entries, ended by unicode 0xFFFF. The first offset
+    is the length of the table, which is what identifies it.
+    Returns: position of the first Block 2 glyph
+    """
+    if idx + 4 > len(data):
+        return idx
+    table_len = (data[idx] << 8) | data[idx + 1]
+    end = idx + table_len
+    if table_len < 4 or table_len % 4 or end > len(data):
+        return idx # Older font without jump table
+    if (data[end - 2] << 8) | data[end - 1] != 0xFFFF:
+        return idx
+    # No 0xFFFF before the last entry
+    for entry in range(idx, end - 4, 4):
+        if (data[entry + 2] << 8) | data[entry + 3] == 0xFFFF:
+            return idx
+    return end
+
+
+def iter_u8g2_glyphs(data, header):
+    """
+    Walk the glyph list of a u8g2 font without decoding any bitmaps.
+    Yields (unicode, position of the glyph bit fields, offset to next glyph)
+    for Block 1 (unicode <= 255) followed by Block 2 (unicode > 255).
+    """
+    offset_100 = header['offset_100']
+
     # Parse Block 1: glyphs with unicode <= 255
     idx = 23
-    glyphs = []
-    
+
     # Determine where Block 1 ends (either at offset_100 or when we hit 0 offset)
     block1_end = 23 + offset_100 if offset_100 > 0 else len(data)
-    
+
     while idx < block1_end and idx < len(data):
         if idx + 1 >= len(data): break
-        
+
         uc = data[idx]
         next_offset = data[idx+1]
-        
+
         if next_offset == 0:
             # End of Block 1
             break
-            
-        glyph_data_start = idx + 2
-        br = BitReader(data[glyph_data_start:])
-        
-        w = br.read_bits(bitcntW)
-        h = br.read_bits(bitcntH)
-        x = br.read_signed_bits(bitcntX)
-        y = br.read_signed_bits(bitcntY)
-        d = br.read_signed_bits(bitcntD)
-        
-        target_bits = w * h
-        current_bits = 0
-        bitmap = [] 
-        
-        while current_bits < target_bits:
-            run_0 = br.read_bits(m0)
-            run_1 = br.read_bits(m1)
-            
-            repeat = 0
-            while True:
-                bit = br.read_bits(1)
-                if bit == 0:
-                    break
-                repeat += 1
-            
-            for _ in range(repeat + 1):
-                bitmap.extend([0] * run_0)
-                bitmap.extend([1] * run_1)
-                
-            current_bits += (run_0 + run_1) * (repeat + 1)
-            
-        bitmap = bitmap[:target_bits]
-        
-        glyphs.append({
-            'uc': uc,
-            'w': w, 'h': h, 'x': x, 'y': y, 'd': d,
-            'bitmap': bitmap
-        })
-        
+
+        yield uc, idx + 2, next_offset
         idx += next_offset
 
     # Parse Block 2: glyphs with unicode > 255
     if offset_100 > 0 and (23 + offset_100) < len(data):
         idx = 23 + offset_100
         
-        # Skip jump table if present (u8g2 v2.23+)
-        # Jump table entries are: offset(2) + unicode(2)
-        # Last entry has unicode = 0xFFFF
-        # We need to find the actual glyph data start
-        
-        # Simple heuristic: check if we're at a jump table
-        # Jump table has predictable structure, glyph data doesn't
-        # For now, assume no jump table or handle it simply
-        
-        # Try to detect jump table: if first 2 bytes look like an offset
-        # and bytes 2-3 look like a unicode value, it might be a jump table
-        if idx + 4 < len(data):
-            potential_offset = (data[idx] << 8) | data[idx + 1]
-            potential_unicode = (data[idx + 2] << 8) | data[idx + 3]
-            
-            # If potential_offset points within our data and potential_unicode looks valid
-            if potential_offset > 0 and potential_offset < 1000 and potential_unicode < 0xFFFF:
-                # Likely a jump table, skip to the glyph data
-                # Find the end of jump table (entry with unicode 0xFFFF)
-                jump_idx = idx
-                while jump_idx + 4 <= len(data):
-                    jump_unicode = (data[jump_idx + 2] << 8) | data[jump_idx + 3]
-                    if jump_unicode == 0xFFFF:
-                        # Found end of jump table
-                        jump_offset = (data[jump_idx] << 8) | data[jump_idx + 1]
-                        idx = jump_idx + jump_offset
-                        break
-                    jump_idx += 4
+        # Skip the jump table (u8g2 v2.23+ fonts)
+        idx = skip_u8g2_jump_table(data, idx)
         
-        # Now parse Block 2 glyphs (2-byte unicode)
+        # Now walk Block 2 glyphs (2-byte unicode)
         while idx + 2 < len(data):
             # Unicode is 2 bytes in Block 2
             uc = (data[idx] << 8) | data[idx + 1]
-            
-            if idx + 2 >= len(data): break
             next_offset = data[idx + 2]
             
             if next_offset == 0 or uc == 0xFFFF:
                 # End of glyphs
                 break
-            
-            glyph_data_start = idx + 3
-            br = BitReader(data[glyph_data_start:])
-            
-            w = br.read_bits(bitcntW)
-            h = br.read_bits(bitcntH)
-            x = br.read_signed_bits(bitcntX)
-            y = br.read_signed_bits(bitcntY)
-            d = br.read_signed_bits(bitcntD)
-            
-            target_bits = w * h
-            current_bits = 0
-            bitmap = []
-            
-            while current_bits < target_bits:
-                run_0 = br.read_bits(m0)
-                run_1 = br.read_bits(m1)
-                
-                repeat = 0
-                while True:
-                    bit = br.read_bits(1)
-                    if bit == 0:
-                        break
-                    repeat += 1
-                
-                for _ in range(repeat + 1):
-                    bitmap.extend([0] * run_0)
-                    bitmap.extend([1] * run_1)
-                    
-                current_bits += (run_0 + run_1) * (repeat + 1)
-                
-            bitmap = bitmap[:target_bits]
-            
-            glyphs.append({
-                'uc': uc,
-                'w': w, 'h': h, 'x': x, 'y': y, 'd': d,
-                'bitmap': bitmap
-            })
-            
+
+            yield uc, idx + 3, next_offset
             idx += next_offset
 
-    # Print statistics
-    if glyphs:
-        unicode_ranges = {}
-        for g in glyphs:
-            uc = g['uc']
-            if uc < 128:
-                unicode_ranges['ASCII (0-127)'] = unicode_ranges.get('ASCII (0-127)', 0) + 1
-            elif uc < 256:
-                unicode_ranges['Latin-1 (128-255)'] = unicode_ranges.get('Latin-1 (128-255)', 0) + 1
-            elif uc < 0x0180:
-                unicode_ranges['Latin Extended-A (0x100-0x17F)'] = unicode_ranges.get('Latin Extended-A (0x100-0x17F)', 0) + 1
-            elif uc < 0x0250:
-                unicode_ranges['Latin Extended-B (0x180-0x24F)'] = unicode_ranges.get('Latin Extended-B (0x180-0x24F)', 0) + 1
-            else:
-                unicode_ranges[f'Other (0x{uc:04X})'] = unicode_ranges.get(f'Other (0x{uc:04X})', 0) + 1
-        
-        print(f"Parsed {len(glyphs)} glyphs:")
-        for range_name, count in sorted(unicode_ranges.items()):
-            print(f"  {range_name}: {count} glyphs")
+
+def read_u8g2_glyph_metrics(br, header):
+    """
+    Read the w, h, x, y, d fields at the start of a glyph's bit fields.
+    Returns: (w, h, x, y, d), br is left at the start of the RLE bitmap
+    """
+    w = br.read_bits(header['bitcntW'])
+    h = br.read_bits(header['bitcntH'])
+    x = br.read_signed_bits(header['bitcntX'])
+    y = br.read_signed_bits(header['bitcntY'])
+    d = br.read_signed_bits(header['bitcntD'])
+    return w, h, x, y, d
+
+
+def decode_u8g2_glyph(data, pos, header, counts=None):
+    """
+    Decode the glyph whose bit fields start at byte offset pos.
+    counts: optional dict, gets the decoder operations added (see u8g2_cost.py):
+    field_reads, bits, pairs, repeat_bits, segments (row pieces of non-empty
+    runs, i.e. draw calls), pixels
+    Returns: dict with w, h, x, y, d and the flat bitmap (uc is set by the caller)
+    """
+    m0 = header['m0']
+    m1 = header['m1']
+    br = BitReader(data, pos)
+
+    w, h, x, y, d = read_u8g2_glyph_metrics(br, header)
+
+    target_bits = w * h
+    current_bits = 0
+    bitmap = []
+    if counts is not None:
+        field_reads = 5
+        repeat_bits = pairs = segments = 0
+
+    while current_bits < target_bits:
+        run_0 = br.read_bits(m0)
+        run_1 = br.read_bits(m1)
+
+        repeat = 0
+        while True:
+            bit = br.read_bits(1)
+            if bit == 0:
+                break
+            repeat += 1
+
+        for _ in range(repeat + 1):
+            bitmap.extend([0] * run_0)
+            bitmap.extend([1] * run_1)
+
+        if counts is not None:
+            pairs += 1
+            field_reads += 2
+            repeat_bits += repeat + 1
+            # u8g2 draws a run in one piece per glyph row it touches
+            pos_bits = current_bits
+            for _ in range(repeat + 1):
+                for run in (run_0, run_1):
+                    # Padding past the last pixel is not drawn
+                    run = min(run, target_bits - pos_bits)
+                    if run > 0:
+                        segments += (pos_bits + run - 1) // w - pos_bits // w + 1
+                        pos_bits += run
+
+        current_bits += (run_0 + run_1) * (repeat + 1)
+
+    bitmap = bitmap[:target_bits]
+
+    if counts is not None:
+        end_bit = br.byte_idx * 8 + br.bit_idx - pos * 8
+        counts['field_reads'] = counts.get('field_reads', 0) + field_reads
+        counts['bits'] = counts.get('bits', 0) + end_bit - repeat_bits
+        counts['pairs'] = counts.get('pairs', 0) + pairs
+        counts['repeat_bits'] = counts.get('repeat_bits', 0) + repeat_bits
+        counts['segments'] = counts.get('segments', 0) + segments
+        counts['pixels'] = counts.get('pixels', 0) + target_bits
+
+    return {'w': w, 'h': h, 'x': x, 'y': y, 'd': d, 'bitmap': bitmap}
+
+
+def decode_u8g2_glyph_packed(data, pos, header):
+    """
+    Decode a glyph without building a per-pixel list: the bitmap is packed
+    into one int, row major with the first pixel in the most significant of
+    the w * h bits.
+    Returns: (w, h, x, y, d, packed bitmap)
+    """
+    m0 = header['m0']
+    m1 = header['m1']
+    br = BitReader(data, pos)
+
+    w, h, x, y, d = read_u8g2_glyph_metrics(br, header)
+
+    target_bits = w * h
+    current_bits = 0
+    packed = 0
+    while current_bits < target_bits:
+        run_0 = br.read_bits(m0)
+        run_1 = br.read_bits(m1)
+        repeat = 0
+        while br.read_bits(1):
+            repeat += 1
+        for _ in range(repeat + 1):
+            current_bits += run_0
+            ones = min(run_1, target_bits - current_bits)
+            if ones > 0:
+                packed |= ((1 << ones) - 1) << (target_bits - current_bits - ones)
+            current_bits += run_1
+
+    return w, h, x, y, d, packed
+
+
+# Parallel decoding
+#
+# Finding the glyphs means following the offset bytes from glyph to glyph,
+# but that walk is cheap. The RLE decoding of each glyph is independent, so
+# the glyph list is split into contiguous chunks of similar byte size that a
+# process pool decodes from one shared memory copy of the font.
+
+DECODE_CHUNKS_PER_JOB = 4
+
+
+def _decode_u8g2_chunk(shm_name, header, entries):
+    """Worker: decode (uc, pos) entries from the font in shared memory."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        glyphs = []
+        for uc, pos in entries:
+            glyph = decode_u8g2_glyph(shm.buf, pos, header)
+            # bytes pickle much faster than a list of ints
+            glyph['bitmap'] = bytes(glyph['bitmap'])
+            glyph['uc'] = uc
+            glyphs.append(glyph)
+        return glyphs
+    finally:
+        shm.close()
+
+
+def split_u8g2_entries(entries, parts):
+    """Split (uc, pos, size) entries into up to parts contiguous chunks of similar total size."""
+    total = sum(size for _, _, size in entries)
+    target = total / parts if parts else total
+    chunks = []
+    current = []
+    current_size = 0
+    for uc, pos, size in entries:
+        current.append((uc, pos))
+        current_size += size
+        if current_size >= target and len(chunks) < parts - 1:
+            chunks.append(current)
+            current = []
+            current_size = 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def decode_u8g2_glyphs(data, header, allowed_codepoints=None, jobs=1):
+    """
+    Decode all glyphs (or those in allowed_codepoints) of a u8g2 font, in font order.
+    jobs > 1 decodes in a process pool sharing the font data.
+    Returns: list of glyph dicts
+    """
+    entries = [(uc, pos, size) for uc, pos, size in iter_u8g2_glyphs(data, header)
+               if allowed_codepoints is None or uc in allowed_codepoints]
+
+    if jobs <= 1 or len(entries) < 2:
+        glyphs = []
+        for uc, pos, _ in entries:
+            glyph = decode_u8g2_glyph(data, pos, header)
+            glyph['uc'] = uc
+            glyphs.append(glyph)
+        return glyphs
+
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    try:
+        shm.buf[:len(data)] = data
+        chunks = split_u8g2_entries(entries, jobs * DECODE_CHUNKS_PER_JOB)
+        glyphs = []
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_decode_u8g2_chunk, shm.name, header, chunk) for chunk in chunks]
+            # Collect in submission order, so glyphs stay in font order
+            for future in futures:
+                glyphs.extend(future.result())
+        return glyphs
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def convert_u8g2_to_bdf(data, name, output_file, allowed_codepoints=None, stats='table', jobs=1, verbose=True):
+    """
+    verbose: print errors (the coverage table is controlled by stats)
+    Returns: number of glyphs written, None if data is not a u8g2 font
+    """
+    header = read_u8g2_header(data)
+    if header is None:
+        if verbose:
+            print("Data too short for header")
+        return None
+
+    font_bbx_w = header['bbx_w']
+    font_bbx_h = header['bbx_h']
+    font_bbx_x = header['bbx_x']
+    font_bbx_y = header['bbx_y']
+    ascent_A = header['ascent_A']
+    descent_g = header['descent_g']
+
+    # Glyphs filtered out by allowed_codepoints are never decoded
+    glyphs = decode_u8g2_glyphs(data, header, allowed_codepoints, jobs)
+
+    print_coverage([g['uc'] for g in glyphs], "Decoded glyphs", stats)
     
     with open(output_file, 'w') as f:
         f.write("STARTFONT 2.1\n")
@@ -1285,49 +2865,780 @@ def convert_u8g2_to_bdf(data, name, output_file):
         
         f.write("ENDFONT\n")
 
-def main():
+    return len(glyphs)
+
+# Build-time glyph transforms
+#
+# For displays mounted rotated or mirrored, or for 2x/3x digits, the glyphs
+# are transformed once here instead of by u8g2 at draw time. Metrics use the
+# u8g2 convention (y up, glyph box at x..x+w, y..y+h relative to the pen on
+# the baseline); bitmaps are row major with the top row first. Rotations
+# turn the glyph box about the pen position, d stays the advance along the
+# (rotated) text direction.
+
+TRANSFORM_ROTATIONS = [0, 90, 180, 270]
+TRANSFORM_MIRRORS = ['x', 'y']
+
+
+def mirror_glyph(g, axis, font_bbx):
+    """Mirror left-right within the advance cell (x), or upside down within the font bounding box (y)."""
+    w, h, bitmap = g['w'], g['h'], g['bitmap']
+    g = dict(g)
+    if axis == 'x':
+        g['bitmap'] = [bitmap[r * w + w - 1 - c] for r in range(h) for c in range(w)]
+        g['x'] = g['d'] - g['x'] - w
+    else:
+        g['bitmap'] = [p for r in range(h - 1, -1, -1) for p in bitmap[r * w:(r + 1) * w]]
+        g['y'] = 2 * font_bbx.get('y', 0) + font_bbx.get('h', 0) - g['y'] - h
+    return g
+
+
+def rotate_box(x, y, w, h, angle):
+    """Box (x, y, w, h) turned clockwise by angle about the origin."""
+    if angle == 90:
+        return y, -(x + w), h, w
+    if angle == 180:
+        return -(x + w), -(y + h), w, h
+    if angle == 270:
+        return -(y + h), x, h, w
+    return x, y, w, h
+
+
+def rotate_glyph(g, angle):
+    """Rotate clockwise by 90, 180 or 270 degrees."""
+    w, h, bitmap = g['w'], g['h'], g['bitmap']
+    if angle == 90:
+        # new[r][c] = old[h - 1 - c][r]
+        rotated = [bitmap[(h - 1 - c) * w + r] for r in range(w) for c in range(h)]
+    elif angle == 180:
+        rotated = bitmap[::-1]
+    elif angle == 270:
+        # new[r][c] = old[c][w - 1 - r]
+        rotated = [bitmap[c * w + w - 1 - r] for r in range(w) for c in range(h)]
+    else:
+        return g
+    g = dict(g)
+    g['x'], g['y'], g['w'], g['h'] = rotate_box(g['x'], g['y'], w, h, angle)
+    g['bitmap'] = rotated
+    return g
+
+
+def scale_glyph(g, factor):
+    """Integer scaling: every pixel becomes a factor x factor block."""
+    w, h, bitmap = g['w'], g['h'], g['bitmap']
+    scaled = []
+    for r in range(h):
+        row = [p for p in bitmap[r * w:(r + 1) * w] for _ in range(factor)]
+        for _ in range(factor):
+            scaled.extend(row)
+    g = dict(g)
+    for key in ('w', 'h', 'x', 'y', 'd'):
+        g[key] *= factor
+    g['bitmap'] = scaled
+    return g
+
+
+def transform_glyphs(glyphs, font_bbx, rotate=0, mirror=None, scale=1):
+    """
+    Mirror, then rotate, then scale glyphs and the font metrics.
+    Returns: (glyphs, font_bbx)
+    """
+    font_bbx = dict(font_bbx)
+    if mirror:
+        glyphs = [mirror_glyph(g, mirror, font_bbx) for g in glyphs]
+        if mirror == 'x' and glyphs:
+            # Glyphs move within their own advance, take the box they cover now
+            x0 = min(g['x'] for g in glyphs)
+            font_bbx['w'] = max(g['x'] + g['w'] for g in glyphs) - x0
+            font_bbx['x'] = x0
+    if rotate:
+        glyphs = [rotate_glyph(g, rotate) for g in glyphs]
+        if all(k in font_bbx for k in ('w', 'h', 'x', 'y')):
+            x, y, w, h = rotate_box(font_bbx['x'], font_bbx['y'], font_bbx['w'], font_bbx['h'], rotate)
+            font_bbx.update(x=x, y=y, w=w, h=h)
+            # The rotated font box gives the new line metrics
+            font_bbx['ascent'] = y + h
+            font_bbx['descent'] = -y
+    if scale > 1:
+        glyphs = [scale_glyph(g, scale) for g in glyphs]
+        for key in ('w', 'h', 'x', 'y', 'ascent', 'descent'):
+            if key in font_bbx:
+                font_bbx[key] *= scale
+    return glyphs, font_bbx
+
+
+def describe_transform(rotate=0, mirror=None, scale=1):
+    steps = []
+    if mirror:
+        steps.append(f"mirror {mirror}")
+    if rotate:
+        steps.append(f"rotate {rotate}")
+    if scale > 1:
+        steps.append(f"scale {scale}x")
+    return ', '.join(steps)
+
+
+def report_transform(glyphs, font_bbx, after, reason, description, cache=None):
+    """
+    Print the u8g2 flash size of the untransformed glyphs next to after, the
+    size of the transformed font (None if it doesn't fit the u8g2 format, for reason).
+    """
+    before, reason_before = encode_u8g2_for_report(glyphs, font_bbx, cache)
+    if before is None or after is None:
+        print(f"Transform ({description}): u8g2 n/a ({reason_before or reason})")
+        return
+    before = len(before)
+    print(f"Transform ({description}): u8g2 {before} -> {after} bytes ({after - before:+d}, {after / before:.2f}x)")
+
+
+OUTPUT_FORMATS = ['u8g2', 'u8x8', 'direct']
+
+
+def encode_output(glyphs, font_bbx, output, cache=None, output_format='u8g2', tiles=None, index_mode='auto',
+                  rle_policy=None, pareto=False, split_size=None, rotate=0, mirror=None, scale=1, sizes=None):
+    """
+    Encode glyphs to the bytes of the output file: raw blob for .bin, C source otherwise.
+    output_format: 'u8g2' (RLE compressed), 'u8x8' (tiles, see encode_u8x8_font)
+    or 'direct' (uncompressed C header, see encode_direct_font)
+    split_size: split u8g2 fonts into parts of at most this many bytes (see split_u8g2_font)
+    rotate, mirror, scale: build-time glyph transforms (see transform_glyphs)
+    sizes: optional dict, receives the 'u8g2' font size (all parts for split fonts)
+    Raises: ValueError if the glyphs can't be encoded in that format
+    """
+    font_name = output.replace('.', '_') # Simple name sanitization
+    description = describe_transform(rotate, mirror, scale)
+    if description:
+        original, original_bbx = glyphs, font_bbx
+        glyphs, font_bbx = transform_glyphs(glyphs, font_bbx, rotate, mirror, scale)
+
+    # Size of the u8g2 encoding done anyway for the output or its report,
+    # (None, reason) if the glyphs don't fit the u8g2 format
+    u8g2_size = reason = None
+    if split_size and output_format == 'u8g2':
+        if is_bin_file(output):
+            raise ValueError("--split writes a C file with the part fonts and their routing table, it has no binary blob form")
+        parts = split_u8g2_font(glyphs, font_bbx, split_size, cache, rle_policy)
+        report_u8g2_split(parts, font_name, split_size)
+        u8g2_size = sum(len(part_data) for _, _, part_data in parts)
+        result = format_u8g2_split_c(parts, font_name).encode('utf-8')
+    elif output_format == 'direct':
+        if is_bin_file(output):
+            raise ValueError("the direct format is a C header, it has no binary blob form")
+        text, direct_sizes = encode_direct_font(glyphs, font_name, index_mode)
+        u8g2_size, reason = report_direct_size(glyphs, font_bbx, direct_sizes)
+        result = text.encode('utf-8')
+    else:
+        if output_format == 'u8x8':
+            data, th, tv = encode_u8x8_font(glyphs, tiles)
+            u8g2_size, reason = report_u8x8_tradeoff(glyphs, font_bbx, data, th, tv)
+            section = 'U8X8_FONT_SECTION'
+        else:
+            data = encode_u8g2_font(glyphs, font_bbx, cache, rle_policy, pareto)
+            u8g2_size = len(data)
+            section = 'U8G2_FONT_SECTION'
+        if is_bin_file(output):
+            result = bytes(data)
+        else:
+            result = format_u8g2_c(data, font_name, section).encode('utf-8')
+
+    if description:
+        # The untransformed font has its own cache, sharing one would evict the other's entries every pass
+        report_transform(original, original_bbx, u8g2_size, reason, description,
+                         cache.companion() if cache is not None else None)
+    if sizes is not None and u8g2_size is not None:
+        sizes['u8g2'] = u8g2_size
+    return result
+
+
+def write_if_changed(filepath, data):
+    """Write data unless the file already holds exactly these bytes. Returns: True if written"""
+    try:
+        with open(filepath, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    with open(filepath, 'wb') as f:
+        f.write(data)
+    return True
+
+
+# Recompression
+#
+# Existing u8g2 fonts are decoded in memory and re-encoded with the RLE
+# optimizer, optionally with every glyph cropped to its ink. A font is only
+# replaced if the result is smaller. Font wide header fields that are not
+# derived from the glyphs (bbx mode, font bounding box, ascent/descent of
+# 'A', 'g' and '(') are kept.
+
+RECOMPRESS_EXTENSIONS = ('.c', '.bin')
+
+
+def crop_glyph(g):
+    """Returns: copy of g without the blank rows and columns around the ink (0x0 if blank)"""
+    w, h, bitmap = g['w'], g['h'], g['bitmap']
+    rows = [r for r in range(h) if any(bitmap[r * w:(r + 1) * w])]
+    if not rows:
+        return dict(g, w=0, h=0, bitmap=[])
+    cols = [c for c in range(w) if any(bitmap[r * w + c] for r in rows)]
+    top, bottom = rows[0], rows[-1]
+    left, right = cols[0], cols[-1]
+    cropped = [bitmap[r * w + c] for r in range(top, bottom + 1) for c in range(left, right + 1)]
+    return dict(g, w=right - left + 1, h=bottom - top + 1,
+                x=g['x'] + left, y=g['y'] + (h - 1 - bottom), bitmap=cropped)
+
+
+def _glyph_key(g):
+    return (g['uc'], g['w'], g['h'], g['x'], g['y'], g['d'], list(g['bitmap']))
+
+
+def recompress_u8g2(data, crop=False):
+    """
+    Re-encode u8g2 font data with optimal RLE parameters and bit field widths.
+    Returns: new font data
+    Raises: ValueError if the data is not a font or the result doesn't decode to the same glyphs
+    """
+    header = read_u8g2_header(data)
+    if header is None:
+        raise ValueError("data too short for header")
+    glyphs = decode_u8g2_glyphs(data, header)
+    if crop:
+        glyphs = [crop_glyph(g) for g in glyphs]
+    expected = [_glyph_key(g) for g in glyphs]
+
+    new = encode_u8g2_font(glyphs, {})
+    # Cropping removes the padding of monospaced (bbx mode > 0) fonts
+    new[1] = 0 if crop else data[1]
+    new[9:17] = data[9:17]
+
+    new_header = read_u8g2_header(new)
+    if [_glyph_key(g) for g in decode_u8g2_glyphs(new, new_header)] != expected:
+        raise ValueError("re-encoded font doesn't decode to the original glyphs")
+    return bytes(new)
+
+
+def recompress_file(filepath, crop=False):
+    """
+    Recompress the font in a .bin file, or every u8g2 font array in a C file,
+    rewriting the file if at least one font got smaller.
+    Returns: list of (font name, size before, size after or None if skipped, message)
+    """
+    results = []
+    if is_bin_file(filepath):
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        try:
+            new = recompress_u8g2(data, crop)
+        except (ValueError, IndexError) as e:
+            return [(font_name_from_path(filepath), len(data), None, f"skipped: {e}")]
+        if len(new) < len(data):
+            with open(filepath, 'wb') as f:
+                f.write(new)
+        return [(font_name_from_path(filepath), len(data), len(new), None)]
+
+    with open(filepath, 'r') as f:
+        content = f.read()
+    parts = []
+    last = 0
+    matches = list(iter_c_fonts(content))
+    if not matches:
+        return [(font_name_from_path(filepath), None, None, "skipped: no u8g2 font array found")]
+    for match in matches:
+        name = match.group('name')
+        if match.group('section') == 'U8X8_FONT_SECTION':
+            results.append((name, None, None, "skipped: u8x8 font"))
+            continue
+        data = decode_c_string(match.group('data'))
+        try:
+            new = recompress_u8g2(data, crop)
+        except (ValueError, IndexError) as e:
+            results.append((name, len(data), None, f"skipped: {e}"))
+            continue
+        results.append((name, len(data), len(new), None))
+        if len(new) < len(data):
+            # Only the string literal and a declared array size change, the
+            # rest of the declaration (section or attribute macros) is kept
+            declaration = content[match.start():match.start('data')]
+            declaration = C_ARRAY_SIZE_RE.sub(f"[{len(new)}]", declaration, count=1)
+            literal_end = match.start('data') + len(match.group('data').rstrip())
+            parts.append(content[last:match.start()])
+            parts.append(declaration + '"' + format_c_string_literal(new) + '"')
+            last = literal_end
+
+    if parts:
+        parts.append(content[last:])
+        with open(filepath, 'w') as f:
+            f.write(''.join(parts))
+    return results
+
+
+def recompress_paths(path, crop=False):
+    """Recompress a font file or all .c/.bin font files below a directory and print a before/after report."""
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name)
+                       for root, _, names in os.walk(path)
+                       for name in names if name.lower().endswith(RECOMPRESS_EXTENSIONS))
+    else:
+        files = [path]
+
+    total_before = total_after = 0
+    report = []
+    for filepath in files:
+        for name, before, after, message in recompress_file(filepath, crop):
+            if after is None:
+                report.append(f"  {filepath}: {name}: {message}")
+                continue
+            # Fonts that didn't get smaller are kept as they are
+            kept = min(before, after)
+            total_before += before
+            total_after += kept
+            status = f"{after - before:+d} bytes" if after < before else "kept (not smaller)"
+            report.append(f"  {filepath}: {name}: {before} -> {after} bytes, {status}")
+
+    print(f"Recompressed {len(files)} file(s):")
+    for line in report:
+        print(line)
+    if total_before:
+        print(f"Total: {total_before} -> {total_after} bytes "
+              f"({total_before - total_after} bytes saved, {100 * (total_before - total_after) / total_before:.1f}%)")
+
+
+# Byte level subsetting
+#
+# A subset of a u8g2 font keeps the RLE parameters and bit field widths of
+# the original, which stay valid for every glyph that is left. The glyph
+# records are copied verbatim (their next glyph offset is their own size),
+# only the header offsets of 'A', 'a' and Block 2 and the jump table are
+# rebuilt. No bitmap is decoded, the glyphs stay bit exact.
+
+def subset_u8g2(data, allowed_codepoints):
+    """
+    Copy the glyph records of the codepoints in allowed_codepoints into a new font.
+    Returns: (new font data, number of glyphs kept)
+    Raises: ValueError if the data is not a font or the subset exceeds the format limits
+    """
+    header = read_u8g2_header(data)
+    if header is None:
+        raise ValueError("data too short for header")
+
+    block1 = bytearray()
+    block2 = bytearray()
+    block2_codepoints = []
+    block2_starts = []
+    offset_A = offset_a = 0
+    count = 0
+    for uc, pos, size in iter_u8g2_glyphs(data, header):
+        if allowed_codepoints is not None and uc not in allowed_codepoints:
+            continue
+        count += 1
+        if uc <= 255:
+            if uc == ord('A'): offset_A = len(block1)
+            if uc == ord('a'): offset_a = len(block1)
+            block1 += data[pos - 2:pos - 2 + size]
+        else:
+            block2_codepoints.append(uc)
+            block2_starts.append(len(block2))
+            block2 += data[pos - 3:pos - 3 + size]
+
+    # End of Block 1, then the jump table and Block 2, ended by unicode 0
+    glyph_data = block1 + b'\0\0'
+    offset_100 = len(glyph_data)
+    glyph_data += build_u8g2_jump_table(block2_codepoints, block2_starts)
+    glyph_data += block2 + b'\0\0'
+    if offset_100 > U8G2_MAX_OFFSET:
+        raise format_limit_error([f"offset of Block 2 {offset_100} does not fit into 16 bits"])
+
+    new = bytearray(data[:23])
+    new[0] = count & 0xFF
+    new[17:23] = bytes([offset_A >> 8, offset_A & 0xFF, offset_a >> 8, offset_a & 0xFF,
+                        offset_100 >> 8, offset_100 & 0xFF])
+    return bytes(new + glyph_data), count
+
+
+def subset_font_file(input_file, output, allowed_codepoints, loader):
+    """Subset the u8g2 font in input_file into output (C or .bin) and print a report."""
+    data, _ = loader.load_u8g2(input_file)
+    if not data:
+        raise ValueError(f"failed to read font data from {input_file}")
+    start = time.perf_counter()
+    new, count = subset_u8g2(data, allowed_codepoints)
+    elapsed = time.perf_counter() - start
+    before = sum(1 for _ in iter_u8g2_glyphs(data, read_u8g2_header(data)))
+    print(f"Subset: {before} -> {count} glyphs, {len(data)} -> {len(new)} bytes ({elapsed * 1000:.1f} ms)")
+    if isinstance(data, mmap.mmap):
+        data.close()
+    if is_bin_file(output):
+        return new
+    return format_u8g2_c(new, output.replace('.', '_')).encode('utf-8')
+
+
+# Watch mode
+#
+# The parsed glyphs (keyed by the text of their STARTCHAR..ENDCHAR record)
+# and the per-glyph encodings stay in memory, so a save in the pixel editor
+# only re-parses and re-encodes the glyphs that actually changed.
+
+WATCH_INTERVAL = 0.05 # seconds between checks of the BDF file
+
+
+def parse_bdf_incremental(buf, allowed_codepoints, record_cache):
+    """
+    Parse a BDF buffer, reusing glyphs from record_cache (record bytes ->
+    glyph dict, or None for skipped records). Only new or changed records are
+    parsed; record_cache is updated to hold just the current records.
+
+    Returns: (glyphs, font_bbx, number of records parsed)
+    """
+    index = scan_bdf_index(buf)
+    header_text = buf[:index['header_end']].decode('utf-8', 'replace')
+    _, font_bbx = parse_bdf_lines(header_text.splitlines())
+
+    glyphs = []
+    current = {}
+    parsed = 0
+    for entry in index['glyphs']:
+        record = buf[entry[0]:entry[3]]
+        if record in current:
+            glyph = current[record]
+        elif record in record_cache:
+            glyph = record_cache[record]
+        else:
+            parsed += 1
+            parsed_glyphs, _ = parse_bdf_lines(record.decode('utf-8', 'replace').splitlines(),
+                                               allowed_codepoints)
+            glyph = parsed_glyphs[0] if parsed_glyphs else None
+        current[record] = glyph
+        if glyph is not None:
+            glyphs.append(glyph)
+
+    record_cache.clear()
+    record_cache.update(current)
+    return glyphs, font_bbx, parsed
+
+
+def watch_bdf(input_file, output, allowed_codepoints=None, interval=WATCH_INTERVAL, **format_options):
+    """Regenerate output whenever input_file changes, until interrupted."""
+    record_cache = {}
+    encode_cache = GlyphEncodeCache()
+    last_state = None
+
+    print(f"Watching {input_file} -> {output} (Ctrl+C to stop)")
+    try:
+        while True:
+            try:
+                st = os.stat(input_file)
+            except FileNotFoundError:
+                # Some editors save by replacing the file
+                time.sleep(interval)
+                continue
+
+            state = (st.st_mtime_ns, st.st_size)
+            if state != last_state:
+                last_state = state
+                start = time.perf_counter()
+                with open(input_file, 'rb') as f:
+                    buf = f.read()
+                try:
+                    glyphs, font_bbx, parsed = parse_bdf_incremental(buf, allowed_codepoints, record_cache)
+                    data = encode_output(glyphs, font_bbx, output, encode_cache, **format_options)
+                except (ValueError, IndexError, KeyError) as e:
+                    # Most likely caught the file in the middle of a save
+                    print(f"Error processing {input_file}: {e!r}, waiting for the next change")
+                    continue
+                written = write_if_changed(output, data)
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"[{time.strftime('%H:%M:%S')}] {len(glyphs)} glyphs, "
+                      f"{parsed} parsed, {encode_cache.misses} encoded, "
+                      f"{'written' if written else 'output unchanged'} ({elapsed:.0f} ms)")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
+
+# Build system integration
+#
+# --depfile writes a make/ninja depfile for the output. --skip-unchanged
+# stores a content hash of the inputs, the options and the tool itself in
+# <output>.stamp and skips the conversion (leaving the output and its
+# timestamp alone) while none of them changed.
+
+STAMP_SUFFIX = '.stamp'
+
+# Tool files whose content is part of the stamp
+TOOL_FILES = [os.path.abspath(__file__), AGL_TABLE_FILE,
+              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'unicode_blocks.py')]
+
+# Options that don't change the output bytes
+STAMP_IGNORED_ARGS = {'jobs', 'depfile', 'skip_unchanged', 'watch', 'stats'}
+
+
+def input_dependencies(args):
+    """Files the output of this command line depends on."""
+    deps = [args.input_file]
+    if args.merge:
+        deps.extend(args.merge)
+    if args.corpus:
+        deps.extend(args.corpus)
+    return deps
+
+
+def _hash_file(h, filepath):
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+
+
+def file_digest(filepath):
+    h = hashlib.sha256()
+    _hash_file(h, filepath)
+    return h.hexdigest()
+
+
+def inputs_digest(args):
+    """SHA-256 over the options, the tool files and the content of all inputs."""
+    h = hashlib.sha256()
+    options = {k: v for k, v in sorted(vars(args).items()) if k not in STAMP_IGNORED_ARGS}
+    h.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+    for filepath in TOOL_FILES + input_dependencies(args):
+        h.update(b'\0' + filepath.encode('utf-8') + b'\0')
+        if os.path.exists(filepath):
+            _hash_file(h, filepath)
+    return h.hexdigest()
+
+
+def is_up_to_date(output, digest):
+    """True if output was produced from inputs with this digest and wasn't modified since."""
+    try:
+        with open(output + STAMP_SUFFIX, 'r') as f:
+            stamp = json.load(f)
+        return stamp.get('inputs') == digest and stamp.get('output') == file_digest(output)
+    except (OSError, ValueError):
+        return False
+
+
+def write_stamp(output, digest):
+    """Record the input digest for output; nothing is written if there is no output."""
+    if not os.path.exists(output):
+        return
+    # Hash the output first, so a failure can't leave an empty stamp behind
+    stamp = {'inputs': digest, 'output': file_digest(output)}
+    with open(output + STAMP_SUFFIX, 'w') as f:
+        json.dump(stamp, f, sort_keys=True)
+        f.write('\n')
+
+
+def _make_escape(path):
+    return path.replace('$', '$$').replace('#', '\\#').replace(' ', '\\ ')
+
+
+def write_depfile(depfile, output, deps):
+    """Write a Makefile style depfile (also understood by ninja)."""
+    with open(depfile, 'w') as f:
+        f.write(f"{_make_escape(output)}: {' '.join(_make_escape(d) for d in deps)}\n")
+
+
+class FontLoader:
+    """
+    Reads the input fonts for run(). The conversion server (u8g2_server.py)
+    substitutes a subclass that caches parsed fonts between requests.
+    """
+    def load_bdf(self, filepath, allowed_codepoints=None, jobs=1, stats='table'):
+        """Returns: (glyphs, font_bbx)"""
+        return parse_bdf_file(filepath, allowed_codepoints, jobs, stats)
+
+    def load_u8g2(self, filepath):
+        """Returns: (font data, name), (None, None) on error"""
+        if is_bin_file(filepath):
+            print(f"Mapping binary font file: {filepath}")
+            return read_bin_file(filepath)
+        print(f"Parsing C file: {filepath}")
+        return parse_c_file(filepath)
+
+
+# Options holding file paths, made absolute by the client shim (u8g2_client.py)
+# before they are sent to a server running in another directory
+PATH_ARGS = ['input_file', 'output', 'corpus', 'depfile', 'output_dir', 'merge']
+
+
+def build_parser():
     # Argument parsing
     parser = argparse.ArgumentParser(description="Convert BDF fonts to u8g2 C format or vice versa.")
-    parser.add_argument("input_file", help="Input BDF or u8g2 C file")
-    parser.add_argument("-o", "--output", default="output.c", help="Output file name")
+    parser.add_argument("input_file", help="Input BDF, u8g2 C or raw u8g2 .bin file")
+    parser.add_argument("-o", "--output", default="output.c", help="Output file name (.bin writes the raw font blob)")
     parser.add_argument("-e", "--encode", action="store_true", help="Encode BDF to u8g2 C (default is decode)")
-    parser.add_argument("-m", "--map", help="Character map file for BDF encoding (e.g., 'map.txt')")
-    
-    args = parser.parse_args()
+    parser.add_argument("-m", "--map", help="Unicode range to export, e.g. \"32-126,0x100-0x17F,~0x7F\" or \"Basic Latin,Latin Extended-A\" (encode and decode)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Parse the BDF (uses the BDF glyph index) or decode the u8g2 font with N worker processes")
+    parser.add_argument("--extract", metavar="CODEPOINT", help="Print the BDF record of a single codepoint (e.g. 260, 0x104, U+0104) using the glyph index")
+    parser.add_argument("--fonts", nargs='+', metavar="PATTERN", help="Decode the fonts with these names or glob patterns from a C file with many fonts (e.g. u8g2_fonts.c) to <output dir>/<name>.bdf, using its font index")
+    parser.add_argument("--list", action="store_true", help="List the fonts of a C file (only those matching --fonts if given)")
+    parser.add_argument("--output-dir", default='.', help="Output directory for --fonts (default: current directory)")
+    parser.add_argument("--watch", action="store_true", help="Keep running and re-encode the BDF whenever it changes (with -e)")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default='u8g2', help="Output font format when encoding (default: u8g2)")
+    parser.add_argument("--tiles", metavar="WxH", help="u8x8 character cell size in 8x8 tiles, e.g. 2x2 (default: smallest that fits)")
+    parser.add_argument("--rle-policy", default='size', help="Choice of the RLE parameters m0/m1: " + RLE_POLICY_HELP)
+    parser.add_argument("--pareto", action="store_true", help="Print the size / decode speed Pareto frontier of the RLE parameters")
+    parser.add_argument("--rotate", type=int, choices=TRANSFORM_ROTATIONS, default=0, help="Rotate the glyphs clockwise by this many degrees before encoding")
+    parser.add_argument("--mirror", choices=TRANSFORM_MIRRORS, help="Mirror the glyphs left-right (x) or upside down (y) before encoding")
+    parser.add_argument("--scale", type=int, default=1, help="Scale the glyphs by an integer factor before encoding")
+    parser.add_argument("--split", type=int, metavar="BYTES", help="Split the u8g2 font into fonts of at most BYTES bytes along Unicode blocks, with a codepoint routing table (C output)")
+    parser.add_argument("--index", choices=DIRECT_INDEX_MODES, default='auto', help="Codepoint index of the direct format: dense, sparse (256 codepoint pages) or auto (smaller, default)")
+    parser.add_argument("--recompress", action="store_true", help="Re-encode the u8g2 font(s) in input_file (a .c/.bin file or a directory) in place, where that makes them smaller")
+    parser.add_argument("--subset", action="store_true", help="Copy the glyphs of the u8g2 font in input_file selected by -m and/or --corpus into a new u8g2 font (C or .bin), without decoding them")
+    parser.add_argument("--crop", action="store_true", help="With --recompress: crop every glyph to its ink")
+    parser.add_argument("--stats", choices=STATS_FORMATS, default='table', help="Glyph coverage per Unicode block: table (default), json (one line) or none")
+    parser.add_argument("--depfile", metavar="FILE", help="Write a make/ninja depfile listing the inputs of the output")
+    parser.add_argument("--skip-unchanged", action="store_true", help=f"Record a hash of inputs and options in <output>{STAMP_SUFFIX} and skip the conversion while nothing changed")
+    parser.add_argument("--merge", nargs='+', metavar="FILE", help="Merge these BDF, u8g2 C or .bin fonts into the encoded font, in priority order after input_file (which wins conflicting codepoints)")
+    parser.add_argument("--corpus", nargs='+', metavar="FILE", help="Encode only the codepoints used in these UTF-8 text, gettext (.po) or JSON string table files")
+    parser.add_argument("--corpus-base", default=DEFAULT_CORPUS_BASE, help=f"Range always kept when subsetting by corpus (default: {DEFAULT_CORPUS_BASE})")
+    return parser
+
+
+def run(args, loader=None):
+    """Execute one command line (parsed by build_parser())."""
+    if loader is None:
+        loader = FontLoader()
+
+    try:
+        allowed_codepoints = parse_map_range(args.map)
+    except ValueError as e:
+        print(f"Invalid range spec '{args.map}': {e}")
+        sys.exit(1)
+
+    try:
+        format_options = {'output_format': args.format,
+                          'tiles': parse_tile_size(args.tiles) if args.tiles else None,
+                          'index_mode': args.index,
+                          'rle_policy': parse_rle_policy(args.rle_policy),
+                          'pareto': args.pareto,
+                          'split_size': args.split,
+                          'rotate': args.rotate,
+                          'mirror': args.mirror,
+                          'scale': args.scale}
+        if args.scale < 1:
+            raise ValueError(f"scale must be at least 1, got {args.scale}")
+        codepoint = parse_codepoint(args.extract) if args.extract else None
+    except ValueError as e:
+        print(f"Invalid option: {e}")
+        sys.exit(1)
+
+    if args.extract:
+        record = extract_bdf_record(args.input_file, codepoint)
+        if record is None:
+            print(f"Codepoint U+{codepoint:04X} not found in {args.input_file}")
+            sys.exit(1)
+        sys.stdout.write(record)
+        return
 
-    if args.encode:
+    if args.recompress:
+        recompress_paths(args.input_file, args.crop)
+        return
+
+    if args.list:
+        entries = select_c_fonts(load_c_font_index(args.input_file), args.fonts)
+        print_c_font_catalogue(entries)
+        return
+
+    if args.fonts:
+        print(f"Extracting fonts from {args.input_file}")
+        written = extract_c_fonts(args.input_file, args.fonts, args.output_dir, allowed_codepoints, args.jobs)
+        if not written:
+            print(f"No u8g2 fonts matching {' '.join(args.fonts)}")
+            sys.exit(1)
+        print(f"Written {written} font(s) to {args.output_dir}")
+        return
+
+    if args.watch:
+        if not args.encode:
+            print("--watch is only supported when encoding (-e)")
+            sys.exit(1)
+        # Watch mode re-encodes input_file alone, these would be dropped silently
+        unsupported = [option for option, value in (('--merge', args.merge), ('--corpus', args.corpus),
+                                                    ('--subset', args.subset)) if value]
+        if unsupported:
+            print(f"--watch does not support {', '.join(unsupported)}")
+            sys.exit(1)
+        watch_bdf(args.input_file, args.output, allowed_codepoints, **format_options)
+        return
+
+    if args.skip_unchanged:
+        digest = inputs_digest(args)
+        if is_up_to_date(args.output, digest):
+            print(f"{args.output} is up to date")
+            if args.depfile and not os.path.exists(args.depfile):
+                write_depfile(args.depfile, args.output, input_dependencies(args))
+            return
+
+    if args.subset:
+        # u8g2 to u8g2, copying the glyph records
+        allowed = allowed_codepoints
+        if args.corpus:
+            allowed, _ = corpus_filter(args.corpus, args.corpus_base, allowed_codepoints)
+        try:
+            data = subset_font_file(args.input_file, args.output, allowed, loader)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        with open(args.output, 'wb') as f:
+            f.write(data)
+        print(f"Written to {args.output}")
+    elif args.encode:
         # BDF to u8g2
-        print(f"Parsing BDF file: {args.input_file}")
-        glyphs, font_bbx = parse_bdf_file(args.input_file, args.map)
-        print(f"Parsed {len(glyphs)} glyphs.")
-        
+        # Corpus subsetting filters while loading, unused glyphs are never parsed
+        glyph_filter = allowed_codepoints
+        if args.corpus:
+            glyph_filter, used = corpus_filter(args.corpus, args.corpus_base, allowed_codepoints)
+        if args.merge:
+            try:
+                glyphs, font_bbx = merge_fonts([args.input_file] + args.merge, glyph_filter, loader, args.jobs)
+            except ValueError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+            print_coverage([g['uc'] for g in glyphs], "Merged glyphs", args.stats)
+        else:
+            print(f"Parsing BDF file: {args.input_file}")
+            glyphs, font_bbx = loader.load_bdf(args.input_file, glyph_filter, args.jobs, args.stats)
+            print(f"Parsed {len(glyphs)} glyphs.")
+
+        if args.corpus:
+            report_corpus_usage(used, glyphs, args.corpus, allowed_codepoints)
+
         # Encode
-        font_name = args.output.replace('.', '_') # Simple name sanitization
-        c_code = generate_u8g2_c(glyphs, font_bbx, font_name)
-        
-        with open(args.output, 'w') as f:
-            f.write(c_code)
+        sizes = {}
+        try:
+            data = encode_output(glyphs, font_bbx, args.output, sizes=sizes, **format_options)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if args.corpus and not args.merge:
+            report_corpus_savings(bdf_glyph_count(args.input_file, allowed_codepoints), len(glyphs), sizes.get('u8g2'))
+        with open(args.output, 'wb') as f:
+            f.write(data)
         print(f"Written to {args.output}")
     else:
         # u8g2 to BDF
-        print(f"Parsing C file: {args.input_file}")
-        data, name = parse_c_file(args.input_file)
+        data, name = loader.load_u8g2(args.input_file)
         if not data:
             print("Failed to read data")
             sys.exit(1)
             
         print(f"Read {len(data)} bytes of font data.")
-        convert_u8g2_to_bdf(data, name, args.output)
+        count = convert_u8g2_to_bdf(data, name, args.output, allowed_codepoints, args.stats, args.jobs)
+        if isinstance(data, mmap.mmap):
+            data.close()
+        if count is None:
+            sys.exit(1)
         print(f"Written to {args.output}")
 
-if __name__ == "__main__":
-    main()
-        
-        # ... (rest of decoding logic)
-        # We need to move the decoding logic into a function or keep it here but indented.
-        # For now, let's keep it here but I need to restructure main.
-        
-        # ...
+    if args.skip_unchanged:
+        write_stamp(args.output, digest)
+    if args.depfile:
+        write_depfile(args.depfile, args.output, input_dependencies(args))
+
+
+def main(argv=None):
+    run(build_parser().parse_args(argv))
+
 
 if __name__ == "__main__":
     main()